@@ -21,7 +21,7 @@ from bigdl.chronos.data import TSDataset
 import bigdl.orca.automl.hp as hp
 from bigdl.chronos.autots.model import AutoModelFactory
 from bigdl.chronos.autots.tspipeline import TSPipeline
-from bigdl.chronos.autots.utils import recalculate_n_sampling
+from bigdl.chronos.autots.utils import recalculate_n_sampling, WindowCache
 
 
 class AutoTSEstimator:
@@ -62,6 +62,7 @@ class AutoTSEstimator:
                  cpus_per_trial=1,
                  name="autots_estimator",
                  remote_dir=None,
+                 window_cache_bytes=2 * 1024 ** 3,
                  ):
         """
         AutoTSEstimator trains a model for time series forecasting.
@@ -123,6 +124,11 @@ class AutoTSEstimator:
         :param remote_dir: String. Remote directory to sync training results and checkpoints. It
                defaults to None and doesn't take effects while running in local. While running in
                cluster, it defaults to "hdfs:///tmp/{name}".
+        :param window_cache_bytes: Int. The max total bytes of the rolled train/validation
+               data shared by the trials when the data is a TSDataset. Each distinct
+               (past_seq_len, selected_features) is rolled once by a single Ray actor, so the
+               rolls of different configs run one at a time, and the least recently used rolled
+               data is evicted beyond this size. It defaults to 2GB.
         """
         # check backend and set default loss
         if backend != "torch":
@@ -181,6 +187,8 @@ class AutoTSEstimator:
         self.selected_features = selected_features
         self._scaler = None
         self._scaler_index = None
+        self.window_cache_bytes = window_cache_bytes
+        self._window_cache = None
 
     def fit(self,
             data,
@@ -272,6 +280,8 @@ class AutoTSEstimator:
                 scheduler=scheduler,
                 scheduler_params=scheduler_params
             )
+        # the trials have finished with the rolled data
+        self._release_window_cache()
 
         best_model = self._get_best_automl_model()
 
@@ -321,38 +331,42 @@ class AutoTSEstimator:
         if self.selected_features == "all":
             search_space['selected_features'] = all_features
 
-        # put train/val data in ray
-        train_data_id = ray.put(train_data)
-        valid_data_id = ray.put(val_data)
-
-        def train_data_creator(config):
-            train_d = ray.get(train_data_id)
-
-            x, y = train_d.roll(lookback=config.get('past_seq_len'),
-                                horizon=self._future_seq_len,
-                                feature_col=config['selected_features']) \
-                          .to_numpy()
-
-            return DataLoader(TensorDataset(torch.from_numpy(x).float(),
-                                            torch.from_numpy(y).float()),
+        # the rolled train/val data are cached in ray and shared by the trials
+        self._release_window_cache()
+        window_cache = ray.remote(num_cpus=0)(WindowCache) \
+            .remote({"train": train_data, "val": val_data}, max_bytes=self.window_cache_bytes)
+        self._window_cache = window_cache
+        horizon = self._future_seq_len
+
+        def get_data_loader(name, config):
+            import warnings
+            ref = ray.get(window_cache.get.remote(name,
+                                                  config.get('past_seq_len'),
+                                                  horizon,
+                                                  config['selected_features']))[0]
+            x, y = ray.get(ref)
+            with warnings.catch_warnings():
+                # the arrays in the object store are read-only, and are not written by training
+                warnings.simplefilter("ignore", UserWarning)
+                x, y = torch.from_numpy(x).float(), torch.from_numpy(y).float()
+            return DataLoader(TensorDataset(x, y),
                               batch_size=config["batch_size"],
                               shuffle=True)
 
-        def val_data_creator(config):
-            val_d = ray.get(valid_data_id)
-
-            x, y = val_d.roll(lookback=config.get('past_seq_len'),
-                              horizon=self._future_seq_len,
-                              feature_col=config['selected_features']) \
-                        .to_numpy()
+        def train_data_creator(config):
+            return get_data_loader("train", config)
 
-            return DataLoader(TensorDataset(torch.from_numpy(x).float(),
-                                            torch.from_numpy(y).float()),
-                              batch_size=config["batch_size"],
-                              shuffle=True)
+        def val_data_creator(config):
+            return get_data_loader("val", config)
 
         return train_data_creator, val_data_creator
 
+    def _release_window_cache(self):
+        if self._window_cache is not None:
+            import ray
+            ray.kill(self._window_cache)
+            self._window_cache = None
+
     def _get_best_automl_model(self):
         """
         For internal use only.
@@ -32,3 +32,58 @@ def recalculate_n_sampling(search_space, n_sampling):
     n_sampling /= assist_num
     # TODO Number of threads specified by the user corresponds to n_sampling and give warning.
     return math.ceil(n_sampling)
+
+
+class WindowCache:
+    """
+    Rolls the TSDatasets for the trials of an AutoTSEstimator, which is used as a Ray actor.
+    The rolled arrays are put in the object store once and shared by the trials with the same
+    (lookback, horizon, feature columns). The least recently used arrays are evicted once they
+    take more than max_bytes in total. The rolls of different windows run one at a time in
+    the actor, which trades the parallelism of the rolls for rolling each window only once.
+
+    :param data: a dict of {name: TSDataset}.
+    :param max_bytes: the max total bytes of the cached arrays.
+    """
+
+    def __init__(self, data, max_bytes=2 * 1024 ** 3):
+        from collections import OrderedDict
+        self.data = data
+        self.max_bytes = max_bytes
+        self.cache = OrderedDict()
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, lookback, horizon, feature_col):
+        """
+        Get the rolled arrays of a TSDataset.
+
+        :return: a list of the object ref of (x, y), so that the ref is not resolved when
+                 returned by the actor.
+        """
+        import ray
+        key = (name, lookback, horizon,
+               tuple(feature_col) if feature_col is not None else None)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return [self.cache[key][0]]
+
+        self.misses += 1
+        x, y = self.data[name].roll(lookback=lookback,
+                                    horizon=horizon,
+                                    feature_col=feature_col).to_numpy()
+        ref = ray.put((x, y))
+        nbytes = x.nbytes + y.nbytes
+        self.cache[key] = (ref, nbytes)
+        self.cached_bytes += nbytes
+        # the evicted arrays are released once the trials using them finish
+        while self.cached_bytes > self.max_bytes and len(self.cache) > 1:
+            _, (_, evicted_bytes) = self.cache.popitem(last=False)
+            self.cached_bytes -= evicted_bytes
+        return [ref]
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "cached_windows": len(self.cache), "cached_bytes": self.cached_bytes}
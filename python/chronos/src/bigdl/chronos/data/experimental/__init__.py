@@ -15,3 +15,4 @@
 #
 
 from .xshards_tsdataset import XShardsTSDataset
+from .parquet_tsdataset import ParquetTSDataset
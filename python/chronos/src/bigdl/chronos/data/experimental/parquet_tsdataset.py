@@ -0,0 +1,499 @@
+#
+# Copyright 2016 The BigDL Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import functools
+import shutil
+
+import numpy as np
+import pandas as pd
+from torch.utils.data import IterableDataset
+
+from bigdl.chronos.data.utils.utils import _to_list
+from bigdl.chronos.data.utils.feature import generate_dt_features
+from bigdl.chronos.data.utils.impute import impute_timeseries_dataframe
+from bigdl.chronos.data.utils.roll import roll_timeseries_dataframe
+from bigdl.chronos.data.utils.scale import unscale_timeseries_numpy
+
+_DEFAULT_ID_COL_NAME = "id"
+_DEFAULT_ID_PLACEHOLDER = "0"
+
+
+def _scale_block(df, scaler, cols):
+    df[cols] = scaler.transform(df[cols])
+    return df
+
+
+class ParquetTSDataset:
+
+    def __init__(self, path, id_list, **schema):
+        '''
+        ParquetTSDataset is an out-of-core abstract of time series dataset.
+        The data is kept as parquet files partitioned by id_col, and only the dataframe
+        of one id is loaded into memory at a time. impute, gen_dt_feature and scale are
+        recorded and applied lazily on each id, and the rolled samples are streamed into
+        a pytorch DataLoader or a tf.data dataset.
+        Cascade call is supported for most of the transform methods.
+        '''
+        self.path = path
+        self.id_col = schema["id_col"]
+        self.dt_col = schema["dt_col"]
+        self.feature_col = schema["feature_col"].copy()
+        self.target_col = schema["target_col"].copy()
+        self._partitioned = schema.get("partitioned", True)
+        # the lower bounds of dt_col of the segments of a single id
+        self._segments = schema.get("segments", None)
+        # the temporary directory owned by this instance, which is removed by close
+        self._temp_dir = schema.get("temp_dir", None)
+
+        self.scaler = None
+        self.scaler_index = [i for i in range(len(self.target_col))]
+        self._id_list = list(id_list)
+        self._transforms = []
+        self._generated_col = []
+        self._dataset = None
+
+    @staticmethod
+    def from_parquet(path,
+                     dt_col,
+                     target_col,
+                     id_col=None,
+                     extra_feature_col=None,
+                     partition_dir=None,
+                     segment_size=1000000,
+                     **kwargs):
+        """
+        Initialize a ParquetTSDataset from path of parquet file. If id_col is set, the
+        data is rewritten to `partition_dir` as parquet files partitioned by id_col in a
+        streaming fashion, so that the whole table is never loaded into memory.
+
+        :param path: A string path to parquet file or a directory of parquet files.
+        :param dt_col: a str indicates the col name of datetime column in the input data.
+        :param target_col: a str or list indicates the col name of target column
+               in the input data.
+        :param id_col: (optional) a str indicates the col name of id. If it is not
+               explicitly stated, then the data is interpreted as only containing a
+               single id.
+        :param extra_feature_col: (optional) a str or list indicates the col name
+               of extra feature columns that needs to predict the target column.
+        :param partition_dir: (optional) a str indicates the directory to write the data
+               partitioned by id_col. The value defaults to None, where a temporary
+               directory will be used, which is removed by `close`.
+        :param segment_size: int, only effective when id_col is None. The single time series
+               is loaded by segments of about segment_size records sorted by dt_col, so that
+               the whole table is never loaded into memory. Only dt_col is read as a whole
+               to split the segments. The value defaults to 1000000.
+        :param kwargs: Any additional kwargs are passed to pyarrow.dataset.dataset.
+
+        :return: a ParquetTSDataset instance.
+
+        Create a ParquetTSDataset instance by:
+
+        >>> tsdataset = ParquetTSDataset.from_parquet("/path/to/table.parquet",
+        >>>                                           dt_col="datetime",
+        >>>                                           target_col="value", id_col="id",
+        >>>                                           extra_feature_col=["extra feature 1",
+        >>>                                                              "extra feature 2"])
+        >>> loader = tsdataset.impute().gen_dt_feature()\\
+        >>>                   .to_torch_data_loader(lookback=24, horizon=1)
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        target_col = _to_list(target_col, name="target_col")
+        feature_col = _to_list(extra_feature_col, name="extra_feature_col")
+        columns = _to_list(dt_col, name="dt_col") + target_col + \
+            _to_list(id_col, name="id_col") + feature_col
+        source = ds.dataset(path, format="parquet", **kwargs)
+
+        if id_col is None:
+            dt = source.to_table(columns=[dt_col])[dt_col]
+            dt = dt.take(pc.sort_indices(dt))
+            segments = sorted(set(dt[::segment_size].to_pylist())) if len(dt) else []
+            return ParquetTSDataset(path=path,
+                                    id_list=range(max(len(segments), 1)),
+                                    id_col=_DEFAULT_ID_COL_NAME,
+                                    dt_col=dt_col,
+                                    target_col=target_col,
+                                    feature_col=feature_col,
+                                    partitioned=False,
+                                    segments=segments or None)
+
+        temp_dir = None
+        if partition_dir is None:
+            import tempfile
+            partition_dir = temp_dir = tempfile.mkdtemp(prefix="chronos_tsdataset_")
+        id_list = pc.unique(source.to_table(columns=[id_col])[id_col]).to_pylist()
+        partitioning = ds.partitioning(pa.schema([source.schema.field(id_col)]),
+                                       flavor="hive")
+        ds.write_dataset(source.scanner(columns=columns),
+                         partition_dir,
+                         format="parquet",
+                         partitioning=partitioning,
+                         max_partitions=max(len(id_list), 1024))
+        return ParquetTSDataset(path=partition_dir,
+                                id_list=sorted(id_list),
+                                id_col=id_col,
+                                dt_col=dt_col,
+                                target_col=target_col,
+                                feature_col=feature_col,
+                                temp_dir=temp_dir)
+
+    def close(self):
+        '''
+        Remove the temporary directory of the partitioned data written by from_parquet if
+        partition_dir is not set. The instance could not be used anymore after close.
+        '''
+        if getattr(self, "_temp_dir", None) is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+            self._dataset = None
+
+    def __del__(self):
+        self.close()
+
+    def _get_dataset(self):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        if self._dataset is None:
+            if self._partitioned:
+                id_type = pa.array(self._id_list[:1]).type
+                partitioning = ds.partitioning(pa.schema([(self.id_col, id_type)]),
+                                               flavor="hive")
+                self._dataset = ds.dataset(self.path, format="parquet",
+                                           partitioning=partitioning)
+            else:
+                self._dataset = ds.dataset(self.path, format="parquet")
+        return self._dataset
+
+    def _get_id_df(self, id_name, overlap=0):
+        '''
+        load the dataframe of one id sorted by dt_col and apply the recorded transforms.
+        For the segments of a single id, the id_name is the index of the segment, and
+        the last `overlap` records of the previous segment are also loaded.
+        '''
+        import pyarrow.dataset as ds
+        columns = [self.dt_col] + self.target_col + \
+            [col for col in self.feature_col if col not in self._generated_col]
+        if self._partitioned:
+            table = self._get_dataset().to_table(columns=columns,
+                                                 filter=ds.field(self.id_col) == id_name)
+            df = table.to_pandas()
+        elif self._segments is not None:
+            segment = id_name
+            start = segment - 1 if overlap and segment > 0 else segment
+            dt_filter = ds.field(self.dt_col) >= self._segments[start]
+            if segment + 1 < len(self._segments):
+                dt_filter = dt_filter & (ds.field(self.dt_col) < self._segments[segment + 1])
+            df = self._get_dataset().to_table(columns=columns, filter=dt_filter).to_pandas()
+            id_name = _DEFAULT_ID_PLACEHOLDER
+        else:
+            df = self._get_dataset().to_table(columns=columns).to_pandas()
+        df[self.id_col] = id_name
+        df = df.sort_values(self.dt_col, kind="stable").reset_index(drop=True)
+        if self._segments is not None and start != segment:
+            previous = int((df[self.dt_col] < self._segments[segment]).sum())
+            df = df.iloc[max(previous - overlap, 0):].reset_index(drop=True)
+        for transform in self._transforms:
+            df = transform(df)
+        return df
+
+    def __getstate__(self):
+        # pyarrow dataset is recreated in each worker
+        state = self.__dict__.copy()
+        state["_dataset"] = None
+        # the temporary directory is only removed by the instance creating it
+        state["_temp_dir"] = None
+        return state
+
+    def impute(self, mode="last", const_num=0):
+        '''
+        Lazily impute each univariate time series distinguished by id_col and feature_col.
+
+        :param mode: imputation mode, select from "last", "const" or "linear".
+               Please refer to TSDataset.impute for details.
+        :param const_num: indicates the const number to fill, which is only effective when
+               mode is set to "const".
+
+        :return: the ParquetTSDataset instance.
+        '''
+        self._transforms.append(functools.partial(impute_timeseries_dataframe,
+                                                  dt_col=self.dt_col,
+                                                  mode=mode,
+                                                  const_num=const_num))
+        return self
+
+    def gen_dt_feature(self, features="auto", one_hot_features=None):
+        '''
+        Lazily generate datetime feature(s) for each record. The frequency used by "auto"
+        is the most common interval of dt_col over all the ids, which only reads dt_col.
+
+        :param features: str or list, states which feature(s) will be generated.
+               Please refer to TSDataset.gen_dt_feature for details.
+        :param one_hot_features: list, states which feature(s) will be generated as
+               one-hot-encoded feature. The value defaults to None.
+
+        :return: the ParquetTSDataset instance.
+        '''
+        df = self._get_id_df(self._id_list[0])
+        assert pd.api.types.is_datetime64_any_dtype(df[self.dt_col].dtypes), \
+            "The time series data does not have a Pandas datetime format"\
+            "(you can use pandas.to_datetime to convert a string into a datetime format.)"
+        freq = self._get_freq()
+        features_generated = []
+        generate_dt_features(input_df=df.iloc[:1],
+                             dt_col=self.dt_col,
+                             features=features,
+                             one_hot_features=one_hot_features,
+                             freq=freq,
+                             features_generated=features_generated)
+        self._transforms.append(functools.partial(generate_dt_features,
+                                                  dt_col=self.dt_col,
+                                                  features=features,
+                                                  one_hot_features=one_hot_features,
+                                                  freq=freq,
+                                                  features_generated=[]))
+        self._generated_col += features_generated
+        self.feature_col += features_generated
+        return self
+
+    def _get_freq(self):
+        import pyarrow.dataset as ds
+        intervals = pd.Series(dtype="timedelta64[ns]")
+        for id_name in self._id_list:
+            if self._partitioned:
+                table = self._get_dataset().to_table(columns=[self.dt_col],
+                                                     filter=ds.field(self.id_col) == id_name)
+            else:
+                table = self._get_dataset().to_table(columns=[self.dt_col])
+            dt = table[self.dt_col].to_pandas().sort_values()
+            intervals = pd.concat([intervals, dt.diff().value_counts()])
+            if not self._partitioned:
+                break
+        intervals = intervals.groupby(level=0).sum()
+        intervals = intervals[intervals.index > pd.Timedelta(0)]
+        return intervals.idxmax() if len(intervals) else None
+
+    def scale(self, scaler, fit=True):
+        '''
+        Scale the feature column and target column. If fit is True, the scaler is fitted
+        incrementally by `partial_fit` with one pass over the ids, so the scaler should
+        support `partial_fit` (e.g. StandardScaler, MaxAbsScaler and MinMaxScaler).
+        The transform itself is applied lazily.
+
+        :param scaler: sklearn scaler instance.
+        :param fit: if we need to fit the scaler. The value is defaulted to True.
+
+        :return: the ParquetTSDataset instance.
+        '''
+        cols = self.target_col + self.feature_col
+        if fit:
+            assert hasattr(scaler, "partial_fit"), \
+                f"{type(scaler).__name__} does not support partial_fit, please use a scaler " \
+                "that could be fitted incrementally."
+            for id_name in self._id_list:
+                scaler.partial_fit(self._get_id_df(id_name)[cols])
+        else:
+            from sklearn.utils.validation import check_is_fitted
+            try:
+                assert not check_is_fitted(scaler)
+            except Exception:
+                raise AssertionError("When calling scale for the first time, "
+                                     "you need to set fit=True.")
+        self._transforms.append(functools.partial(_scale_block, scaler=scaler, cols=cols))
+        self.scaler = scaler
+        return self
+
+    def unscale_numpy(self, data):
+        '''
+        Unscale the time series forecaster's numpy prediction result/ground truth.
+
+        :param data: a numpy ndarray with 3 dim whose shape should be exactly the
+               same with the rolled y.
+
+        :return: the unscaled numpy ndarray.
+        '''
+        return unscale_timeseries_numpy(data, self.scaler, self.scaler_index)
+
+    def _iter_rolled(self, lookback, horizon, feature_col, target_col, id_list, shuffle):
+        '''
+        yield the rolled (x, y) of each id, y is None if horizon is 0.
+        '''
+        id_list = list(id_list)
+        if shuffle:
+            np.random.shuffle(id_list)
+        # the first window of a segment ends at its first record
+        overlap = lookback + (horizon if isinstance(horizon, int) else max(horizon)) - 1
+        for id_name in id_list:
+            x, y = roll_timeseries_dataframe(df=self._get_id_df(id_name, overlap),
+                                             roll_feature_df=None,
+                                             lookback=lookback,
+                                             horizon=horizon,
+                                             feature_col=feature_col,
+                                             target_col=target_col,
+                                             strided=True)
+            if x.shape[0] == 0:
+                continue
+            if shuffle:
+                idx = np.random.permutation(x.shape[0])
+                x = x[idx]
+                y = None if y is None else y[idx]
+            yield x, y
+
+    def _get_roll_cols(self, lookback, feature_col, target_col):
+        assert isinstance(lookback, int), \
+            f"lookback should be an int for ParquetTSDataset, but found {lookback}."
+        feature_col = _to_list(feature_col, "feature_col") if feature_col is not None \
+            else self.feature_col
+        target_col = _to_list(target_col, "target_col") if target_col is not None \
+            else self.target_col
+        self.scaler_index = [self.target_col.index(t) for t in target_col]
+        return feature_col, target_col
+
+    def to_torch_data_loader(self,
+                             lookback,
+                             horizon,
+                             batch_size=32,
+                             feature_col=None,
+                             target_col=None,
+                             shuffle=True,
+                             num_workers=0):
+        """
+        Stream the rolled samples into a PyTorch DataLoader. The ids are split among
+        the DataLoader workers, and each id is loaded, transformed and rolled only when
+        its samples are needed.
+
+        :param lookback: int, lookback value.
+        :param horizon: int or list, please refer to TSDataset.roll for details.
+        :param batch_size: int, the batch_size for a Pytorch DataLoader. It defaults to 32.
+        :param feature_col: str or list, indicates the feature col name. Default to None,
+               where we will take all available feature in rolling.
+        :param target_col: str or list, indicates the target col name. Default to None,
+               where we will take all target in rolling.
+        :param shuffle: bool, whether to shuffle the order of ids and the samples of each
+               id. Default to True.
+        :param num_workers: int, the number of DataLoader workers. Default to 0.
+
+        :return: A pytorch DataLoader instance.
+        """
+        from torch.utils.data import DataLoader
+        feature_col, target_col = self._get_roll_cols(lookback, feature_col, target_col)
+        dataset = _ParquetRollIterableDataset(self, lookback, horizon, feature_col,
+                                              target_col, batch_size, shuffle)
+        # batching is done in the dataset
+        return DataLoader(dataset, batch_size=None, num_workers=num_workers)
+
+    def to_tf_dataset(self,
+                      lookback,
+                      horizon,
+                      batch_size=32,
+                      feature_col=None,
+                      target_col=None,
+                      shuffle=True,
+                      shuffle_buffer_size=10000):
+        """
+        Stream the rolled samples into a tf.data dataset.
+
+        :param lookback: int, lookback value.
+        :param horizon: int or list, please refer to TSDataset.roll for details.
+        :param batch_size: Number of samples per batch of computation. Default to 32.
+        :param feature_col: str or list, indicates the feature col name. Default to None,
+               where we will take all available feature in rolling.
+        :param target_col: str or list, indicates the target col name. Default to None,
+               where we will take all target in rolling.
+        :param shuffle: bool, whether to shuffle the ids and the samples. Default to True.
+        :param shuffle_buffer_size: int, the buffer size to shuffle the samples across ids.
+               Only effective when shuffle is True. Default to 10000.
+
+        :return: a tf.data dataset, including x and y (only x if horizon is 0).
+        """
+        import tensorflow as tf
+        feature_col, target_col = self._get_roll_cols(lookback, feature_col, target_col)
+        x_spec = tf.TensorSpec(shape=(None, lookback, len(target_col) + len(feature_col)),
+                               dtype=tf.float32)
+        if horizon == 0:
+            output_signature = x_spec
+        else:
+            horizon_len = horizon if isinstance(horizon, int) else len(horizon)
+            output_signature = (x_spec,
+                                tf.TensorSpec(shape=(None, horizon_len, len(target_col)),
+                                              dtype=tf.float32))
+
+        def generator():
+            for x, y in self._iter_rolled(lookback, horizon, feature_col, target_col,
+                                          self._id_list, shuffle):
+                yield x if y is None else (x, y)
+
+        data = tf.data.Dataset.from_generator(generator, output_signature=output_signature)
+        data = data.unbatch()
+        if shuffle:
+            data = data.shuffle(shuffle_buffer_size)
+        return data.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+class _ParquetRollIterableDataset(IterableDataset):
+    def __init__(self, tsdataset, lookback, horizon, feature_col, target_col,
+                 batch_size, shuffle):
+        self.tsdataset = tsdataset
+        self.lookback = lookback
+        self.horizon = horizon
+        self.feature_col = feature_col
+        self.target_col = target_col
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+
+    def __iter__(self):
+        import torch
+        from torch.utils.data import get_worker_info
+        id_list = self.tsdataset._id_list
+        worker_info = get_worker_info()
+        if worker_info is not None:
+            id_list = id_list[worker_info.id::worker_info.num_workers]
+        x_buffer, y_buffer, buffer_size = [], [], 0
+        for x, y in self.tsdataset._iter_rolled(self.lookback, self.horizon, self.feature_col,
+                                                self.target_col, id_list, self.shuffle):
+            x_buffer.append(x)
+            y_buffer.append(y)
+            buffer_size += x.shape[0]
+            while buffer_size >= self.batch_size:
+                x_batch, x_buffer = _split_buffer(x_buffer, self.batch_size)
+                if self.horizon == 0:
+                    yield torch.from_numpy(x_batch)
+                else:
+                    y_batch, y_buffer = _split_buffer(y_buffer, self.batch_size)
+                    yield torch.from_numpy(x_batch), torch.from_numpy(y_batch)
+                buffer_size -= self.batch_size
+        if buffer_size > 0:
+            x_batch = np.concatenate(x_buffer)
+            if self.horizon == 0:
+                yield torch.from_numpy(x_batch)
+            else:
+                yield torch.from_numpy(x_batch), torch.from_numpy(np.concatenate(y_buffer))
+
+
+def _split_buffer(buffer, size):
+    '''
+    take the first `size` samples from a list of arrays, return the batch and the rest.
+    '''
+    batch, rest, taken = [], [], 0
+    for i, arr in enumerate(buffer):
+        if taken + arr.shape[0] <= size:
+            batch.append(arr)
+            taken += arr.shape[0]
+        else:
+            batch.append(arr[:size - taken])
+            rest = [arr[size - taken:]] + buffer[i + 1:]
+            break
+    return np.concatenate(batch).astype(np.float32, copy=False), rest
@@ -21,11 +21,12 @@ import functools
 from bigdl.chronos.data.utils.feature import generate_dt_features, generate_global_features
 from bigdl.chronos.data.utils.impute import impute_timeseries_dataframe
 from bigdl.chronos.data.utils.deduplicate import deduplicate_timeseries_dataframe
-from bigdl.chronos.data.utils.roll import roll_timeseries_dataframe
+from bigdl.chronos.data.utils.roll import roll_timeseries_dataframe, _get_rolling_feature_array
 from bigdl.chronos.data.utils.scale import unscale_timeseries_numpy
 from bigdl.chronos.data.utils.resample import resample_timeseries_dataframe
 from bigdl.chronos.data.utils.split import split_timeseries_dataframe
 from bigdl.chronos.data.utils.cycle_detection import cycle_length_est
+from bigdl.chronos.data.utils.parallel import parallel_apply, check_backend
 from bigdl.chronos.data.utils.utils import _to_list, _check_type,\
     _check_col_within, _check_col_no_na, _check_is_aligned, _check_dt_is_sorted
 
@@ -47,6 +48,7 @@ class TSDataset:
 
         self.numpy_x = None
         self.numpy_y = None
+        self.numpy_roll_additional_feature = None
         self.roll_feature = None
         self.roll_target = None
         self.roll_feature_df = None
@@ -55,6 +57,9 @@ class TSDataset:
         self.scaler_index = [i for i in range(len(self.target_col))]
         self.id_sensitive = None
         self._has_generate_agg_feature = False
+        self._backend = "serial"
+        self._num_workers = None
+        self._min_rows_per_chunk = 10000
         self._check_basic_invariants()
 
         self._id_list = list(np.unique(self.df[self.id_col]))
@@ -227,6 +232,39 @@ class TSDataset:
                                      largest_horizon=largest_horizon,
                                      )
 
+    def set_backend(self, backend="serial", num_workers=None, min_rows_per_chunk=10000):
+        '''
+        Set the execution backend of the per-id transforms (impute, deduplicate, resample,
+        gen_dt_feature and roll). The ids are partitioned into chunks that are processed
+        by a pool of workers, and the result is reassembled in the original order.
+
+        :param backend: str, one of "serial", "thread" or "process". For "process", numpy
+               columns of the dataframe are shared with the workers through shared memory,
+               and "thread" is used as fallback if shared memory is not available.
+               The value defaults to "serial".
+        :param num_workers: int, the number of workers. The value defaults to None, which
+               means the number of cpu cores.
+        :param min_rows_per_chunk: int, small ids are batched together so that each chunk
+               has at least this number of rows to amortize the overhead. The value
+               defaults to 10000.
+
+        :return: the tsdataset instance.
+        '''
+        check_backend(backend, num_workers, min_rows_per_chunk)
+        self._backend = backend
+        self._num_workers = num_workers
+        self._min_rows_per_chunk = min_rows_per_chunk
+        return self
+
+    def _parallel_apply(self, func, per_group=True):
+        return parallel_apply(self.df,
+                              id_col=self.id_col,
+                              func=func,
+                              per_group=per_group,
+                              backend=self._backend,
+                              num_workers=self._num_workers,
+                              min_rows_per_chunk=self._min_rows_per_chunk)
+
     def impute(self, mode="last", const_num=0):
         '''
         Impute the tsdataset by imputing each univariate time series
@@ -245,11 +283,10 @@ class TSDataset:
 
         :return: the tsdataset instance.
         '''
-        self.df = self.df.groupby([self.id_col]) \
-            .apply(lambda df: impute_timeseries_dataframe(df=df,
-                                                          dt_col=self.dt_col,
-                                                          mode=mode,
-                                                          const_num=const_num))
+        self.df = self._parallel_apply(functools.partial(impute_timeseries_dataframe,
+                                                         dt_col=self.dt_col,
+                                                         mode=mode,
+                                                         const_num=const_num))
         self.df.reset_index(drop=True, inplace=True)
         return self
 
@@ -260,7 +297,9 @@ class TSDataset:
 
         :return: the tsdataset instance.
         '''
-        self.df = deduplicate_timeseries_dataframe(df=self.df, dt_col=self.dt_col)
+        self.df = self._parallel_apply(functools.partial(deduplicate_timeseries_dataframe,
+                                                         dt_col=self.dt_col),
+                                       per_group=False)
         return self
 
     def resample(self, interval, start_time=None, end_time=None, merge_mode="mean"):
@@ -289,14 +328,13 @@ class TSDataset:
         except Exception:
             raise RuntimeError("All the columns of target_col "
                                "and extra_feature_col should be of numeric type.")
-        self.df = self.df.groupby([self.id_col]) \
-            .apply(lambda df: resample_timeseries_dataframe(df=df,
-                                                            dt_col=self.dt_col,
-                                                            interval=interval,
-                                                            start_time=start_time,
-                                                            end_time=end_time,
-                                                            id_col=self.id_col,
-                                                            merge_mode=merge_mode))
+        self.df = self._parallel_apply(functools.partial(resample_timeseries_dataframe,
+                                                         dt_col=self.dt_col,
+                                                         interval=interval,
+                                                         start_time=start_time,
+                                                         end_time=end_time,
+                                                         id_col=self.id_col,
+                                                         merge_mode=merge_mode))
         self._freq = pd.Timedelta(interval)
         self._freq_certainty = True
         self.df.reset_index(drop=True, inplace=True)
@@ -337,12 +375,28 @@ class TSDataset:
         assert self._is_pd_datetime, "The time series data does not have a Pandas datetime format"\
             "(you can use pandas.to_datetime to convert a string into a datetime format.)"
         features_generated = []
-        self.df = generate_dt_features(input_df=self.df,
-                                       dt_col=self.dt_col,
-                                       features=features,
-                                       one_hot_features=one_hot_features,
-                                       freq=self._freq,
-                                       features_generated=features_generated)
+        if self._backend == "serial":
+            self.df = generate_dt_features(input_df=self.df,
+                                           dt_col=self.dt_col,
+                                           features=features,
+                                           one_hot_features=one_hot_features,
+                                           freq=self._freq,
+                                           features_generated=features_generated)
+        else:
+            # features_generated is not shared with workers, get it on the first row
+            generate_dt_features(input_df=self.df.iloc[:1],
+                                 dt_col=self.dt_col,
+                                 features=features,
+                                 one_hot_features=one_hot_features,
+                                 freq=self._freq,
+                                 features_generated=features_generated)
+            self.df = self._parallel_apply(functools.partial(generate_dt_features,
+                                                             dt_col=self.dt_col,
+                                                             features=features,
+                                                             one_hot_features=one_hot_features,
+                                                             freq=self._freq,
+                                                             features_generated=[]),
+                                           per_group=False)
         self.feature_col += features_generated
         return self
 
@@ -486,7 +540,9 @@ class TSDataset:
              lookback='auto',
              feature_col=None,
              target_col=None,
-             id_sensitive=False):
+             id_sensitive=False,
+             strided=False,
+             broadcast_additional_feature=True):
         '''
         Sampling by rolling for machine learning/deep learning models.
 
@@ -519,6 +575,21 @@ class TSDataset:
                where num_sample is the sample number of the wide dataframe,
                new_num_feature_col is the product of the number of id and the number of feature_col.
                new_num_target_col is the product of the number of id and the number of target_col.
+        :param strided: bool, if True, the samples are built as read-only sliding-window views
+               over the source array rather than shifted copies. The memory is only saved
+               for a single id without N/A values, where the result of to_numpy() is such a
+               view, which keeps the peak memory close to the size of the dataframe, and is
+               only copied (e.g. by np.array(x)) when requested. With multiple ids, the views
+               are concatenated into a new array as large as the non-strided result, and
+               the "process" backend also copies the views when they are returned from the
+               workers. Default to False.
+        :param broadcast_additional_feature: bool, only effective when gen_rolling_feature has
+               been called. If True, each sample's additional features are repeated along
+               lookback and appended to x. If False, x only contains the target and feature
+               columns, and the additional features are kept un-repeated in
+               `numpy_roll_additional_feature` in shape (num_sample, num_additional_feature),
+               which to_torch_data_loader() and to_tf_dataset() then output as a separate
+               input between x and y. to_numpy() still returns (x, y). Default to True.
 
         :return: the tsdataset instance.
 
@@ -569,29 +640,45 @@ class TSDataset:
         self.id_sensitive = id_sensitive
         roll_feature_df = None if self.roll_feature_df is None \
             else self.roll_feature_df[additional_feature_col]
+        lazy_roll_feature_df = None
+        if roll_feature_df is not None and not broadcast_additional_feature:
+            lazy_roll_feature_df, roll_feature_df = roll_feature_df, None
+            num_feature_col = len(feature_col)
 
         if lookback == 'auto':
             lookback = self.get_cycle_length('mode', top_k=3)
         rolling_result = \
-            self.df.groupby([self.id_col]) \
-                .apply(lambda df: roll_timeseries_dataframe(df=df,
-                                                            roll_feature_df=roll_feature_df,
-                                                            lookback=lookback,
-                                                            horizon=horizon,
-                                                            feature_col=feature_col,
-                                                            target_col=target_col))
+            self._parallel_apply(functools.partial(roll_timeseries_dataframe,
+                                                   roll_feature_df=roll_feature_df,
+                                                   lookback=lookback,
+                                                   horizon=horizon,
+                                                   feature_col=feature_col,
+                                                   target_col=target_col,
+                                                   strided=strided))
 
         # concat the result on required axis
         concat_axis = 2 if id_sensitive else 0
-        self.numpy_x = np.concatenate([rolling_result[i][0]
-                                       for i in self._id_list],
-                                      axis=concat_axis).astype(np.float32)
+
+        def _concat(idx):
+            arrs = [rolling_result[i][idx] for i in self._id_list]
+            if strided and len(arrs) == 1:
+                # keep the strided view, it is already float32
+                return arrs[0]
+            return np.concatenate(arrs, axis=concat_axis).astype(np.float32, copy=False)
+
+        self.numpy_x = _concat(0)
         if horizon != 0:
-            self.numpy_y = np.concatenate([rolling_result[i][1]
-                                           for i in self._id_list],
-                                          axis=concat_axis).astype(np.float32)
+            self.numpy_y = _concat(1)
         else:
             self.numpy_y = None
+        if lazy_roll_feature_df is not None:
+            self.numpy_roll_additional_feature = \
+                np.concatenate([_get_rolling_feature_array(lazy_roll_feature_df,
+                                                           rolling_result[i][0].shape[0])
+                                for i in self._id_list],
+                               axis=1 if id_sensitive else 0)
+        else:
+            self.numpy_roll_additional_feature = None
 
         # target first
         if self.id_sensitive:
@@ -619,7 +706,8 @@ class TSDataset:
                              lookback='auto',
                              horizon=None,
                              feature_col=None,
-                             target_col=None, ):
+                             target_col=None,
+                             batched=False):
         """
         Convert TSDataset to a PyTorch DataLoader with or without rolling. We recommend to use
         to_torch_data_loader(roll=True) if you don't need to output the rolled numpy array. It is
@@ -643,6 +731,10 @@ class TSDataset:
         :param target_col: str or list, indicates the target col name. Default to None,
                where we will take all target in rolling. it should be a subset of target_col
                you used to initialize the tsdataset.
+        :param batched: bool, only effective when roll is True. If True, a whole batch of
+               windows is gathered at once by a BatchSampler instead of being collated sample
+               by sample, which is much faster. Note that the batch_size attribute of the
+               returned DataLoader is None in this case. Default to False.
 
         :return: A pytorch DataLoader instance.
 
@@ -675,7 +767,8 @@ class TSDataset:
         if roll:
             if horizon is None:
                 raise ValueError("You must input horizon if roll is True")
-            from bigdl.chronos.data.utils.roll_dataset import RollDataset
+            from bigdl.chronos.data.utils.roll_dataset import RollDataset, \
+                BatchRollDataset, get_batch_roll_data_loader
             feature_col = _to_list(feature_col, "feature_col") if feature_col is not None \
                 else self.feature_col
             target_col = _to_list(target_col, "target_col") if target_col is not None \
@@ -686,12 +779,17 @@ class TSDataset:
 
             if lookback == 'auto':
                 lookback = self.get_cycle_length('mode', top_k=3)
-            torch_dataset = RollDataset(self.df,
+            dataset_cls = BatchRollDataset if batched else RollDataset
+            torch_dataset = dataset_cls(self.df,
                                         lookback=lookback,
                                         horizon=horizon,
                                         feature_col=feature_col,
                                         target_col=target_col,
                                         id_col=self.id_col)
+            if batched:
+                return get_batch_roll_data_loader(torch_dataset,
+                                                  batch_size=batch_size,
+                                                  shuffle=True)
             return DataLoader(torch_dataset,
                               batch_size=batch_size,
                               shuffle=True)
@@ -700,26 +798,85 @@ class TSDataset:
                 raise RuntimeError("Please call 'roll' method before transforming a TSDataset to "
                                    "torch DataLoader without rolling (default roll=False)!")
             x, y = self.to_numpy()
-            return DataLoader(TensorDataset(torch.from_numpy(x).float(),
-                                            torch.from_numpy(y).float()),
+            if self.numpy_roll_additional_feature is not None:
+                arrs = (x, self.numpy_roll_additional_feature, y)
+            else:
+                arrs = (x, y)
+            # the strided samples are read-only, which torch does not support
+            return DataLoader(TensorDataset(*[torch.from_numpy(arr if arr.flags.writeable
+                                                               else np.array(arr)).float()
+                                              for arr in arrs]),
                               batch_size=batch_size,
                               shuffle=True)
 
-    def to_tf_dataset(self, batch_size=32):
+    def to_tf_dataset(self,
+                      batch_size=32,
+                      roll=False,
+                      lookback='auto',
+                      horizon=None,
+                      feature_col=None,
+                      target_col=None,
+                      shuffle=True):
         """
         Export a Dataset whose elements are slices of the given tensors.
 
         :param batch_size: Number of samples per batch of computation.
                If unspecified, batch_size will default to 32.
+        :param roll: Boolean. Whether to roll the dataframe on the fly. If True, you must
+               also specify lookback and horizon for rolling, and the samples are gathered
+               batch by batch from the dataframe instead of being materialized. If False,
+               you must have called tsdataset.roll() before calling to_tf_dataset().
+               Default to False.
+        :param lookback: int, lookback value. Default to 'auto',
+               the mode of time series' cycle length will be taken as the lookback.
+        :param horizon: int or list,
+               if `horizon` is an int, we will sample `horizon` step
+               continuously after the forecasting point.
+               if `horizon` is a list, we will sample discretely according
+               to the input list.
+               specially, when `horizon` is set to 0, ground truth will be generated as None.
+        :param feature_col: str or list, indicates the feature col name. Default to None,
+               where we will take all available feature in rolling.
+        :param target_col: str or list, indicates the target col name. Default to None,
+               where we will take all target in rolling. it should be a subset of target_col
+               you used to initialize the tsdataset.
+        :param shuffle: Boolean. Whether to shuffle the samples, only effective when roll
+               is True. Default to True.
 
-        :return: a tf.data dataset, including x and y.
+        :return: a tf.data dataset, including x and y. x is a tuple (x, additional_feature)
+                 if roll() is called with broadcast_additional_feature=False.
         """
-        # TODO Requires a tf dataset creator method and can be use less memory.
         import tensorflow as tf
+        if roll:
+            if horizon is None:
+                raise ValueError("You must input horizon if roll is True")
+            from bigdl.chronos.data.utils.roll_tf_dataset import get_roll_tf_dataset
+            feature_col = _to_list(feature_col, "feature_col") if feature_col is not None \
+                else self.feature_col
+            target_col = _to_list(target_col, "target_col") if target_col is not None \
+                else self.target_col
+
+            # set scaler index for unscale_numpy
+            self.scaler_index = [self.target_col.index(t) for t in target_col]
+
+            if lookback == 'auto':
+                lookback = self.get_cycle_length('mode', top_k=3)
+            return get_roll_tf_dataset(self.df,
+                                       lookback=lookback,
+                                       horizon=horizon,
+                                       feature_col=feature_col,
+                                       target_col=target_col,
+                                       id_col=self.id_col,
+                                       batch_size=batch_size,
+                                       shuffle=shuffle)
         if self.numpy_x is None:
             raise RuntimeError("Please call 'roll' method "
                                "before transform a TSDataset to tf dataset!")
-        data = tf.data.Dataset.from_tensor_slices((self.numpy_x, self.numpy_y))
+        if self.numpy_roll_additional_feature is not None:
+            x = (self.numpy_x, self.numpy_roll_additional_feature)
+        else:
+            x = self.numpy_x
+        data = tf.data.Dataset.from_tensor_slices((x, self.numpy_y))
         return data.cache().batch(batch_size).prefetch(tf.data.AUTOTUNE)
 
     def to_numpy(self):
@@ -727,7 +884,9 @@ class TSDataset:
         Export rolling result in form of a tuple of numpy ndarray (x, y).
 
         :return: a 2-dim tuple. each item is a 3d numpy ndarray. The ndarray
-                 is casted to float32.
+                 is casted to float32. If roll() is called with
+                 broadcast_additional_feature=False, the additional features are not
+                 included in x, and are kept in `numpy_roll_additional_feature`.
         '''
         if self.numpy_x is None:
             raise RuntimeError("Please call 'roll' method "
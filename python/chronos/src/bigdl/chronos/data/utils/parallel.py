@@ -0,0 +1,210 @@
+#
+# Copyright 2016 The BigDL Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+
+BACKENDS = ("serial", "thread", "process")
+_INDEX_KEY = "__index__"
+
+
+def check_backend(backend, num_workers=None, min_rows_per_chunk=1):
+    assert backend in BACKENDS, f"backend should be one of {BACKENDS}, but found {backend}."
+    assert num_workers is None or (isinstance(num_workers, int) and num_workers > 0), \
+        f"num_workers should be a positive int or None, but found {num_workers}."
+    assert isinstance(min_rows_per_chunk, int) and min_rows_per_chunk > 0, \
+        f"min_rows_per_chunk should be a positive int, but found {min_rows_per_chunk}."
+
+
+def split_id_chunks(group_sizes, num_workers, min_rows_per_chunk):
+    '''
+    partition consecutive groups into chunks so that each chunk has about the same number
+    of rows while small groups are batched together.
+
+    :param group_sizes: 1-d ndarray, the row number of each group.
+    :param num_workers: int, the number of workers.
+    :param min_rows_per_chunk: int, a chunk is closed only after it has reached this size.
+
+    :return: a list of (start, stop) group index pairs.
+    '''
+    total_rows = int(group_sizes.sum())
+    # several chunks per worker to balance the load of uneven groups
+    target_rows = max(min_rows_per_chunk, -(-total_rows // (num_workers * 4)))
+    chunks = []
+    start, rows = 0, 0
+    for i, size in enumerate(group_sizes):
+        rows += size
+        if rows >= target_rows:
+            chunks.append((start, i + 1))
+            start, rows = i + 1, 0
+    if start < len(group_sizes):
+        chunks.append((start, len(group_sizes)))
+    return chunks
+
+
+def _apply_on_chunk(df, labels, func, id_col, per_group):
+    # the index of df is the sorted row position in the original dataframe,
+    # the returned positions are used to reassemble the rows in their original order
+    if per_group:
+        positions = df.index.to_numpy()
+        df.index = labels
+        res = df.groupby([id_col]).apply(func)
+        if isinstance(res, (pd.DataFrame, pd.Series)) and res.index.equals(df.index):
+            # transform-like result, pandas keeps the original row order
+            return res, positions
+        return res, None
+    res = func(df)
+    positions = res.index.to_numpy()
+    res.index = labels[df.index.get_indexer(positions)]
+    return res, positions
+
+
+def _process_chunk(shm_spec, object_cols, positions, columns, func, id_col, per_group):
+    from multiprocessing import shared_memory
+    shms, data = [], {}
+    try:
+        for col, (name, dtype, size) in shm_spec.items():
+            shm = shared_memory.SharedMemory(name=name)
+            shms.append(shm)
+            data[col] = np.ndarray((size,), dtype=dtype, buffer=shm.buf)[positions]
+    finally:
+        for shm in shms:
+            shm.close()
+    data.update(object_cols)
+    labels = data.pop(_INDEX_KEY)
+    df = pd.DataFrame({col: data[col] for col in columns}, index=positions)
+    return _apply_on_chunk(df, labels, func, id_col, per_group)
+
+
+def _thread_chunk(df, positions, func, id_col, per_group):
+    chunk = df.take(positions)
+    labels = chunk.index.to_numpy()
+    chunk.index = positions
+    return _apply_on_chunk(chunk, labels, func, id_col, per_group)
+
+
+def _to_shared_memory(df):
+    '''
+    put numpy-native columns (and index) of df in shared memory, other columns are kept
+    as ndarray and only the rows of a chunk are pickled to its worker.
+    '''
+    from multiprocessing import shared_memory
+    arrays = {col: df[col].to_numpy() for col in df.columns}
+    arrays[_INDEX_KEY] = df.index.to_numpy()
+    shms, shm_spec, object_cols = [], {}, {}
+    for col, arr in arrays.items():
+        if arr.dtype.kind in "biufmM" and arr.nbytes > 0:
+            shm = shared_memory.SharedMemory(create=True, size=arr.nbytes)
+            shms.append(shm)
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+            shm_spec[col] = (shm.name, arr.dtype, arr.size)
+        else:
+            object_cols[col] = arr
+    return shms, shm_spec, object_cols
+
+
+def _is_picklable(func):
+    try:
+        pickle.dumps(func)
+        return True
+    except Exception:
+        return False
+
+
+def parallel_apply(df,
+                   id_col,
+                   func,
+                   per_group=True,
+                   backend="serial",
+                   num_workers=None,
+                   min_rows_per_chunk=10000):
+    '''
+    apply func on each id of the dataframe in parallel.
+
+    :param df: input dataframe.
+    :param id_col: name of id column.
+    :param func: a function that takes a dataframe. It should be picklable (e.g. a
+           module level function or a functools.partial of it) for "process" backend.
+    :param per_group: if True, func is applied on the dataframe of each id and the result
+           is the same as df.groupby([id_col]).apply(func). If False, func is a row-wise
+           transform applied on a dataframe of several ids, and the resulting rows are
+           reordered as they are in df.
+    :param backend: "serial", "thread" or "process". "process" puts numpy columns in shared
+           memory and falls back to "thread" if shared memory is not available or func is
+           not picklable.
+    :param num_workers: the number of workers, default to the number of cpu cores.
+    :param min_rows_per_chunk: ids are batched into chunks with at least this number of rows
+           to amortize the overhead of scheduling.
+    '''
+    check_backend(backend, num_workers, min_rows_per_chunk)
+    num_workers = num_workers or os.cpu_count() or 1
+    if backend == "serial" or num_workers == 1 or len(df.index) == 0:
+        return df.groupby([id_col]).apply(func) if per_group else func(df)
+
+    codes = df.groupby([id_col], sort=True).ngroup().to_numpy()
+    order = np.argsort(codes, kind="stable")
+    group_sizes = np.bincount(codes)
+    offsets = np.concatenate([[0], np.cumsum(group_sizes)])
+    chunks = [np.sort(order[offsets[start]:offsets[stop]])
+              for start, stop in split_id_chunks(group_sizes, num_workers, min_rows_per_chunk)]
+
+    if backend == "process":
+        try:
+            from multiprocessing import shared_memory
+        except ImportError:
+            warnings.warn("shared_memory is not available, fall back to thread backend.")
+            backend = "thread"
+    if backend == "process" and not _is_picklable(func):
+        warnings.warn("func is not picklable, fall back to thread backend.")
+        backend = "thread"
+
+    if backend == "process":
+        from concurrent.futures import ProcessPoolExecutor
+        shms, shm_spec, object_cols = _to_shared_memory(df)
+        try:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                futures = [executor.submit(_process_chunk,
+                                           shm_spec,
+                                           {col: arr[positions]
+                                            for col, arr in object_cols.items()},
+                                           positions,
+                                           list(df.columns),
+                                           func,
+                                           id_col,
+                                           per_group)
+                           for positions in chunks]
+                results = [future.result() for future in futures]
+        finally:
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(lambda positions: _thread_chunk(df, positions, func,
+                                                                        id_col, per_group),
+                                        chunks))
+
+    res = pd.concat([res for res, _ in results])
+    if any(positions is None for _, positions in results):
+        return res
+    # reassemble the rows in their original order
+    positions = np.concatenate([positions for _, positions in results])
+    return res.iloc[np.argsort(positions, kind="stable")]
@@ -23,7 +23,8 @@ def roll_timeseries_dataframe(df,
                               lookback,
                               horizon,
                               feature_col,
-                              target_col):
+                              target_col,
+                              strided=False):
     """
     roll dataframe into numpy ndarray sequence samples.
 
@@ -38,6 +39,9 @@ def roll_timeseries_dataframe(df,
            to the input list. 1 means the timestamp just after the observed data.
     :param feature_col: list, indicate the feature col name.
     :param target_col: list, indicate the target col name.
+    :param strided: bool, if True, windows are built as read-only strided views over
+           the source array instead of shifted copies. The views are only materialized
+           when some window has to be dropped because of N/A values.
     :return: x, y
         x: 3-d numpy array in format (no. of samples, lookback, feature_col length)
         y: 3-d numpy array in format (no. of samples, horizon, target_col length)
@@ -60,40 +64,64 @@ def roll_timeseries_dataframe(df,
                                                 lookback,
                                                 horizon,
                                                 feature_col,
-                                                target_col)
+                                                target_col,
+                                                strided)
     else:
         return _roll_timeseries_dataframe_test(df,
                                                roll_feature_df,
                                                lookback,
                                                feature_col,
-                                               target_col)
+                                               target_col,
+                                               strided)
+
+
+def get_roll_start_idx(df, id_col, window_size):
+    import itertools
+    if not id_col:
+        id_start_idxes = [0, len(df.index)]
+    else:
+        id_start_idxes = df.index[df[id_col] != df[id_col].shift(1)].tolist() + [len(df.index)]
+    roll_start_idx_iter = ((range(id_start_idxes[i], id_start_idxes[i+1] - window_size + 1))
+                           for i in range(len(id_start_idxes) - 1))
+    roll_start_idxes = np.fromiter(itertools.chain.from_iterable(roll_start_idx_iter), np.int64)
+    return roll_start_idxes
+
+
+def _get_rolling_feature_array(roll_feature_df, num_sample):
+    '''
+    return the additional feature of the first `num_sample` samples
+    as a float32 ndarray in shape (num_sample, num_additional_feature)
+    '''
+    return roll_feature_df.iloc[:num_sample].to_numpy(dtype=np.float32)
 
 
 def _append_rolling_feature_df(rolling_result,
                                roll_feature_df):
     if roll_feature_df is None:
         return rolling_result
-    additional_rolling_result = np.zeros((rolling_result.shape[0],
-                                         rolling_result.shape[1],
-                                         len(roll_feature_df.columns)))
-    for idx in range(additional_rolling_result.shape[0]):
-        for col_idx in range(additional_rolling_result.shape[2]):
-            additional_rolling_result[idx, :, col_idx] = roll_feature_df.iloc[idx, col_idx]
-    rolling_result = np.concatenate([rolling_result, additional_rolling_result], axis=2)
-    return rolling_result
+    num_sample, lookback, num_feature = rolling_result.shape
+    additional_feature = _get_rolling_feature_array(roll_feature_df, num_sample)
+    result = np.empty((num_sample, lookback, num_feature + additional_feature.shape[1]),
+                      dtype=np.result_type(rolling_result.dtype, np.float32))
+    result[:, :, :num_feature] = rolling_result
+    # broadcast each sample's additional feature along lookback
+    result[:, :, num_feature:] = additional_feature[:, np.newaxis, :]
+    return result
 
 
 def _roll_timeseries_dataframe_test(df,
                                     roll_feature_df,
                                     lookback,
                                     feature_col,
-                                    target_col):
+                                    target_col,
+                                    strided=False):
     x = df.loc[:, target_col+feature_col].values.astype(np.float32)
 
-    output_x, mask_x = _roll_timeseries_ndarray(x, lookback)
+    roll_func = _roll_timeseries_ndarray_strided if strided else _roll_timeseries_ndarray
+    output_x, mask_x = roll_func(x, lookback)
     mask = (mask_x == 1)
 
-    x = _append_rolling_feature_df(output_x[mask], roll_feature_df)
+    x = _append_rolling_feature_df(_select_by_mask(output_x, mask), roll_feature_df)
 
     return x, None
 
@@ -103,18 +131,27 @@ def _roll_timeseries_dataframe_train(df,
                                      lookback,
                                      horizon,
                                      feature_col,
-                                     target_col):
+                                     target_col,
+                                     strided=False):
     max_horizon = horizon if isinstance(horizon, int) else max(horizon)
     x = df[:-max_horizon].loc[:, target_col+feature_col].values.astype(np.float32)
     y = df.iloc[lookback:].loc[:, target_col].values.astype(np.float32)
 
-    output_x, mask_x = _roll_timeseries_ndarray(x, lookback)
-    output_y, mask_y = _roll_timeseries_ndarray(y, horizon)
+    roll_func = _roll_timeseries_ndarray_strided if strided else _roll_timeseries_ndarray
+    output_x, mask_x = roll_func(x, lookback)
+    output_y, mask_y = roll_func(y, horizon)
     mask = (mask_x == 1) & (mask_y == 1)
 
-    x = _append_rolling_feature_df(output_x[mask], roll_feature_df)
+    x = _append_rolling_feature_df(_select_by_mask(output_x, mask), roll_feature_df)
+
+    return x, _select_by_mask(output_y, mask)
+
 
-    return x, output_y[mask]
+def _select_by_mask(arr, mask):
+    # boolean indexing always copies, keep the (possibly strided) view if nothing is dropped
+    if mask.all():
+        return arr
+    return arr[mask]
 
 
 def _shift(arr, num, fill_value=np.nan):
@@ -156,3 +193,35 @@ def _roll_timeseries_ndarray(data, window):
     mask = ~np.any(np.isnan(roll_data), axis=(1, 2))
 
     return roll_data, mask
+
+
+def _roll_timeseries_ndarray_strided(data, window):
+    '''
+    Same as _roll_timeseries_ndarray, but the windows are read-only views built by
+    numpy stride tricks, so no copy of the data is made for an int window.
+    data should be a ndarray with num_dim = 2
+    first dim is timestamp
+    second dim is feature
+    '''
+    assert data.ndim == 2  # (num_timestep, num_feature)
+    data = np.ascontiguousarray(data)
+
+    window_size = window if isinstance(window, int) else max(window)
+    num_sample = max(data.shape[0] - window_size + 1, 0)
+    roll_data = np.lib.stride_tricks.as_strided(data,
+                                                shape=(num_sample, window_size, data.shape[1]),
+                                                strides=(data.strides[0],) + data.strides,
+                                                writeable=False)
+
+    # a window is valid iff it contains no n/a record, count n/a records by cumsum
+    nan_count = np.concatenate([[0], np.cumsum(np.isnan(data).any(axis=1))])
+    if isinstance(window, int):
+        mask = (nan_count[window_size:window_size + num_sample] - nan_count[:num_sample]) == 0
+    else:
+        # only the sampled steps are checked for a discrete window
+        window_idx = np.array(window) - 1
+        roll_data = roll_data[:, window_idx, :]
+        nan_step = np.diff(nan_count).astype(bool)
+        mask = ~nan_step[np.arange(num_sample)[:, None] + window_idx].any(axis=1)
+
+    return roll_data, mask
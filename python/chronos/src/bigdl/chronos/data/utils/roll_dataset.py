@@ -19,18 +19,7 @@ from torch.utils.data import Dataset
 import torch
 
 from bigdl.chronos.data.utils.utils import _check_cols_no_na, _to_list
-
-
-def get_roll_start_idx(df, id_col, window_size):
-    import itertools
-    if not id_col:
-        id_start_idxes = [0, len(df.index)]
-    else:
-        id_start_idxes = df.index[df[id_col] != df[id_col].shift(1)].tolist() + [len(df.index)]
-    roll_start_idx_iter = ((range(id_start_idxes[i], id_start_idxes[i+1] - window_size + 1))
-                           for i in range(len(id_start_idxes) - 1))
-    roll_start_idxes = np.fromiter(itertools.chain.from_iterable(roll_start_idx_iter), np.int)
-    return roll_start_idxes
+from bigdl.chronos.data.utils.roll import get_roll_start_idx
 
 
 class RollDataset(Dataset):
@@ -68,6 +57,8 @@ class RollDataset(Dataset):
         self.lookback = lookback
         self.horizon = horizon
         self.target_num = len(target_col)
+        self.arr_target_only = self.arr[:, :self.target_num]
+        self.horizons = None if isinstance(horizon, int) else np.array(horizon)
 
     def __len__(self):
         return self.roll_start_idxes.size
@@ -80,12 +71,69 @@ class RollDataset(Dataset):
             return x
 
         # cal y
-        arr_target_only = self.arr[:, :self.target_num]
         if isinstance(self.horizon, int):
-            y = arr_target_only[start_idx + self.lookback: start_idx + self.lookback + self.horizon]
+            y = self.arr_target_only[start_idx + self.lookback:
+                                     start_idx + self.lookback + self.horizon]
         else:
             # horizon is a list of int
-            horizons = np.array(self.horizon)
-            y = np.take(arr_target_only, horizons + start_idx + self.lookback - 1, axis=0)
+            y = np.take(self.arr_target_only, self.horizons + start_idx + self.lookback - 1, axis=0)
         y = torch.from_numpy(y).float()
         return x, y
+
+
+class BatchRollDataset(RollDataset):
+    def __init__(self, df, lookback, horizon, feature_col, target_col, id_col=None):
+        """
+        A RollDataset whose __getitem__ takes a batch of indices and gathers all the windows
+        of the batch with one fancy-index operation into a float32 buffer. It should be used
+        with a BatchSampler (e.g. through `get_batch_roll_data_loader`) so that no collate is
+        done on individual samples.
+
+        The parameters are the same as RollDataset.
+        """
+        super().__init__(df, lookback, horizon, feature_col, target_col, id_col)
+        self.arr = np.ascontiguousarray(self.arr, dtype=np.float32)
+        self.arr_target_only = np.ascontiguousarray(self.arr[:, :self.target_num])
+        # offsets of each step in a window relative to its start index
+        self.x_offset = np.arange(lookback)
+        if isinstance(horizon, int):
+            self.y_offset = np.arange(lookback, lookback + horizon)
+        else:
+            self.y_offset = self.horizons + lookback - 1
+
+    def __getitem__(self, idx):
+        if np.isscalar(idx):
+            batch = self[[idx]]
+            return batch[0] if self.horizon == 0 else (batch[0][0], batch[1][0])
+
+        start_idx = self.roll_start_idxes[np.asarray(idx)]
+        x = np.empty((start_idx.size, self.x_offset.size, self.arr.shape[1]), dtype=np.float32)
+        np.take(self.arr, start_idx[:, np.newaxis] + self.x_offset, axis=0, out=x)
+        x = torch.from_numpy(x)
+        if self.horizon == 0:
+            return x
+
+        y = np.empty((start_idx.size, self.y_offset.size, self.target_num), dtype=np.float32)
+        np.take(self.arr_target_only, start_idx[:, np.newaxis] + self.y_offset, axis=0, out=y)
+        y = torch.from_numpy(y)
+        return x, y
+
+
+def get_batch_roll_data_loader(dataset, batch_size, shuffle=True, drop_last=False, **kwargs):
+    """
+    Create a DataLoader on a BatchRollDataset which samples a batch of indices at once.
+
+    :param dataset: a BatchRollDataset instance.
+    :param batch_size: int, the number of samples per batch.
+    :param shuffle: bool, whether to shuffle the samples. Default to True.
+    :param drop_last: bool, whether to drop the last incomplete batch. Default to False.
+    :param kwargs: Any additional kwargs are passed to the DataLoader.
+
+    :return: A pytorch DataLoader instance, whose batch_size is None since batching
+             is done by the sampler.
+    """
+    from torch.utils.data import DataLoader, BatchSampler, RandomSampler, SequentialSampler
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    batch_sampler = BatchSampler(sampler, batch_size=batch_size, drop_last=drop_last)
+    # batch_size=None disables auto-collation, the dataset returns a whole batch
+    return DataLoader(dataset, sampler=batch_sampler, batch_size=None, **kwargs)
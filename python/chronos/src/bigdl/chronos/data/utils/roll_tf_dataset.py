@@ -0,0 +1,85 @@
+#
+# Copyright 2016 The BigDL Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import numpy as np
+
+from bigdl.chronos.data.utils.utils import _check_cols_no_na, _to_list
+from bigdl.chronos.data.utils.roll import get_roll_start_idx
+
+
+def get_roll_tf_dataset(df,
+                        lookback,
+                        horizon,
+                        feature_col,
+                        target_col,
+                        id_col=None,
+                        batch_size=32,
+                        shuffle=True):
+    """
+    Create a tf.data dataset which rolls the dataframe on the fly. Only the start indices
+    of the samples are shuffled and batched, and the windows of a batch are gathered from
+    the base array in parallel, so the rolled samples are never materialized as a whole.
+    The samples are the same as RollDataset.
+
+    :param df: The dataframe to roll on. The dataframe could contain single id value or
+           multiple id values. If the dataframe contains multiple ids, the rows of same id
+           should be consecutive. And dataframe should have been ordered by timestamp for
+           each id.
+    :param lookback: the length of the past sequence
+    :param horizon: int or list,
+           if `horizon` is an int, we will sample `horizon` step
+           continuously after the forecasting point.
+           if `horizon` is an list, we will sample discretely according
+           to the input list. 1 means the timestamp just after the observed data.
+           specially, when `horizon` is set to 0, only x will be generated.
+    :param feature_col: list, indicate the feature col name.
+    :param target_col: list, indicate the target col name.
+    :param id_col: (optional) a str indicates the col name of dataframe id
+    :param batch_size: Number of samples per batch. Default to 32.
+    :param shuffle: bool, whether to shuffle the samples. Default to True.
+
+    :return: a tf.data dataset, including x and y (only x if horizon is 0).
+    """
+    import tensorflow as tf
+    df = df.reset_index(drop=True)
+    feature_col = _to_list(feature_col, "feature_col")
+    target_col = _to_list(target_col, "target_col")
+    _check_cols_no_na(df, col_names=target_col + feature_col)
+    arr = df.loc[:, target_col + feature_col].to_numpy(dtype=np.float32)
+    max_horizon = horizon if isinstance(horizon, int) else max(horizon)
+    roll_start_idxes = get_roll_start_idx(df, id_col, window_size=lookback + max_horizon)
+
+    arr = tf.constant(arr)
+    arr_target_only = arr[:, :len(target_col)]
+    x_offset = tf.range(lookback, dtype=tf.int64)
+    if isinstance(horizon, int):
+        y_offset = tf.range(lookback, lookback + horizon, dtype=tf.int64)
+    else:
+        y_offset = tf.constant(np.array(horizon) + lookback - 1, dtype=tf.int64)
+
+    def gather_windows(start_idx):
+        start_idx = tf.expand_dims(start_idx, axis=1)
+        x = tf.gather(arr, start_idx + x_offset)
+        if horizon == 0:
+            return x
+        return x, tf.gather(arr_target_only, start_idx + y_offset)
+
+    data = tf.data.Dataset.from_tensor_slices(roll_start_idxes)
+    if shuffle:
+        data = data.shuffle(max(len(roll_start_idxes), 1), reshuffle_each_iteration=True)
+    data = data.batch(batch_size)
+    data = data.map(gather_windows, num_parallel_calls=tf.data.AUTOTUNE)
+    return data.prefetch(tf.data.AUTOTUNE)
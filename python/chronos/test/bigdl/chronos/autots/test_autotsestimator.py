@@ -486,7 +486,8 @@ class TestAutoTrainer(TestCase):
                                          metric="mse",
                                          loss=torch.nn.MSELoss(),
                                          cpus_per_trial=2,
-                                         name="auto_trainer")
+                                         name="auto_trainer",
+                                         window_cache_bytes=1024 ** 2)
 
         auto_estimator.fit(data=train_ts,
                            epochs=1,
@@ -495,6 +496,28 @@ class TestAutoTrainer(TestCase):
                            n_sampling=1)
         config = auto_estimator.get_best_config()
         assert config['past_seq_len'] == 6
+        # the actor sharing the rolled data is killed once the search finishes
+        assert auto_estimator._window_cache is None
+
+    def test_window_cache(self):
+        import ray
+        from bigdl.chronos.autots.utils import WindowCache
+        tsdata = get_tsdataset()
+        x, y = tsdata.roll(lookback=7, horizon=1).to_numpy()
+        # room for one window only
+        window_cache = ray.remote(WindowCache).remote({"train": tsdata},
+                                                      max_bytes=x.nbytes + y.nbytes)
+        ref = ray.get(window_cache.get.remote("train", 7, 1, ["extra feature 1"]))[0]
+        assert ray.get(window_cache.get.remote("train", 7, 1, ["extra feature 1"]))[0] == ref
+        cached_x, cached_y = ray.get(ref)
+        assert cached_x.shape == (x.shape[0], 7, 3)
+        np.testing.assert_array_equal(cached_y, y)
+
+        for lookback in [5, 6]:
+            ray.get(window_cache.get.remote("train", lookback, 1, ["extra feature 1"]))
+        stats = ray.get(window_cache.stats.remote())
+        assert stats["hits"] == 1 and stats["misses"] == 3
+        assert stats["cached_windows"] == 1
 
     def test_future_list_input(self):
         sample_num = np.random.randint(100, 200)
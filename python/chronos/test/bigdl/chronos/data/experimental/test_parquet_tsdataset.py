@@ -0,0 +1,142 @@
+#
+# Copyright 2016 The BigDL Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import shutil
+import tempfile
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from unittest import TestCase
+from bigdl.chronos.data import TSDataset
+from bigdl.chronos.data.experimental import ParquetTSDataset
+
+from numpy.testing import assert_array_almost_equal
+
+
+def get_multi_id_ts_df():
+    sample_num = 300
+    train_df = pd.DataFrame({"datetime": np.tile(pd.date_range('1/1/2019', periods=100,
+                                                               freq="H"), 3),
+                             "value": np.random.randn(sample_num),
+                             "id": np.repeat(['00', '01', '02'], 100),
+                             "extra feature": np.random.randn(sample_num)})
+    train_df.loc[[3, 10, 150], "value"] = np.nan
+    return train_df
+
+
+class TestParquetTSDataset(TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.df = get_multi_id_ts_df()
+        self.path = os.path.join(self.temp_dir, "data.parquet")
+        self.df.to_parquet(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def get_datasets(self):
+        from sklearn.preprocessing import StandardScaler
+        tsdata = TSDataset.from_pandas(self.df, dt_col="datetime", target_col="value",
+                                       extra_feature_col=["extra feature"], id_col="id")
+        tsdata.impute().gen_dt_feature().scale(StandardScaler())
+        parquet_tsdata = ParquetTSDataset.from_parquet(self.path, dt_col="datetime",
+                                                       target_col="value",
+                                                       extra_feature_col=["extra feature"],
+                                                       id_col="id",
+                                                       partition_dir=os.path.join(self.temp_dir,
+                                                                                  "partition"))
+        parquet_tsdata.impute().gen_dt_feature().scale(StandardScaler())
+        assert parquet_tsdata.feature_col == tsdata.feature_col
+        return tsdata, parquet_tsdata
+
+    def test_parquet_tsdataset_to_torch_data_loader(self):
+        tsdata, parquet_tsdata = self.get_datasets()
+        lookback, horizon = 5, 2
+        tsdata.roll(lookback=lookback, horizon=horizon)
+        x, y = tsdata.to_numpy()
+
+        loader = parquet_tsdata.to_torch_data_loader(lookback=lookback, horizon=horizon,
+                                                     batch_size=16, shuffle=False)
+        batches = list(loader)
+        assert all(x_batch.shape[0] == 16 for x_batch, _ in batches[:-1])
+        assert_array_almost_equal(x, np.concatenate([x_batch.numpy() for x_batch, _ in batches]))
+        assert_array_almost_equal(y, np.concatenate([y_batch.numpy() for _, y_batch in batches]))
+
+        # test, multiple workers
+        loader = parquet_tsdata.to_torch_data_loader(lookback=lookback, horizon=0,
+                                                     batch_size=16, num_workers=2)
+        assert sum(x_batch.shape[0] for x_batch in loader) == 3 * (100 - lookback + 1)
+
+        # horizon list
+        loader = parquet_tsdata.to_torch_data_loader(lookback=lookback, horizon=[1, 3])
+        for x_batch, y_batch in loader:
+            assert tuple(x_batch.shape) == (32, lookback, len(tsdata.feature_col) + 1)
+            assert tuple(y_batch.shape) == (32, 2, 1)
+            break
+
+    def test_parquet_tsdataset_to_tf_dataset(self):
+        tsdata, parquet_tsdata = self.get_datasets()
+        lookback, horizon = 5, 2
+        tsdata.roll(lookback=lookback, horizon=horizon)
+        x, y = tsdata.to_numpy()
+
+        data = parquet_tsdata.to_tf_dataset(lookback=lookback, horizon=horizon,
+                                            batch_size=16, shuffle=False)
+        batches = list(data)
+        assert_array_almost_equal(x, np.concatenate([x_batch.numpy() for x_batch, _ in batches]))
+        assert_array_almost_equal(y, np.concatenate([y_batch.numpy() for _, y_batch in batches]))
+
+        data = parquet_tsdata.to_tf_dataset(lookback=lookback, horizon=0, batch_size=16)
+        assert sum(x_batch.shape[0] for x_batch in data) == 3 * (100 - lookback + 1)
+
+    def test_parquet_tsdataset_scale_without_partial_fit(self):
+        from sklearn.preprocessing import RobustScaler
+        parquet_tsdata = ParquetTSDataset.from_parquet(self.path, dt_col="datetime",
+                                                       target_col="value", id_col="id")
+        with pytest.raises(AssertionError):
+            parquet_tsdata.scale(RobustScaler())
+
+    def test_parquet_tsdataset_single_id_segments(self):
+        df = self.df[self.df["id"] == "00"].drop(columns="id")
+        path = os.path.join(self.temp_dir, "single.parquet")
+        df.to_parquet(path)
+        tsdata = TSDataset.from_pandas(df, dt_col="datetime", target_col="value",
+                                       extra_feature_col=["extra feature"])
+        tsdata.impute().gen_dt_feature()
+        parquet_tsdata = ParquetTSDataset.from_parquet(path, dt_col="datetime",
+                                                       target_col="value",
+                                                       extra_feature_col=["extra feature"],
+                                                       segment_size=30)
+        assert len(parquet_tsdata._id_list) == 4
+        parquet_tsdata.impute().gen_dt_feature()
+        lookback, horizon = 5, 2
+        x, y = tsdata.roll(lookback=lookback, horizon=horizon).to_numpy()
+        batches = list(parquet_tsdata.to_torch_data_loader(lookback=lookback, horizon=horizon,
+                                                           shuffle=False))
+        assert_array_almost_equal(x, np.concatenate([x_batch.numpy() for x_batch, _ in batches]))
+        assert_array_almost_equal(y, np.concatenate([y_batch.numpy() for _, y_batch in batches]))
+
+    def test_parquet_tsdataset_close(self):
+        parquet_tsdata = ParquetTSDataset.from_parquet(self.path, dt_col="datetime",
+                                                       target_col="value", id_col="id")
+        partition_dir = parquet_tsdata.path
+        assert os.path.exists(partition_dir)
+        parquet_tsdata.close()
+        assert not os.path.exists(partition_dir)
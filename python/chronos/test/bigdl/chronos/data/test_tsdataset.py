@@ -276,6 +276,27 @@ class TestTSDataset(ZooTestCase):
         assert y is None
         tsdata._check_basic_invariants()
 
+    def test_tsdataset_roll_strided(self):
+        import warnings
+        df = get_ts_df()
+        horizon = random.randint(1, 10)
+        lookback = random.randint(1, 20)
+        tsdata = TSDataset.from_pandas(df, dt_col="datetime", target_col="value",
+                                       extra_feature_col=["extra feature"], id_col="id")
+        x, y = tsdata.roll(lookback=lookback, horizon=horizon).to_numpy()
+        x_strided, y_strided = tsdata.roll(lookback=lookback, horizon=horizon,
+                                           strided=True).to_numpy()
+        np.testing.assert_array_equal(x, x_strided)
+        np.testing.assert_array_equal(y, y_strided)
+        assert not x_strided.flags.writeable
+
+        # the read-only samples are copied for torch without warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            loader = tsdata.to_torch_data_loader(batch_size=len(x), roll=False)
+        x_batch, y_batch = next(iter(loader))
+        assert x_batch.shape == x.shape
+
     def test_tsdataset_roll_multi_id(self):
         df = get_multi_id_ts_df()
         horizon = random.randint(1, 10)
@@ -373,6 +394,17 @@ class TestTSDataset(ZooTestCase):
                 assert tuple(y_batch.size()) == (batch_size, horizon, 1)
                 break
 
+            # batched
+            torch_loader = tsdata.to_torch_data_loader(batch_size=batch_size,
+                                                       roll=True,
+                                                       lookback=lookback,
+                                                       horizon=horizon,
+                                                       batched=True)
+            for x_batch, y_batch in torch_loader:
+                assert tuple(x_batch.size()) == (batch_size, lookback, 2)
+                assert tuple(y_batch.size()) == (batch_size, horizon, 1)
+                break
+
             # test
             torch_loader = tsdata.to_torch_data_loader(batch_size=batch_size,
                                                        roll=True,
@@ -504,6 +536,24 @@ class TestTSDataset(ZooTestCase):
         assert val[0].numpy().shape == (batch_size, lookback, 2)
         assert val[1].numpy().shape == (batch_size, horizon, 1)
 
+        # roll on the fly
+        x, y = tsdata.to_numpy()
+        data = tsdata.to_tf_dataset(batch_size=batch_size, roll=True, lookback=lookback,
+                                    horizon=horizon, shuffle=False)
+        assert_array_almost_equal(x, np.concatenate([val[0].numpy() for val in data]))
+        assert_array_almost_equal(y, np.concatenate([val[1].numpy() for val in data]))
+
+        data = tsdata.to_tf_dataset(batch_size=batch_size, roll=True, lookback=lookback,
+                                    horizon=[1, 3])
+        val = next(iter(data))
+        assert val[0].numpy().shape == (batch_size, lookback, 2)
+        assert val[1].numpy().shape == (batch_size, 2, 1)
+
+        data = tsdata.to_tf_dataset(batch_size=batch_size, roll=True, lookback=lookback,
+                                    horizon=0)
+        val = next(iter(data))
+        assert val.numpy().shape == (batch_size, lookback, 2)
+
     def test_tsdataset_imputation(self):
         for val in ["last", "const", "linear"]:
             df = get_ugly_ts_df()
@@ -898,6 +948,26 @@ class TestTSDataset(ZooTestCase):
         assert x.shape == ((50-lookback-horizon+1), lookback, feature_num*2)
         assert y.shape == ((50-lookback-horizon+1), horizon, 2)
 
+        # roll without broadcasting the additional feature along lookback
+        additional_num = len(tsdata.roll_additional_feature)
+        tsdata.roll(lookback=lookback, horizon=horizon, broadcast_additional_feature=False)
+        x_lazy, _ = tsdata.to_numpy()
+        assert x_lazy.shape == ((50-lookback-horizon+1)*2, lookback, feature_num-additional_num)
+        additional_feature = tsdata.numpy_roll_additional_feature
+        assert additional_feature.shape == ((50-lookback-horizon+1)*2, additional_num)
+        x_batch, feature_batch, y_batch = next(iter(tsdata.to_torch_data_loader(batch_size=4)))
+        assert x_batch.shape == (4, lookback, feature_num-additional_num)
+        assert feature_batch.shape == (4, additional_num)
+        assert y_batch.shape == (4, horizon, 1)
+        (x_batch, feature_batch), y_batch = next(iter(tsdata.to_tf_dataset(batch_size=4)))
+        assert x_batch.shape == (4, lookback, feature_num-additional_num)
+        assert feature_batch.shape == (4, additional_num)
+        tsdata.roll(lookback=lookback, horizon=horizon)
+        x, _ = tsdata.to_numpy()
+        np.testing.assert_array_almost_equal(x[:, :, feature_num-additional_num:],
+                                             np.repeat(additional_feature[:, np.newaxis, :],
+                                                       lookback, axis=1))
+
         tsdata._check_basic_invariants()
 
     def test_check_scale_sequence(self):
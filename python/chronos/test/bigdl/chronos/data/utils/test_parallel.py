@@ -0,0 +1,94 @@
+#
+# Copyright 2016 The BigDL Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import pytest
+import functools
+import numpy as np
+import pandas as pd
+
+from bigdl.chronos.data import TSDataset
+from bigdl.chronos.data.utils.impute import impute_timeseries_dataframe
+from bigdl.chronos.data.utils.deduplicate import deduplicate_timeseries_dataframe
+from bigdl.chronos.data.utils.parallel import parallel_apply, split_id_chunks
+
+
+def get_multi_id_ts_df():
+    sample_num = 300
+    train_df = pd.DataFrame({"datetime": np.tile(pd.date_range('1/1/2019', periods=100), 3),
+                             "value": np.random.randn(sample_num),
+                             "id": np.repeat(['00', '01', '02'], 100),
+                             "extra feature": np.random.randn(sample_num)})
+    # rows of different ids are interleaved
+    train_df = train_df.sort_values("datetime", kind="stable").reset_index(drop=True)
+    train_df.loc[[3, 10, 50], "value"] = np.nan
+    return train_df
+
+
+class TestParallel:
+
+    def test_split_id_chunks(self):
+        group_sizes = np.array([1, 1, 1, 50, 1, 1, 30])
+        chunks = split_id_chunks(group_sizes, num_workers=2, min_rows_per_chunk=3)
+        # small groups are batched together
+        assert chunks == [(0, 4), (4, 7)]
+        chunks = split_id_chunks(group_sizes, num_workers=2, min_rows_per_chunk=60)
+        assert chunks == [(0, 7)]
+
+    @pytest.mark.parametrize("backend", ["thread", "process"])
+    def test_parallel_apply(self, backend):
+        df = get_multi_id_ts_df()
+        func = functools.partial(impute_timeseries_dataframe, dt_col="datetime")
+        expected = df.groupby(["id"]).apply(func)
+        res = parallel_apply(df, "id", func, backend=backend,
+                             num_workers=2, min_rows_per_chunk=10)
+        pd.testing.assert_frame_equal(expected, res)
+
+        df_dup = pd.concat([df, df.iloc[:20]]).reset_index(drop=True)
+        func = functools.partial(deduplicate_timeseries_dataframe, dt_col="datetime")
+        res = parallel_apply(df_dup, "id", func, per_group=False, backend=backend,
+                             num_workers=2, min_rows_per_chunk=10)
+        pd.testing.assert_frame_equal(func(df_dup), res)
+
+    def test_parallel_apply_not_picklable(self):
+        df = get_multi_id_ts_df()
+        with pytest.warns(UserWarning):
+            res = parallel_apply(df, "id", lambda df: df["value"].sum(),
+                                 backend="process", num_workers=2, min_rows_per_chunk=10)
+        pd.testing.assert_series_equal(df.groupby(["id"]).apply(lambda df: df["value"].sum()),
+                                       res)
+
+    def test_tsdataset_backend(self):
+        df = get_multi_id_ts_df()
+
+        def preprocess(backend):
+            tsdata = TSDataset.from_pandas(df, dt_col="datetime", target_col="value",
+                                           extra_feature_col=["extra feature"], id_col="id")
+            tsdata.set_backend(backend, num_workers=2, min_rows_per_chunk=10)
+            tsdata.deduplicate().impute().gen_dt_feature().roll(lookback=5, horizon=[1, 3])
+            return tsdata
+
+        tsdata = preprocess("serial")
+        for backend in ["thread", "process"]:
+            tsdata_parallel = preprocess(backend)
+            pd.testing.assert_frame_equal(tsdata.to_pandas(), tsdata_parallel.to_pandas())
+            assert tsdata.feature_col == tsdata_parallel.feature_col
+            x, y = tsdata.to_numpy()
+            x_parallel, y_parallel = tsdata_parallel.to_numpy()
+            np.testing.assert_array_equal(x, x_parallel)
+            np.testing.assert_array_equal(y, y_parallel)
+
+        with pytest.raises(AssertionError):
+            tsdata.set_backend("dask")
@@ -89,3 +89,38 @@ class TestRollTimeSeries(ZooTestCase):
                                          target_col=["B", "C"])
         assert x.shape == (6, 2, 3)
         assert y.shape == (6, 2, 2)
+
+    def test_roll_timeseries_dataframe_strided(self):
+        for horizon in [0, 2, [1, 3]]:
+            x, y = roll_timeseries_dataframe(self.easy_data,
+                                             None,
+                                             lookback=self.lookback,
+                                             horizon=horizon,
+                                             feature_col=["A"],
+                                             target_col=["B", "C"])
+            x_strided, y_strided = roll_timeseries_dataframe(self.easy_data,
+                                                             None,
+                                                             lookback=self.lookback,
+                                                             horizon=horizon,
+                                                             feature_col=["A"],
+                                                             target_col=["B", "C"],
+                                                             strided=True)
+            np.testing.assert_array_equal(x, x_strided)
+            if horizon == 0:
+                assert y is None and y_strided is None
+            else:
+                np.testing.assert_array_equal(y, y_strided)
+            # no n/a in data, the windows are read-only views
+            assert not x_strided.flags.writeable
+
+        self.easy_data["A"][0] = None
+        x, y = roll_timeseries_dataframe(self.easy_data,
+                                         None,
+                                         lookback=2,
+                                         horizon=2,
+                                         feature_col=["C"],
+                                         target_col=["A"],
+                                         strided=True)
+        assert x.shape == (6, 2, 2)
+        assert y.shape == (6, 2, 1)
+        assert not np.isnan(x).any()
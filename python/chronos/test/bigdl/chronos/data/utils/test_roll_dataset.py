@@ -18,8 +18,10 @@ import pytest
 import numpy as np
 import pandas as pd
 import random
+import torch
 from bigdl.chronos.data import TSDataset
-from bigdl.chronos.data.utils.roll_dataset import RollDataset
+from bigdl.chronos.data.utils.roll_dataset import RollDataset, BatchRollDataset, \
+    get_batch_roll_data_loader
 
 
 def get_ts_df():
@@ -105,6 +107,40 @@ class TestRollDataset:
         df = get_multi_id_ts_df()
         TestRollDataset.combination_tests_for_df(df)
 
+    def test_batch_roll_dataset(self):
+        df = get_multi_id_ts_df()
+        lookback = random.randint(1, 20)
+        for horizon in [random.randint(1, 10), [1, 4, 16], 0]:
+            roll_dataset = RollDataset(df=df,
+                                       lookback=lookback,
+                                       horizon=horizon,
+                                       feature_col=["extra feature"],
+                                       target_col=["value"],
+                                       id_col="id")
+            batch_roll_dataset = BatchRollDataset(df=df,
+                                                  lookback=lookback,
+                                                  horizon=horizon,
+                                                  feature_col=["extra feature"],
+                                                  target_col=["value"],
+                                                  id_col="id")
+            assert len(batch_roll_dataset) == len(roll_dataset)
+            idx = np.random.choice(len(roll_dataset), size=8)
+            batch = batch_roll_dataset[idx]
+            for i, sample_idx in enumerate(idx):
+                sample = roll_dataset[sample_idx]
+                if horizon == 0:
+                    np.testing.assert_array_almost_equal(sample.numpy(), batch[i].numpy())
+                else:
+                    np.testing.assert_array_almost_equal(sample[0].numpy(), batch[0][i].numpy())
+                    np.testing.assert_array_almost_equal(sample[1].numpy(), batch[1][i].numpy())
+
+            loader = get_batch_roll_data_loader(batch_roll_dataset, batch_size=16, shuffle=False)
+            batches = list(loader)
+            assert len(batches) == (len(roll_dataset) + 15) // 16
+            x_batch = batches[0] if horizon == 0 else batches[0][0]
+            assert x_batch.shape == (16, lookback, 2)
+            assert x_batch.dtype == torch.float32
+
     def test_df_nan(self):
         df = get_ts_df()
         df["value"][0] = np.nan
@@ -0,0 +1,65 @@
+#
+# Copyright 2016 The BigDL Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import pytest
+import numpy as np
+import pandas as pd
+import random
+from bigdl.chronos.data.utils.roll_dataset import RollDataset
+from bigdl.chronos.data.utils.roll_tf_dataset import get_roll_tf_dataset
+
+
+def get_multi_id_ts_df():
+    sample_num = 100
+    train_df = pd.DataFrame({"value": np.random.randn(sample_num),
+                             "id": np.array(['00']*50 + ['01']*50),
+                             "extra feature": np.random.randn(sample_num)})
+    train_df["datetime"] = pd.date_range('1/1/2019', periods=sample_num)
+    train_df.loc[50:100, "datetime"] = pd.date_range('1/1/2019', periods=50)
+    return train_df
+
+
+class TestRollTFDataset:
+
+    @pytest.mark.parametrize("horizon", [random.randint(1, 10), [1, 4, 16], 0])
+    def test_equal_with_roll_dataset(self, horizon):
+        df = get_multi_id_ts_df()
+        lookback = random.randint(1, 20)
+        roll_dataset = RollDataset(df=df,
+                                   lookback=lookback,
+                                   horizon=horizon,
+                                   feature_col=["extra feature"],
+                                   target_col=["value"],
+                                   id_col="id")
+        tf_dataset = get_roll_tf_dataset(df=df,
+                                         lookback=lookback,
+                                         horizon=horizon,
+                                         feature_col=["extra feature"],
+                                         target_col=["value"],
+                                         id_col="id",
+                                         batch_size=16,
+                                         shuffle=False)
+        batches = list(tf_dataset)
+        if horizon == 0:
+            x = np.concatenate([x_batch.numpy() for x_batch in batches])
+            expected_x = np.stack([roll_dataset[i].numpy() for i in range(len(roll_dataset))])
+        else:
+            x = np.concatenate([x_batch.numpy() for x_batch, _ in batches])
+            y = np.concatenate([y_batch.numpy() for _, y_batch in batches])
+            expected_x = np.stack([roll_dataset[i][0].numpy() for i in range(len(roll_dataset))])
+            expected_y = np.stack([roll_dataset[i][1].numpy() for i in range(len(roll_dataset))])
+            np.testing.assert_array_almost_equal(expected_y, y)
+        np.testing.assert_array_almost_equal(expected_x, x)
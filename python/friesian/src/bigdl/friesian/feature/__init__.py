@@ -14,4 +14,4 @@
 # limitations under the License.
 #
 
-from .table import FeatureTable, StringIndex, TargetCode
+from .table import FeatureTable, StringIndex, TargetCode, FeatureEncoder
@@ -25,12 +25,11 @@ import pyspark.sql.functions as F
 from bigdl.friesian.feature.utils import *
 from bigdl.orca import OrcaContext
 from py4j.protocol import Py4JError
-from pyspark.ml import Pipeline
-from pyspark.ml.feature import MinMaxScaler, VectorAssembler, Bucketizer
+from pyspark.ml.feature import MinMaxScaler, Bucketizer
 from pyspark.sql import Row, Window
 from pyspark.sql.column import Column
 from pyspark.sql.functions import col as pyspark_col, concat, udf, array, broadcast, \
-    lit, rank, monotonically_increasing_id, row_number, desc
+    lit, rank, monotonically_increasing_id, row_number, desc, pandas_udf, PandasUDFType
 from pyspark.sql.types import ArrayType, DataType, StructType, StringType, StructField
 
 JAVA_INT_MIN = -2147483648
@@ -366,7 +365,7 @@ class Table:
         if not isinstance(columns, list):
             columns = [columns]
         check_col_exists(self.df, columns)
-        stats = {}
+        column_aggrs = []
         for column in columns:
             if isinstance(aggr, str) or isinstance(aggr, list):
                 aggr_strs = aggr
@@ -379,12 +378,20 @@ class Table:
                 raise ValueError("aggr must have type str or a list or dict.")
             if isinstance(aggr_strs, str):
                 aggr_strs = [aggr_strs]
-            values = []
             for aggr_str in aggr_strs:
                 if aggr_str not in ["min", "max", "avg", "sum", "count"]:
                     raise ValueError("aggregate function must be one of min/max/avg/sum/count, \
                         but got {}.".format(aggr_str))
-                values.append(self.df.agg({column: aggr_str}).collect()[0][0])
+            column_aggrs.append((column, aggr_strs))
+        # compute the statistics of all the columns in one aggregation
+        aggr_exprs = [getattr(F, aggr_str)(pyspark_col(column))
+                      for column, aggr_strs in column_aggrs for aggr_str in aggr_strs]
+        row = self.df.agg(*aggr_exprs).collect()[0] if aggr_exprs else []
+        stats = {}
+        i = 0
+        for column, aggr_strs in column_aggrs:
+            values = list(row[i:i + len(aggr_strs)])
+            i += len(aggr_strs)
             stats[column] = values[0] if len(values) == 1 else values
         return stats
 
@@ -1211,45 +1218,31 @@ class FeatureTable(Table):
         vector_cols = [columns[i] for i in range(len(columns)) if types[i] == "vector"]
 
         min_max_dict = {}
-        tolist = udf(lambda x: x.toArray().tolist(), ArrayType(DoubleType()))
+        scaled_exprs = {}
 
+        # scalar and array columns are rescaled with native column expressions, which have the
+        # same results as MinMaxScaler without any Python UDF
         if scalar_cols:
-            assembler = VectorAssembler(inputCols=scalar_cols, outputCol="vect")
-
-            # MinMaxScaler Transformation
-            scaler = MinMaxScaler(min=min, max=max, inputCol="vect", outputCol="scaled")
-
-            # Pipeline of VectorAssembler and MinMaxScaler
-            pipeline = Pipeline(stages=[assembler, scaler])
-
-            # Fitting pipeline on DataFrame
-            model = pipeline.fit(df)
-            df = model.transform(df) \
-                .withColumn("scaled_list", tolist(pyspark_col("scaled"))) \
-                .drop("vect").drop("scaled")
-            for i in range(len(scalar_cols)):
-                df = df.withColumn(scalar_cols[i], pyspark_col("scaled_list")[i])
-            df = df.drop("scaled_list")
-
-            # cast to float
-            for c in scalar_cols:
-                df = df.withColumn(c, pyspark_col(c).cast("float"))
+            # the min and max of all the scalar columns are computed in one aggregation
+            row = df.agg(*([F.min(c) for c in scalar_cols] +
+                           [F.max(c) for c in scalar_cols])).collect()[0]
+            for i, c in enumerate(scalar_cols):
+                c_min, c_max = float(row[i]), float(row[len(scalar_cols) + i])
+                min_max_dict[c] = (c_min, c_max)
+                scaled_exprs[c] = min_max_scale_expr(c, c_min, c_max, min, max).cast("float")
 
-            min_list = model.stages[1].originalMin.toArray().tolist()
-            max_list = model.stages[1].originalMax.toArray().tolist()
-
-            for i, min_max in enumerate(zip(min_list, max_list)):
-                min_max_dict[scalar_cols[i]] = min_max
-
-        from pyspark.ml.linalg import Vectors, VectorUDT
         for c in array_cols:
-            list_to_vector_udf = udf(lambda l: Vectors.dense(l), VectorUDT())
-            df = df.withColumn(c, list_to_vector_udf(pyspark_col(c)))
-            scaler = MinMaxScaler(min=min, max=max, inputCol=c, outputCol="scaled")
-            model = scaler.fit(df)
-            df = model.transform(df).drop(c).withColumn(c, tolist("scaled")).drop("scaled")
-            min_max_dict[c] = (model.originalMin.toArray().tolist(),
-                               model.originalMax.toArray().tolist())
+            elements = df.select(F.posexplode(pyspark_col(c)).alias("pos", "value")) \
+                .groupBy("pos").agg(F.min("value").alias("min"), F.max("value").alias("max")) \
+                .orderBy("pos").collect()
+            c_min = [float(r["min"]) for r in elements]
+            c_max = [float(r["max"]) for r in elements]
+            min_max_dict[c] = (c_min, c_max)
+            scaled_exprs[c] = array_min_max_scale_expr(c, c_min, c_max, min, max, "double")
+
+        if scaled_exprs:
+            df = df.select(*[scaled_exprs[c].alias(c) if c in scaled_exprs else pyspark_col(c)
+                             for c in df.columns])
 
         for c in vector_cols:
             scaler = MinMaxScaler(min=min, max=max, inputCol=c, outputCol="scaled")
@@ -1281,34 +1274,30 @@ class FeatureTable(Table):
                       or types[i] == "array<float>" or types[i] == "array<double>"]
         vector_cols = [columns[i] for i in range(len(columns)) if types[i] == "vector"]
 
-        tbl = self
-
-        def normalize_array(c_min, c_max):
-
-            def normalize(x):
-                np_x = np.array(x)
-                np_min = np.array(c_min)
-                np_max = np.array(c_max)
-                normalized = (np_x - np_min) / (np_max - np_min)
-                return normalized.tolist()
-
-            return normalize
-
         def normalize_scalar_vector(c_min, c_max):
             def normalize(x):
                 return (x - c_min) / (c_max - c_min)
 
             return normalize
 
+        # scalar and array columns are rescaled with native column expressions
+        scaled_exprs = {}
         for column in scalar_cols:
             if column in min_max_dict:
                 col_min, col_max = min_max_dict[column]
-                tbl = tbl.apply(column, column, normalize_scalar_vector(col_min, col_max), "float")
+                scaled_exprs[column] = min_max_scale_expr(column, col_min, col_max) \
+                    .cast("float")
 
         for column in array_cols:
             if column in min_max_dict:
                 col_min, col_max = min_max_dict[column]
-                tbl = tbl.apply(column, column, normalize_array(col_min, col_max), "array<float>")
+                scaled_exprs[column] = array_min_max_scale_expr(column, col_min, col_max,
+                                                                dtype="float")
+
+        tbl = self
+        if scaled_exprs:
+            tbl = self._clone(self.df.select(*[scaled_exprs[c].alias(c) if c in scaled_exprs
+                                               else pyspark_col(c) for c in self.df.columns]))
 
         for column in vector_cols:
             if column in min_max_dict:
@@ -1399,7 +1388,7 @@ class FeatureTable(Table):
         df = pad(self.df, cols, seq_len, mask_cols)
         return FeatureTable(df)
 
-    def apply(self, in_col, out_col, func, dtype="string"):
+    def apply(self, in_col, out_col, func, dtype="string", vectorized=False):
         """
         Transform a FeatureTable using a user-defined Python function.
 
@@ -1409,12 +1398,24 @@ class FeatureTable(Table):
                When in_col is a list of str, func should take a list as input,
                and in this case you are generating out_col given multiple
                input columns.
+               If vectorized is True, func takes a pandas Series of a batch of values for
+               each column in in_col, and returns a pandas Series of the same length.
         :param dtype: str, the data type of out_col. Default is string type.
+        :param vectorized: bool, whether to run func as a vectorized pandas UDF on batches of
+               rows transferred with Arrow, which is much faster than a row-at-a-time UDF.
+               Default is False.
 
         :return: A new FeatureTable after column transformation.
         """
-        udf_func = udf(func, dtype)
         assert isinstance(out_col, str), "out_col must be a single column"
+        if vectorized:
+            udf_func = pandas_udf(func, dtype, PandasUDFType.SCALAR)
+            in_cols = [in_col] if isinstance(in_col, str) else in_col
+            assert isinstance(in_cols, list), \
+                "in_col must be a single column of a list of columns"
+            df = self.df.withColumn(out_col, udf_func(*[pyspark_col(c) for c in in_cols]))
+            return FeatureTable(df)
+        udf_func = udf(func, dtype)
         if isinstance(in_col, str):
             df = self.df.withColumn(out_col, udf_func(pyspark_col(in_col)))
         else:
@@ -1493,31 +1494,37 @@ class FeatureTable(Table):
             tbl = tbl.add_value_features(c, index_tbls[i], key=c, value=c)
         return tbl
 
-    def gen_reindex_mapping(self, columns=[], freq_limit=10):
+    def gen_reindex_mapping(self, columns=[], freq_limit=10, cache=False):
         """
         Generate a mapping from old index to new one based on popularity count on descending order
          :param columns: str or a list of str
          :param freq_limit: int, dict or None. Indices with a count below freq_limit
                will be omitted. Can be represented as either an integer or dict.
                For instance, 15, {'col_4': 10, 'col_5': 2} etc. Default is 10,
+         :param cache: boolean, whether to cache and materialize the returned tables, so that
+               the counts of all the columns are computed in one scan. Call uncache on the
+               tables to release them. Default is False.
 
         :return: a list of FeatureTables, each table has a mapping from old index to new index
-                new index starts from 1, save 0 for default
+                new index starts from 1, save 0 for default.
          """
-        str_to_list(columns, "columns")
+        col_list = str_to_list(columns, "columns")
         if isinstance(freq_limit, int):
-            freq_limit = {col: freq_limit for col in columns}
+            freq_limit = {col: freq_limit for col in col_list}
         assert isinstance(freq_limit, dict), \
             "freq_limit should be int or dict, but get a " + type(freq_limit)
+        count_dfs, cached_dfs = gen_frequency_tables(self.df, col_list, cache=cache)
         index_tbls = []
-        for c in columns:
-            c_count = self.select(c).group_by(c, agg={c: "count"}).rename(
-                {"count(" + c + ")": "count"})
+        for c, c_count in zip(col_list, count_dfs):
             c_count = c_count.filter(pyspark_col("count") >= freq_limit[c])
             w = Window.orderBy(desc("count"))
-            index_df = c_count.df.withColumn(c + "_new", row_number().over(w))
+            index_df = c_count.withColumn(c + "_new", row_number().over(w))
             index_tbl = FeatureTable(index_df).select([c, c + "_new"])
+            if cache:
+                index_tbl.df.cache().count()
             index_tbls.append(index_tbl)
+        for cached_df in cached_dfs:
+            cached_df.unpersist()
         if isinstance(columns, str):
             index_tbls = index_tbls[0]
 
@@ -1743,14 +1750,14 @@ class FeatureTable(Table):
             org_all_df = org_all_df.agg(*sum_list, F.count("*").alias(cat_col_name + "_all_count"))
             all_df = org_all_df
             for target_col, out_col in zip(target_cols, out_col_list):
+                # native column expressions, which are evaluated in the JVM without Python UDFs
                 global_target_mean = target_mean_dict[target_col]
-                all_func = udf(
-                    lambda cat_sum, cat_count:
-                    (cat_sum + global_target_mean * smooth) / (cat_count + smooth),
-                    DoubleType())
-                all_df = all_df.withColumn(out_col,
-                                           all_func(cat_col_name + "_all_sum_" + target_col,
-                                                    cat_col_name + "_all_count")) \
+                all_df = all_df.withColumn(
+                    out_col,
+                    ((pyspark_col(cat_col_name + "_all_sum_" + target_col) +
+                      lit(global_target_mean * smooth)) /
+                     (pyspark_col(cat_col_name + "_all_count") + lit(smooth)))
+                    .cast(DoubleType())) \
                     .drop(cat_col_name + "_all_sum_" + target_col)
             # keep count in the target code
             all_df = all_df.withColumnRenamed(cat_col_name + "_all_count", "target_encode_count")
@@ -1768,17 +1775,15 @@ class FeatureTable(Table):
                 fold_df = fold_df.join(org_all_df, cat_col, how="left")
                 for target_col, out_col in zip(target_cols, out_col_list):
                     global_target_mean = target_mean_dict[target_col]
-                    target_func = udf(
-                        lambda s_all, s, c_all, c:
-                        None if c_all == c else
-                        ((s_all - s) + global_target_mean * smooth) / ((c_all - c) + smooth),
-                        DoubleType())
+                    s_all = pyspark_col(cat_col_name + "_all_sum_" + target_col)
+                    s = pyspark_col(cat_col_name + "_sum_" + target_col)
+                    c_all = pyspark_col(cat_col_name + "_all_count")
+                    c = pyspark_col(cat_col_name + "_count")
                     fold_df = fold_df.withColumn(
                         out_col,
-                        target_func(cat_col_name + "_all_sum_" + target_col,
-                                    cat_col_name + "_sum_" + target_col,
-                                    cat_col_name + "_all_count",
-                                    cat_col_name + "_count")
+                        F.when(c_all == c, lit(None).cast(DoubleType()))
+                        .otherwise((((s_all - s) + lit(global_target_mean * smooth)) /
+                                    ((c_all - c) + lit(smooth))).cast(DoubleType()))
                     )
                     fold_df = fold_df.drop(cat_col_name + "_sum_" + target_col,
                                            cat_col_name + "_all_sum_" + target_col)
@@ -2131,3 +2136,167 @@ class TargetCode(Table):
             elif old_name in self.out_target_mean:
                 new_out_target_mean[new_name] = new_out_target_mean.pop(old_name)
         return TargetCode(new_df, new_cat_col, new_out_target_mean)
+
+
+class FeatureEncoder:
+    def __init__(self, category_cols=None, min_max_cols=None, median_cols=None,
+                 freq_limit=None, order_by_freq=False, min=0.0, max=1.0,
+                 relative_error=0.001, broadcast=True):
+        """
+        A fitted transformer which encodes many columns at once. fit computes the statistics
+        of all the numeric columns (count, min, max and median) in one aggregation and the
+        frequency tables of all the categorical columns in one scan, and keeps the fitted
+        StringIndexes cached until release is called. transform then applies all the
+        encodings with broadcast joins and a single projection.
+
+        >>> encoder = FeatureEncoder(category_cols=["col_4", "col_5"], min_max_cols=["col_1"],
+        >>>                          median_cols=["col_2"], freq_limit=10)
+        >>> train_tbl = encoder.fit_transform(train_tbl)
+        >>> test_tbl = encoder.transform(test_tbl)
+
+        :param category_cols: str or a list of str, the columns to be encoded into indices
+               starting from 1. Unknown categories will be None after the encoding.
+        :param min_max_cols: str or a list of str, the numeric columns to be rescaled to
+               [min, max] as float.
+        :param median_cols: str or a list of str, the numeric columns whose null values are
+               filled with the median.
+        :param freq_limit: int, dict or None. Categories with a count below freq_limit will be
+               omitted from the encoding, e.g. 15 or {'col_4': 10, 'col_5': 2}. Default is None.
+        :param order_by_freq: boolean, whether to assign smaller indices to more frequent
+               categories. Default is False.
+        :param min: float, the lower bound of the rescaled columns. Default is 0.0.
+        :param max: float, the upper bound of the rescaled columns. Default is 1.0.
+        :param relative_error: float, the relative error of the approximate medians.
+        :param broadcast: bool, whether to broadcast the StringIndexes in transform.
+        """
+        self.category_cols = str_to_list(category_cols, "category_cols") \
+            if category_cols else []
+        self.min_max_cols = str_to_list(min_max_cols, "min_max_cols") if min_max_cols else []
+        self.median_cols = str_to_list(median_cols, "median_cols") if median_cols else []
+        if freq_limit is None or isinstance(freq_limit, int):
+            freq_limit = {c: freq_limit for c in self.category_cols}
+        assert isinstance(freq_limit, dict), \
+            "freq_limit should be int, dict or None, but get " + freq_limit.__class__.__name__
+        self.freq_limit = freq_limit
+        self.order_by_freq = order_by_freq
+        self.min = min
+        self.max = max
+        self.relative_error = relative_error
+        self.broadcast = broadcast
+        self.stats = None
+        self.string_indices = None
+        self._cached_dfs = []
+
+    def fit(self, tbl):
+        """
+        Compute the statistics and the StringIndexes of the columns on a FeatureTable.
+
+        :param tbl: A FeatureTable.
+
+        :return: self.
+        """
+        df = tbl.df
+        check_col_exists(df, self.category_cols + self.min_max_cols + self.median_cols)
+        numeric_cols = list(dict.fromkeys(self.min_max_cols + self.median_cols))
+        for c in numeric_cols:
+            assert check_column_numeric(df, c), c + " should be a numeric column"
+
+        self.release()
+        self.stats = {}
+        if numeric_cols:
+            accuracy = int(1 / self.relative_error)
+            aggr_exprs = []
+            for i, c in enumerate(numeric_cols):
+                aggr_exprs += [F.count(pyspark_col(c)).alias("count_" + str(i)),
+                               F.min(pyspark_col(c)).alias("min_" + str(i)),
+                               F.max(pyspark_col(c)).alias("max_" + str(i)),
+                               F.expr("percentile_approx(`{}`, 0.5, {})"
+                                      .format(c.replace("`", "``"), accuracy))
+                               .alias("median_" + str(i))]
+            row = df.agg(*aggr_exprs).collect()[0]
+            for i, c in enumerate(numeric_cols):
+                self.stats[c] = {"count": row["count_" + str(i)], "min": row["min_" + str(i)],
+                                 "max": row["max_" + str(i)], "median": row["median_" + str(i)]}
+            for c in self.median_cols:
+                if self.stats[c]["median"] is None:
+                    raise ValueError("Cannot compute the median of column {} since it contains "
+                                     "only null values.".format(c))
+
+        self.string_indices = []
+        if self.category_cols:
+            count_dfs, cached_dfs = gen_frequency_tables(df, self.category_cols)
+            for c, count_df in zip(self.category_cols, count_dfs):
+                if self.freq_limit.get(c):
+                    count_df = count_df.filter(pyspark_col("count") >= self.freq_limit[c])
+                # materialized and cached
+                index_df = assign_index(count_df, "count" if self.order_by_freq else None)
+                self._cached_dfs.append(index_df)
+                self.string_indices.append(StringIndex(index_df.select(c, "id"), c))
+            for cached_df in cached_dfs:
+                cached_df.unpersist()
+        return self
+
+    def release(self):
+        """
+        Unpersist the cached StringIndexes. Call it once the FeatureEncoder is no longer used,
+        since the recomputed indices may differ from the fitted ones.
+        """
+        for cached_df in self._cached_dfs:
+            cached_df.unpersist()
+        self._cached_dfs = []
+
+    def transform(self, tbl):
+        """
+        Encode a FeatureTable with the fitted statistics and StringIndexes.
+
+        :param tbl: A FeatureTable.
+
+        :return: A new FeatureTable with the encoded columns.
+        """
+        assert self.stats is not None, "FeatureEncoder should be fitted before transform"
+        df = tbl.df
+        check_col_exists(df, self.category_cols + self.min_max_cols + self.median_cols)
+        columns = df.columns
+        for c, index in zip(self.category_cols, self.string_indices):
+            index_df = index.df.select(pyspark_col(c), pyspark_col("id").alias(c + "__id__"))
+            if self.broadcast:
+                index_df = broadcast(index_df)
+            df = df.join(index_df, on=c, how="left")
+
+        exprs = []
+        for c in columns:
+            if c in self.category_cols:
+                exprs.append(pyspark_col(c + "__id__").alias(c))
+                continue
+            expr = pyspark_col(c)
+            if c in self.median_cols:
+                expr = F.coalesce(expr, lit(self.stats[c]["median"]).cast(df.schema[c].dataType))
+            if c in self.min_max_cols:
+                c_min, c_max = self.stats[c]["min"], self.stats[c]["max"]
+                if c_min is None or c_max == c_min:
+                    # the same as MinMaxScaler when the column is constant
+                    expr = F.when(expr.isNull(), lit(None)) \
+                        .otherwise(lit(0.5 * (self.max + self.min)))
+                else:
+                    expr = (expr - lit(c_min)) / lit(c_max - c_min) * \
+                        lit(self.max - self.min) + lit(self.min)
+                expr = expr.cast("float")
+            exprs.append(expr.alias(c))
+        return FeatureTable(df.select(*exprs))
+
+    def fit_transform(self, tbl):
+        """
+        Fit the FeatureEncoder on a FeatureTable and encode it.
+
+        :param tbl: A FeatureTable.
+
+        :return: A new FeatureTable with the encoded columns.
+        """
+        return self.fit(tbl).transform(tbl)
+
+    def min_max_dict(self):
+        """
+        :return: dict, the original min and max values of the rescaled columns, which can be
+                 used in FeatureTable.transform_min_max_scale.
+        """
+        return {c: (self.stats[c]["min"], self.stats[c]["max"]) for c in self.min_max_cols}
@@ -16,8 +16,13 @@
 
 from bigdl.dllib.utils.file_utils import callZooFunc
 from pyspark.sql.types import IntegerType, ShortType, LongType, FloatType, DecimalType, \
-    DoubleType, BooleanType
-from pyspark.sql.functions import broadcast, udf
+    DoubleType, StructType, StructField
+from pyspark.sql.functions import broadcast, col as pyspark_col, desc
+import pyspark.sql.functions as F
+import uuid
+
+# the maximum number of columns in one GROUPING SETS query
+MAX_GROUPING_COLUMNS = 32
 
 
 def compute(df):
@@ -171,21 +176,24 @@ def encode_target_(tbl, targets, target_cols=None, drop_cat=True, drop_fold=True
         br_df = broadcast(top_df.drop("target_encode_count"))
 
         if fold_col is None:
-            join_key = cat_col
+            join_key = [cat_col] if isinstance(cat_col, str) else cat_col
         else:
             join_key = [cat_col, fold_col] if isinstance(cat_col, str) else cat_col + [fold_col]
 
         if all_size <= limit_size:
             joined = tbl.df.join(br_df, on=join_key, how="left")
         else:
-            keyset = set(top_df.select(cat_col).rdd.map(lambda r: r[0]).collect())
-            filter_udf = udf(lambda key: key in keyset, BooleanType())
-            df1 = tbl.df.filter(filter_udf(cat_col))
-            df2 = tbl.df.subtract(df1)
-            joined1 = df1.join(br_df, on=join_key)
-            joined2 = df2.join(t_df.drop("target_encode_count").subtract(br_df),
-                               on=join_key, how="left")
-            joined = joined1.union(joined2)
+            # Skew-aware join: the most frequent keys, which would overload a few partitions
+            # of a shuffle join, are joined with a broadcast hash join, and only the rows of
+            # the remaining keys are shuffled. Both sides are split with native semi/anti
+            # joins instead of a Python UDF over a collected key set.
+            top_keys = broadcast(top_df.select(*join_key))
+            joined1 = tbl.df.join(br_df, on=join_key, how="inner")
+            df2 = tbl.df.join(top_keys, on=join_key, how="left_anti")
+            rest_df = t_df.drop("target_encode_count") \
+                .join(top_keys, on=join_key, how="left_anti")
+            joined2 = df2.join(rest_df, on=join_key, how="left")
+            joined = joined1.unionByName(joined2)
 
         tbl = tbl._clone(joined)
         # for new columns, fill na with mean
@@ -207,6 +215,91 @@ def encode_target_(tbl, targets, target_cols=None, drop_cat=True, drop_fold=True
     return tbl
 
 
+def gen_frequency_tables(df, columns, cache=True):
+    """
+    Count the occurrences of the non-null values of each column, where all the columns are
+    counted in one scan of df with GROUPING SETS.
+
+    :param cache: whether to cache the aggregations, otherwise each DataFrame recomputes
+           its aggregation when it is used.
+
+    :return: a list of DataFrames with the column and "count", which are computed from the
+             aggregations, and the list of the cached aggregations, which should be
+             unpersisted by the caller once the DataFrames are materialized.
+    """
+    spark = df.sql_ctx.sparkSession
+    count_dfs = []
+    cached_dfs = []
+    for start in range(0, len(columns), MAX_GROUPING_COLUMNS):
+        chunk = columns[start:start + MAX_GROUPING_COLUMNS]
+        quoted = ["`" + c.replace("`", "``") + "`" for c in chunk]
+        column_id = "CASE " + " ".join("WHEN grouping({}) = 0 THEN {}".format(q, i)
+                                       for i, q in enumerate(quoted)) + " END"
+        view = "friesian_frequency_" + uuid.uuid4().hex
+        df.createOrReplaceTempView(view)
+        try:
+            count_df = spark.sql("SELECT {}, {} AS __column_id__, count(*) AS count FROM {} "
+                                 "GROUP BY GROUPING SETS ({})"
+                                 .format(", ".join(quoted), column_id, view,
+                                         ", ".join("(" + q + ")" for q in quoted)))
+        finally:
+            spark.catalog.dropTempView(view)
+        if cache:
+            count_df = count_df.cache()
+            cached_dfs.append(count_df)
+        for i, c in enumerate(chunk):
+            count_dfs.append(count_df.filter((pyspark_col("__column_id__") == i) &
+                                             pyspark_col(c).isNotNull())
+                             .select(c, "count"))
+    return count_dfs, cached_dfs
+
+
+def assign_index(df, order_col=None, id_col="id"):
+    """
+    Assign consecutive ids starting from 1 to the rows of df, in the descending order of
+    order_col if it is not None, without moving all the rows into one partition.
+
+    :return: a cached and materialized DataFrame.
+    """
+    if order_col is not None:
+        df = df.orderBy(desc(order_col))
+    # zipWithIndex computes the partition sizes on the same rdd whose partitions are indexed,
+    # so the ids stay unique if a partition is recomputed, e.g. after losing an executor
+    rdd = df.rdd.zipWithIndex().map(lambda row_index: tuple(row_index[0]) + (row_index[1] + 1,))
+    schema = StructType(df.schema.fields + [StructField(id_col, IntegerType())])
+    result = df.sql_ctx.sparkSession.createDataFrame(rdd, schema).cache()
+    result.count()
+    return result
+
+
+def _min_max_coefficients(c_min, c_max, min, max):
+    # the same as MinMaxScaler, a constant column is rescaled to the middle of [min, max]
+    if c_max == c_min:
+        return 0.0, 0.5 * (max + min)
+    scale = (max - min) / (c_max - c_min)
+    return scale, min - c_min * scale
+
+
+def min_max_scale_expr(column, c_min, c_max, min=0.0, max=1.0):
+    """
+    A column expression which rescales a numeric column from [c_min, c_max] to [min, max].
+    """
+    scale, offset = _min_max_coefficients(c_min, c_max, min, max)
+    return pyspark_col(column) * F.lit(scale) + F.lit(offset)
+
+
+def array_min_max_scale_expr(column, c_min, c_max, min=0.0, max=1.0, dtype="double"):
+    """
+    A column expression which rescales each element of a numeric array column from
+    [c_min[i], c_max[i]] to [min, max] with the higher-order function transform.
+    """
+    coefficients = [_min_max_coefficients(lo, hi, min, max) for lo, hi in zip(c_min, c_max)]
+    scales = ", ".join("CAST({!r} AS double)".format(float(s)) for s, _ in coefficients)
+    offsets = ", ".join("CAST({!r} AS double)".format(float(o)) for _, o in coefficients)
+    return F.expr("CAST(transform(`{}`, (x, i) -> x * array({})[i] + array({})[i]) AS array<{}>)"
+                  .format(column.replace("`", "``"), scales, offsets, dtype))
+
+
 def str_to_list(arg, arg_name):
     if isinstance(arg, str):
         return [arg]
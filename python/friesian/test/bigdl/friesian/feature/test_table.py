@@ -26,7 +26,7 @@ from pyspark.sql.types import StructType, StructField, StringType, IntegerType,
     DoubleType
 
 from bigdl.orca import OrcaContext
-from bigdl.friesian.feature import FeatureTable, StringIndex, TargetCode
+from bigdl.friesian.feature import FeatureTable, StringIndex, TargetCode, FeatureEncoder
 from bigdl.dllib.nncontext import *
 
 
@@ -53,6 +53,22 @@ class TestTable(TestCase):
         out_values = feature_tbl.select("out").df.rdd.flatMap(lambda x: x).collect()
         assert out_values == ["xxxx"] * len(out_values)
 
+    def test_apply_vectorized(self):
+        file_path = os.path.join(self.resource_path, "parquet/data1.parquet")
+        feature_tbl = FeatureTable.read_parquet(file_path)
+        feature_tbl = feature_tbl.fillna(0, ["col_1", "col_2"])
+        # pandas udf on single column
+        feature_tbl = feature_tbl.apply("col_1", "new_col_1", lambda x: x + 1, dtype="int",
+                                        vectorized=True)
+        col1_values = feature_tbl.select("col_1").df.rdd.flatMap(lambda x: x).collect()
+        updated_col1_values = feature_tbl.select("new_col_1").df.rdd.flatMap(lambda x: x).collect()
+        assert [v + 1 for v in col1_values] == updated_col1_values
+        # pandas udf on multi columns
+        feature_tbl = feature_tbl.apply(["col_1", "col_2"], "out", lambda x, y: x + y,
+                                        dtype="long", vectorized=True)
+        rows = feature_tbl.select("col_1", "col_2", "out").df.collect()
+        assert all(row[0] + row[1] == row[2] for row in rows)
+
     def test_apply_with_data(self):
         file_path = os.path.join(self.resource_path, "parquet/data1.parquet")
         feature_tbl = FeatureTable.read_parquet(file_path)
@@ -247,6 +263,34 @@ class TestTable(TestCase):
         index_tbls = tbl.gen_reindex_mapping(["col_4", "col_5"], 1)
         assert(index_tbls[0].size() == 3)
         assert(index_tbls[1].size() == 2)
+        assert not any(index_tbl.df.is_cached for index_tbl in index_tbls)
+        cached_tbls = tbl.gen_reindex_mapping(["col_4", "col_5"], 1, cache=True)
+        assert all(index_tbl.df.is_cached for index_tbl in cached_tbls)
+        assert [index_tbl.size() for index_tbl in cached_tbls] == [3, 2]
+        for index_tbl in cached_tbls:
+            index_tbl.uncache()
+
+    def test_feature_encoder(self):
+        file_path = os.path.join(self.resource_path, "parquet/data1.parquet")
+        feature_tbl = FeatureTable.read_parquet(file_path)
+        encoder = FeatureEncoder(category_cols=["col_4", "col_5"], min_max_cols=["col_2"],
+                                 median_cols=["col_1", "col_2"], freq_limit=1)
+        encoded_tbl = encoder.fit_transform(feature_tbl)
+        assert encoded_tbl.columns == feature_tbl.columns
+        string_idx_list = feature_tbl.gen_string_idx(["col_4", "col_5"], freq_limit=1)
+        for index, expected_index in zip(encoder.string_indices, string_idx_list):
+            assert index.size() == expected_index.size()
+            assert sorted(index.to_dict().values()) == list(range(1, index.size() + 1))
+        assert encoded_tbl.max("col_5").to_list("max")[0] == 2
+        assert encoded_tbl.df.filter("col_1 is null or col_2 is null").count() == 0
+        assert encoder.stats["col_2"]["min"] == feature_tbl.get_stats("col_2", "min")["col_2"]
+        col_2 = encoded_tbl.to_list("col_2")
+        assert all(0.0 <= v <= 1.0 for v in col_2)
+        assert "col_4" not in encoder.stats
+        cached_dfs = list(encoder._cached_dfs)
+        assert len(cached_dfs) == 2 and all(df.is_cached for df in cached_dfs)
+        encoder.release()
+        assert not any(df.is_cached for df in cached_dfs)
 
     def test_gen_string_idx_union(self):
         file_path = os.path.join(self.resource_path, "parquet/data1.parquet")
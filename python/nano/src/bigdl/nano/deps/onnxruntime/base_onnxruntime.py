@@ -14,6 +14,10 @@
 # limitations under the License.
 #
 
+import queue
+import warnings
+import numpy as np
+
 try:
     import onnx
     import onnxruntime as ort
@@ -26,6 +30,128 @@ def save_onnx_to_file(onnx_model, file_path="model.onnx"):
     onnx.save(onnx_model, file_path)
 
 
+class _ORTSessionSlot:
+    def __init__(self, ortsess):
+        '''
+        An onnxruntime session with its IOBinding.
+        '''
+        self.ortsess = ortsess
+        self.io_binding = ortsess.io_binding()
+        self.input_names = [i.name for i in ortsess.get_inputs()]
+        self.output_names = [o.name for o in ortsess.get_outputs()]
+
+    def run(self, inputs, outputs=None):
+        '''
+        Run the session with IOBinding.
+
+        :param inputs: a list of numpy ndarray.
+        :param outputs: (optional) a list of C-contiguous numpy ndarray with the exact
+               output shapes, the outputs are written into them directly.
+
+        :return: a list of numpy ndarray, which are the outputs if they are given, otherwise
+                 allocated by onnxruntime.
+        '''
+        self.io_binding.clear_binding_inputs()
+        for name, x in zip(self.input_names, inputs):
+            self.io_binding.bind_cpu_input(name, np.ascontiguousarray(x))
+        self.io_binding.clear_binding_outputs()
+        if outputs is not None:
+            for name, out in zip(self.output_names, outputs):
+                self.io_binding.bind_output(name, "cpu", 0, out.dtype, list(out.shape),
+                                            out.ctypes.data)
+            self.ortsess.run_with_iobinding(self.io_binding)
+            return outputs
+        for name in self.output_names:
+            self.io_binding.bind_output(name, "cpu")
+        self.ortsess.run_with_iobinding(self.io_binding)
+        return self.io_binding.copy_outputs_to_cpu()
+
+
+# the settings copied from the sess_options given to an ORTSessionPool
+_SESSION_OPTION_ATTRS = ("enable_cpu_mem_arena", "enable_mem_pattern", "enable_mem_reuse",
+                         "enable_profiling", "execution_mode", "execution_order",
+                         "graph_optimization_level", "log_severity_level",
+                         "log_verbosity_level", "logid", "optimized_model_filepath",
+                         "profile_file_prefix", "use_deterministic_compute")
+_SESSION_CONFIG_KEYS = ("session.intra_op.allow_spinning", "session.inter_op.allow_spinning",
+                        "session.disable_prepacking")
+
+
+def _copy_session_options(sess_options):
+    options = ort.SessionOptions()
+    if sess_options is None:
+        return options
+    for attr in _SESSION_OPTION_ATTRS:
+        if hasattr(sess_options, attr):
+            setattr(options, attr, getattr(sess_options, attr))
+    for key in _SESSION_CONFIG_KEYS:
+        try:
+            value = sess_options.get_session_config_entry(key)
+        except Exception:
+            continue
+        options.add_session_config_entry(key, value)
+    return options
+
+
+class ORTSessionPool:
+    def __init__(self, onnx_filepath, num_sessions=1, cores_per_session=None,
+                 sess_options=None):
+        '''
+        A pool of onnxruntime sessions that could be used concurrently from multiple threads.
+        Each session runs with its own intra-op threads pinned to a disjoint set of cores
+        scheduled by `bigdl.nano.common.cpu_schedule.schedule_workers`.
+
+        :param onnx_filepath: the path of the onnx model file.
+        :param num_sessions: int, the number of sessions.
+        :param cores_per_session: (optional) int, the number of cores used by each session.
+               Default to None, which evenly splits the physical cores among the sessions.
+        :param sess_options: (optional) ortsess options in ort.SessionOptions type. It is not
+               modified, each session uses a copy of its attributes with its own thread
+               settings. Session config entries are not copied except the spinning and
+               prepacking ones.
+        '''
+        from bigdl.nano.common.cpu_schedule import schedule_workers
+        try:
+            schedule = schedule_workers(num_sessions, cores_per_session)
+        except Exception as e:
+            warnings.warn(f"Fail to schedule cores for the sessions ({e}), "
+                          "intra-op threads will not be pinned.")
+            import os
+            threads = cores_per_session or max((os.cpu_count() or 1) // num_sessions, 1)
+            schedule = [[None] * threads for _ in range(num_sessions)]
+
+        self.num_sessions = num_sessions
+        self._slots = queue.Queue()
+        for cores in schedule:
+            options = _copy_session_options(sess_options)
+            options.intra_op_num_threads = len(cores)
+            options.inter_op_num_threads = 1
+            if len(cores) > 1 and cores[0] is not None:
+                # the calling thread is the first intra-op thread, the logical
+                # processor id of onnxruntime starts from 1
+                options.add_session_config_entry("session.intra_op_thread_affinities",
+                                                 ";".join(str(core + 1) for core in cores[1:]))
+            self._slots.put(_ORTSessionSlot(ort.InferenceSession(onnx_filepath,
+                                                                 sess_options=options)))
+
+    def run(self, inputs, outputs=None):
+        '''
+        Run on an idle session of the pool, block until one is available.
+
+        :param inputs: a list of numpy ndarray.
+        :param outputs: (optional) a list of C-contiguous numpy ndarray to write the outputs,
+               which are reused by the caller to avoid allocating them on every run.
+
+        :return: a list of numpy ndarray, which are the outputs if they are given, otherwise
+                 newly allocated for this run.
+        '''
+        slot = self._slots.get()
+        try:
+            return slot.run(inputs, outputs)
+        finally:
+            self._slots.put(slot)
+
+
 class BaseORTInference:
     def __init__(self):
         self.ortsess_fp32 = None  # onnxruntime session fp32
@@ -35,12 +161,16 @@ class BaseORTInference:
         self.onnx_model_int8 = None  # onnx model int8
         self.onnx_filepath_int8 = None  # onnx filepath int8
         self.example_input_array = None  # cached example input array
+        self.ortsess_pool = None  # onnxruntime session pool
+        self.ortsess_pool_precision = None  # precision of the session pool
 
     def forward_step(self, *inputs):
         '''
             This function run through the onnxruntime forwarding step
             with presision='fp32'
         '''
+        if self.ortsess_pool_precision == "fp32":
+            return self.ortsess_pool.run(inputs)
         inputs = dict(zip(self._forward_args, inputs))
         ort_outs = self.ortsess_fp32.run(None, inputs)
         return ort_outs
@@ -50,6 +180,8 @@ class BaseORTInference:
             This function run through the onnxruntime forwarding step
             with presision='fp32'
         '''
+        if self.ortsess_pool_precision == "int8":
+            return self.ortsess_pool.run(inputs)
         inputs = dict(zip(self._forward_args, inputs))
         ort_outs = self.ortsess_int8.run(None, inputs)
         return ort_outs
@@ -63,6 +195,7 @@ class BaseORTInference:
         '''
         self.onnx_model_fp32 = onnx.load(self.onnx_filepath_fp32)
         self.ortsess_fp32 = ort.InferenceSession(self.onnx_filepath_fp32, sess_options=sess_options)
+        self._clear_ortsess_pool("fp32")
 
     def _build_ortsess_int8(self,
                             sess_options=None):
@@ -73,8 +206,40 @@ class BaseORTInference:
         '''
         self.onnx_model_int8 = onnx.load(self.onnx_filepath_int8)
         self.ortsess_int8 = ort.InferenceSession(self.onnx_filepath_int8, sess_options=sess_options)
+        self._clear_ortsess_pool("int8")
+
+    def _clear_ortsess_pool(self, precision):
+        # the pool runs the onnx file of the previous session of this precision
+        if self.ortsess_pool_precision == precision:
+            self.ortsess_pool = None
+            self.ortsess_pool_precision = None
+
+    def build_ortsess_pool(self, num_sessions, cores_per_session=None, precision="fp32",
+                           sess_options=None):
+        '''
+        Build a pool of ortsess from the fp32 or int8 onnx model. Once built, the forwarding
+        of this precision runs on the pool with IOBinding, until the ortsess of this precision
+        is rebuilt.
+
+        :param num_sessions: int, the number of sessions.
+        :param cores_per_session: (optional) int, the number of cores used by each session.
+        :param precision: "fp32" or "int8".
+        :param sess_options: ortsess options in ort.SessionOptions type.
+        '''
+        onnx_filepath = self.onnx_filepath_fp32 if precision == "fp32" \
+            else self.onnx_filepath_int8
+        if onnx_filepath is None:
+            raise RuntimeError(f"Please build the {precision} ortsess before building "
+                               "a session pool.")
+        self.ortsess_pool = ORTSessionPool(onnx_filepath,
+                                           num_sessions=num_sessions,
+                                           cores_per_session=cores_per_session,
+                                           sess_options=sess_options)
+        self.ortsess_pool_precision = precision
 
     def reset(self, model):
+        self.ortsess_pool = None  # onnxruntime session pool
+        self.ortsess_pool_precision = None  # precision of the session pool
         self.ortsess_fp32 = None  # onnxruntime session fp32
         self.onnx_model_fp32 = None  # onnx model fp32
         self.onnx_filepath_fp32 = None  # onnx filepath fp32
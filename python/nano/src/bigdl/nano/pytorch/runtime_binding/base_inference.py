@@ -65,6 +65,9 @@ def inference(self,
               sess_options=None,
               backend="onnx",
               quantize=None,
+              num_sessions=None,
+              cores_per_session=None,
+              streaming=False,
               **kwargs):
     '''
     Inference with/without onnxruntime.
@@ -84,6 +87,17 @@ def inference(self,
     :param backend: str, to set the backend library. "onnx" for onnxruntime, which
             provides lower latency and any other value will make `inference` call
             the pytorch forwarding method.
+    :param num_sessions: int, the number of onnxruntime sessions to run the batches
+            concurrently, each session has its own intra-op threads pinned to disjoint
+            cores. Only valid when backend is set to "onnx" and batch_size is not None.
+            Default to None, which runs the batches one by one on a single session.
+    :param cores_per_session: int, the number of cores used by each session. Default to
+            None, which evenly splits the physical cores among the sessions.
+    :param streaming: bool, if True, return a generator which yields the output of each
+            batch as soon as it is ready, so that the whole output is never held in memory.
+            Otherwise the batch outputs are written into a preallocated output whose shape
+            is inferred from the first batch. Only valid when batch_size is not None.
+            Default to False.
     :param **kwargs: any other keywords that will be passed to onnx session's building.
     '''
 
@@ -111,33 +125,113 @@ def inference(self,
         if batch_size is None:
             # this branch is only to speed up the inferencing when batch_size is set to None.
             return self(*input_sample_list)
+        elif num_sessions is not None and num_sessions > 1:
+            precision = "int8" if quantize else "fp32"
+            engine = self.ort_infer_engine
+            pool = engine.ortsess_pool
+            if pool is None or engine.ortsess_pool_precision != precision or \
+                    pool.num_sessions != num_sessions:
+                engine.build_ortsess_pool(num_sessions, cores_per_session,
+                                          precision=precision, sess_options=sess_options)
+            return _concurrent_onnx_inference(engine.ortsess_pool,
+                                              [x.numpy() for x in input_sample_list],
+                                              batch_size, num_sessions)
         else:
-            yhat_list = []
+            batch_outputs = _batch_outputs(self, input_sample_list, batch_size, _to_numpy)
+            if streaming:
+                return batch_outputs
             sample_num = input_sample_list[0].shape[0]  # the first dim should be sample_num
-            batch_num = math.ceil(sample_num / batch_size)
-            for batch_id in range(batch_num):
-                yhat_list.append(self(
-                    *tuple(map(lambda x: x[batch_id * batch_size:
-                           (batch_id + 1) * batch_size],
-                        input_sample_list))))
-            # this operation may cause performance degradation
-            yhat = np.concatenate(yhat_list, axis=0)
-            return yhat
+            return _fill_output(batch_outputs, sample_num, np.empty)
     else:
         # inference w/o onnxruntime (fallback to pytorch native forward)
         quantize = quantize if quantize is not None else self._default_inference_quantize
         self.eval(quantize=quantize)
-        with torch.no_grad():
-            yhat_list = []
-            sample_num = input_sample_list[0].shape[0]  # the first dim should be sample_num
-            batch_size = batch_size if batch_size else sample_num
-            batch_num = math.ceil(sample_num / batch_size)
-            for batch_id in range(batch_num):
-                yhat_list.append(self(*map(lambda x: x[batch_id * batch_size:
-                                                       (batch_id + 1) * batch_size],
-                                           input_sample_list)))
-            yhat = torch.cat(yhat_list, axis=0)
-            return yhat
+        sample_num = input_sample_list[0].shape[0]  # the first dim should be sample_num
+        batch_size = batch_size if batch_size else sample_num
+        batch_outputs = _batch_outputs(self, input_sample_list, batch_size, no_grad=True)
+        if streaming:
+            return batch_outputs
+        return _fill_output(batch_outputs, sample_num, torch.empty)
+
+
+def _to_numpy(outputs):
+    if isinstance(outputs, tuple):
+        return tuple(map(lambda x: x.numpy(), outputs))
+    return outputs.numpy()
+
+
+def _batch_outputs(model, input_sample_list, batch_size, convert=None, no_grad=False):
+    '''
+    A generator of the outputs of each batch. The inputs of the next batch are sliced
+    in a background thread while the current batch is running.
+    '''
+    from concurrent.futures import ThreadPoolExecutor
+    sample_num = input_sample_list[0].shape[0]
+    batch_num = math.ceil(sample_num / batch_size)
+
+    def get_batch(batch_id):
+        return tuple(map(lambda x: x[batch_id * batch_size:
+                                     (batch_id + 1) * batch_size].contiguous(),
+                         input_sample_list))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_batch = executor.submit(get_batch, 0)
+        for batch_id in range(batch_num):
+            batch = next_batch.result()
+            if batch_id + 1 < batch_num:
+                next_batch = executor.submit(get_batch, batch_id + 1)
+            if no_grad:
+                with torch.no_grad():
+                    outputs = model(*batch)
+            else:
+                outputs = model(*batch)
+            yield convert(outputs) if convert is not None else outputs
+
+
+def _fill_output(batch_outputs, sample_num, empty):
+    '''
+    Write the batch outputs into an output preallocated by `empty` (np.empty or
+    torch.empty), the output shape is inferred from the first batch.
+    '''
+    yhat, start = None, 0
+    for outputs in batch_outputs:
+        is_tuple = isinstance(outputs, tuple)
+        outputs = outputs if is_tuple else (outputs,)
+        if yhat is None:
+            yhat = tuple(empty((sample_num,) + tuple(out.shape[1:]), dtype=out.dtype,
+                               **({"device": out.device}
+                                  if isinstance(out, torch.Tensor) else {}))
+                         for out in outputs)
+        stop = start + outputs[0].shape[0]
+        for y, out in zip(yhat, outputs):
+            y[start:stop] = out
+        start = stop
+    if yhat is None:
+        # there is no batch to infer the output shape from
+        raise ValueError("input_data should have at least one sample, "
+                         "but got an empty input.")
+    return yhat if is_tuple else yhat[0]
+
+
+def _concurrent_onnx_inference(pool, inputs, batch_size, num_sessions):
+    from concurrent.futures import ThreadPoolExecutor
+    sample_num = inputs[0].shape[0]  # the first dim should be sample_num
+    batch_num = math.ceil(sample_num / batch_size)
+
+    # run the first batch to know the output shape, then every session writes its
+    # outputs into a slice of the preallocated result with IOBinding
+    first = pool.run([x[:batch_size] for x in inputs])
+    yhat = [np.empty((sample_num,) + out.shape[1:], dtype=out.dtype) for out in first]
+    for y, out in zip(yhat, first):
+        y[:out.shape[0]] = out
+
+    def run_batch(batch_id):
+        start, stop = batch_id * batch_size, (batch_id + 1) * batch_size
+        pool.run([x[start:stop] for x in inputs], [y[start:stop] for y in yhat])
+
+    with ThreadPoolExecutor(max_workers=num_sessions) as executor:
+        list(executor.map(run_batch, range(1, batch_num)))
+    return yhat[0] if len(yhat) == 1 else tuple(yhat)
 
 
 def bind_base_inference_rt_methods(pl_model):
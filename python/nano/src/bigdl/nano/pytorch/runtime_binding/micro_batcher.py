@@ -0,0 +1,308 @@
+#
+# Copyright 2016 The BigDL Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+import bisect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import torch
+
+BACKENDS = ("onnx", "openvino", "pytorch")
+
+# upper bounds (in milliseconds) of the latency histogram buckets
+DEFAULT_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        '''
+        A cumulative histogram of latencies in milliseconds.
+
+        :param buckets: the sorted upper bounds of the buckets in milliseconds, an extra
+               bucket without upper bound is appended.
+        '''
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, latency_ms):
+        self.counts[bisect.bisect_left(self.buckets, latency_ms)] += 1
+        self.count += 1
+        self.sum += latency_ms
+
+    def quantile(self, q):
+        '''
+        Estimate the q-quantile, as the upper bound of the bucket it falls in.
+        '''
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def summary(self):
+        return {"count": self.count,
+                "mean": self.sum / self.count if self.count else None,
+                "p50": self.quantile(0.5),
+                "p90": self.quantile(0.9),
+                "p99": self.quantile(0.99),
+                "buckets": dict(zip(self.buckets + (float("inf"),), self.counts))}
+
+
+class _Request:
+    def __init__(self, inputs, future):
+        self.inputs = inputs
+        self.future = future
+        self.size = inputs[0].shape[0]
+        self.enqueue_time = time.perf_counter()
+
+
+class MicroBatcher:
+    def __init__(self, model, max_batch_size=32, max_wait_us=1000, quantize=None,
+                 pad_to_max_batch_size=False, latency_buckets=DEFAULT_LATENCY_BUCKETS):
+        '''
+        An in-process asyncio micro-batcher which coalesces concurrent small requests
+        into batches for a model bound by `bind_base_inference_rt_methods`,
+        `bind_onnxrt_methods` or `bind_openvino_methods` (e.g. returned by
+        `Trainer.compile`).
+
+        Each backend has its own queue, a batch is dispatched once it reaches
+        max_batch_size samples or its first request has waited for max_wait_us. All the
+        batches run one by one on a single worker thread, so the event loop is never
+        blocked and the forwarding methods of the backends never interleave.
+
+        The forwarding method of each backend is taken from the model once, on its first
+        batch (which the onnx or openvino runtime is built from if needed), and
+        `model.forward` is never switched. So the model could still be used in other ways
+        meanwhile, while a new batcher should be created once the model is trained or
+        quantized again.
+
+        >>> batcher = MicroBatcher(pl_model, max_batch_size=32, max_wait_us=500)
+        >>> y = await batcher.predict(x, backend="onnx")  # in a coroutine
+        >>> batcher.latency_summary()
+
+        :param model: the model bound with the runtime methods.
+        :param max_batch_size: int, the maximum number of samples in a batch. Requests
+               larger than it are split.
+        :param max_wait_us: int, the maximum time in microseconds a request waits for
+               other requests before its batch is dispatched.
+        :param quantize: (optional) bool, passed to `eval_onnx` and `eval`.
+        :param pad_to_max_batch_size: bool, pad every batch to max_batch_size with zeros,
+               which is needed for a model with static batch size (e.g. the openvino
+               model exported by `eval_openvino`). The padded outputs are dropped.
+        :param latency_buckets: the upper bounds of the latency histogram buckets in
+               milliseconds.
+        '''
+        assert max_batch_size > 0, "max_batch_size should be positive."
+        assert max_wait_us >= 0, "max_wait_us should not be negative."
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1e6
+        self.quantize = quantize
+        self.pad_to_max_batch_size = pad_to_max_batch_size
+        self.latency_buckets = latency_buckets
+        self._queues = {}
+        self._workers = {}
+        self._histograms = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._closed = False
+        # the forwarding method of each backend, only accessed by the worker thread
+        self._forwards = {}
+
+    async def predict(self, *inputs, backend="onnx"):
+        '''
+        Predict on the inputs, which are coalesced with concurrent requests of the same
+        backend.
+
+        :param *inputs: numpy ndarray, where the first dim is the number of samples.
+        :param backend: "onnx", "openvino" or "pytorch".
+
+        :return: numpy ndarray or a tuple of them if the model has multiple outputs.
+        '''
+        assert backend in BACKENDS, f"backend should be one of {BACKENDS}, but found {backend}."
+        if self._closed:
+            raise RuntimeError("The MicroBatcher is closed.")
+        inputs = tuple(np.asarray(x) for x in inputs)
+        queue = self._get_queue(backend)
+        loop = asyncio.get_running_loop()
+        sample_num = inputs[0].shape[0]
+        futures = []
+        for start in range(0, max(sample_num, 1), self.max_batch_size):
+            future = loop.create_future()
+            queue.put_nowait(_Request(tuple(x[start:start + self.max_batch_size]
+                                            for x in inputs), future))
+            futures.append(future)
+        outputs = await asyncio.gather(*futures)
+        if len(outputs) == 1:
+            return outputs[0]
+        if isinstance(outputs[0], tuple):
+            return tuple(np.concatenate(out) for out in zip(*outputs))
+        return np.concatenate(outputs)
+
+    def latency_summary(self):
+        '''
+        :return: a dict of {backend: {"queue"/"inference"/"total"/"batch_size": summary}},
+                 latencies are in milliseconds.
+        '''
+        return {backend: {name: histogram.summary() for name, histogram in histograms.items()}
+                for backend, histograms in self._histograms.items()}
+
+    def close(self):
+        '''
+        Cancel the batching tasks and shutdown the worker thread. The pending requests
+        fail with a RuntimeError.
+        '''
+        self._closed = True
+        for worker in self._workers.values():
+            # the requests taken by the batching tasks are failed once they are cancelled
+            worker.cancel()
+        for queue in self._queues.values():
+            while not queue.empty():
+                _fail_requests([queue.get_nowait()])
+        self._workers.clear()
+        self._queues.clear()
+        self._executor.shutdown(wait=False)
+
+    def _get_queue(self, backend):
+        if backend not in self._queues:
+            self._queues[backend] = asyncio.Queue()
+            self._histograms[backend] = {
+                "queue": LatencyHistogram(self.latency_buckets),
+                "inference": LatencyHistogram(self.latency_buckets),
+                "total": LatencyHistogram(self.latency_buckets),
+                "batch_size": LatencyHistogram(tuple(2 ** i for i in range(
+                    int(np.ceil(np.log2(self.max_batch_size))) + 1)))}
+            self._workers[backend] = asyncio.ensure_future(self._batching_loop(backend))
+        return self._queues[backend]
+
+    async def _batching_loop(self, backend):
+        loop = asyncio.get_running_loop()
+        queue = self._queues[backend]
+        histograms = self._histograms[backend]
+        requests, pending = [], None
+        try:
+            while True:
+                requests = [pending if pending is not None else await queue.get()]
+                pending = None
+                size = requests[0].size
+                deadline = requests[0].enqueue_time + self.max_wait
+                while size < self.max_batch_size:
+                    timeout = deadline - time.perf_counter()
+                    try:
+                        request = queue.get_nowait() if timeout <= 0 else \
+                            await asyncio.wait_for(queue.get(), timeout)
+                    except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                        break
+                    if size + request.size > self.max_batch_size:
+                        # keep it for the next batch
+                        pending = request
+                        break
+                    requests.append(request)
+                    size += request.size
+
+                await self._dispatch(loop, backend, requests, size, histograms)
+        except asyncio.CancelledError:
+            _fail_requests(requests + ([pending] if pending is not None else []))
+            raise
+
+    async def _dispatch(self, loop, backend, requests, size, histograms):
+        start = time.perf_counter()
+        try:
+            outputs = await loop.run_in_executor(self._executor, self._run_batch,
+                                                 backend, requests)
+        except Exception as e:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        end = time.perf_counter()
+
+        histograms["inference"].observe((end - start) * 1000)
+        histograms["batch_size"].observe(size)
+        offset = 0
+        for request in requests:
+            histograms["queue"].observe((start - request.enqueue_time) * 1000)
+            histograms["total"].observe((end - request.enqueue_time) * 1000)
+            result = tuple(out[offset:offset + request.size] for out in outputs)
+            offset += request.size
+            if not request.future.done():
+                request.future.set_result(result[0] if len(result) == 1 else result)
+
+    def _run_batch(self, backend, requests):
+        size = sum(request.size for request in requests)
+        inputs = []
+        for i in range(len(requests[0].inputs)):
+            batch = requests[0].inputs[i] if len(requests) == 1 else \
+                np.concatenate([request.inputs[i] for request in requests])
+            if self.pad_to_max_batch_size and size < self.max_batch_size:
+                padding = np.zeros((self.max_batch_size - size,) + batch.shape[1:],
+                                   dtype=batch.dtype)
+                batch = np.concatenate([batch, padding])
+            inputs.append(torch.from_numpy(batch))
+
+        if backend not in self._forwards:
+            self._forwards[backend] = self._bind_forward(backend, tuple(inputs))
+        with torch.no_grad():
+            outputs = self._forwards[backend](*inputs)
+
+        outputs = outputs if isinstance(outputs, tuple) else (outputs,)
+        return tuple(np.asarray(out)[:size] for out in outputs)
+
+    def _bind_forward(self, backend, input_sample):
+        model = self.model
+        if backend == "onnx":
+            engine = model.ort_infer_engine
+            quantize = self.quantize if self.quantize is not None else \
+                engine.default_eval_precision == "int8"
+            if quantize:
+                if not engine.ortsess_int8:
+                    raise RuntimeError("Please call trainer.quantize before using the onnx "
+                                       "backend with quantize=True")
+                return partial(engine.forward_int8, model)
+            if not engine.ortsess_fp32:
+                engine.build_ortsess_fp32(model=model, input_sample=input_sample)
+            return partial(engine.forward, model)
+        if backend == "openvino":
+            from bigdl.nano.deps.openvino.torch_funcs import PytorchOpenVINOInference
+            if not getattr(model, "ov_infer_engine", None) or \
+                    not model.ov_infer_engine.ie_network:
+                model.ov_infer_engine = PytorchOpenVINOInference.from_torch(model, input_sample)
+            return partial(model.ov_infer_engine.forward, model)
+
+        quantize = self.quantize if self.quantize is not None else \
+            getattr(model, "_default_inference_quantize", False)
+        # the original eval of nn.Module, without switching the runtime of the model
+        torch.nn.Module.eval(model)
+        if quantize:
+            if not getattr(model, "_quantized_model_up_to_date", False):
+                raise RuntimeError("Please call trainer.quantize again since the quantized "
+                                   "model is not up-to-date")
+            return model._forward_fx_quantize
+        return getattr(model, "_torch_forward", model.forward)
+
+
+def _fail_requests(requests):
+    for request in requests:
+        if not request.future.done():
+            request.future.set_exception(RuntimeError("The MicroBatcher is closed."))
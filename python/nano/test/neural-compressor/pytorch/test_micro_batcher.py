@@ -0,0 +1,90 @@
+#
+# Copyright 2016 The BigDL Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import asyncio
+import pytest
+from unittest import TestCase
+
+import torch
+from torch import nn
+import numpy as np
+
+from bigdl.nano.pytorch.trainer import Trainer
+from bigdl.nano.pytorch.runtime_binding.micro_batcher import MicroBatcher, LatencyHistogram
+
+
+class TestMicroBatcher(TestCase):
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram(buckets=(1, 10, 100))
+        for latency in [0.5, 2, 3, 50, 500]:
+            histogram.observe(latency)
+        assert histogram.counts == [1, 2, 1, 1]
+        assert histogram.quantile(0.5) == 10
+        assert histogram.quantile(1) == float("inf")
+
+    def test_micro_batcher(self):
+        model = nn.Sequential(nn.Linear(28 * 28, 128), nn.ReLU(), nn.Linear(128, 2))
+        loss = nn.CrossEntropyLoss()
+        optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
+        pl_model = Trainer.compile(model, loss, optimizer, onnx=True)
+        xs = [np.random.randn(i % 3 + 1, 28 * 28).astype(np.float32) for i in range(20)]
+        xs.append(np.random.randn(50, 28 * 28).astype(np.float32))
+        expected = [pl_model.inference(x, backend=None).numpy() for x in xs]
+
+        forward = pl_model.forward
+        batcher = MicroBatcher(pl_model, max_batch_size=16, max_wait_us=10000)
+
+        async def predict_all(backend):
+            return await asyncio.gather(*[batcher.predict(x, backend=backend) for x in xs])
+
+        loop = asyncio.new_event_loop()
+        for backend in ["onnx", "pytorch"]:
+            results = loop.run_until_complete(predict_all(backend))
+            for y, y_expected in zip(results, expected):
+                np.testing.assert_almost_equal(y, y_expected, decimal=5)
+
+        summary = batcher.latency_summary()
+        assert summary["onnx"]["total"]["count"] == 20 + 4  # the last request is split
+        assert summary["onnx"]["batch_size"]["count"] < 24
+        # the forwarding method of the model is never switched by the batcher
+        assert pl_model.forward == forward
+        batcher.close()
+        loop.close()
+
+    def test_micro_batcher_close(self):
+        batcher = MicroBatcher(nn.Linear(4, 2), max_batch_size=16, max_wait_us=10 ** 7)
+        x = np.ones((1, 4), dtype=np.float32)
+
+        async def predict_and_close():
+            futures = [asyncio.ensure_future(batcher.predict(x, backend="pytorch"))
+                       for _ in range(3)]
+            await asyncio.sleep(0.1)
+            # the requests are waiting for more requests to fill the batch
+            batcher.close()
+            return await asyncio.gather(*futures, return_exceptions=True)
+
+        loop = asyncio.new_event_loop()
+        results = loop.run_until_complete(predict_and_close())
+        assert all(isinstance(result, RuntimeError) for result in results)
+        with pytest.raises(RuntimeError):
+            loop.run_until_complete(batcher.predict(x, backend="pytorch"))
+        loop.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -125,6 +125,88 @@ class TestOnnx(TestCase):
         for x1, x2, y in train_loader:
             pl_model.inference([x1.numpy(), x2.numpy()])
 
+    def test_onnx_session_pool(self):
+        model = MultiInputModel()
+        loss = nn.CrossEntropyLoss()
+        optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
+        pl_model = Trainer.compile(model, loss, optimizer, onnx=True)
+        x1 = torch.randn(100, 28 * 28)
+        x2 = torch.randn(100, 28 * 28)
+
+        onnx_res = pl_model.inference([x1.numpy(), x2.numpy()], batch_size=16)
+        pool_res = pl_model.inference([x1.numpy(), x2.numpy()], batch_size=16,
+                                      num_sessions=2, cores_per_session=1)
+        assert pl_model.ort_infer_engine.ortsess_pool.num_sessions == 2
+        np.testing.assert_almost_equal(onnx_res, pool_res, decimal=5)
+
+        # forwarding runs on the session pool with IOBinding once it is built
+        pl_model.eval_onnx()
+        forward_res = pl_model(x1, x2).numpy()
+        # the outputs of a forwarding are not overwritten by the next one
+        forward_copy = forward_res.copy()
+        pl_model(torch.randn(100, 28 * 28), torch.randn(100, 28 * 28))
+        pl_model.exit_onnx()
+        np.testing.assert_almost_equal(onnx_res, forward_res, decimal=5)
+        np.testing.assert_array_equal(forward_res, forward_copy)
+
+        # the pool is dropped once the ortsess of its precision is rebuilt
+        pl_model.ort_infer_engine._build_ortsess_fp32()
+        assert pl_model.ort_infer_engine.ortsess_pool is None
+
+    def test_onnx_session_pool_multiple_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from bigdl.nano.deps.onnxruntime.base_onnxruntime import ORTSessionPool
+        import onnxruntime as ort
+        model = MultiInputModel()
+        loss = nn.CrossEntropyLoss()
+        optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
+        pl_model = Trainer.compile(model, loss, optimizer, onnx=True)
+        x1 = torch.randn(64, 28 * 28)
+        x2 = torch.randn(64, 28 * 28)
+        expected = pl_model.inference([x1.numpy(), x2.numpy()], batch_size=8)
+
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = 3
+        pool = ORTSessionPool(pl_model.ort_infer_engine.onnx_filepath_fp32,
+                              num_sessions=2, cores_per_session=1,
+                              sess_options=sess_options)
+        # the user's options are not modified
+        assert sess_options.intra_op_num_threads == 3
+
+        def run_batch(batch_id):
+            start, stop = batch_id * 8, (batch_id + 1) * 8
+            y = pool.run([x1[start:stop].numpy(), x2[start:stop].numpy()])[0]
+            np.testing.assert_almost_equal(y, expected[start:stop], decimal=5)
+            return y
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(run_batch, list(range(8)) * 4))
+        np.testing.assert_almost_equal(np.concatenate(results[:8]), expected, decimal=5)
+
+    def test_onnx_inference_streaming(self):
+        model = MultiInputModel()
+        loss = nn.CrossEntropyLoss()
+        optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
+        pl_model = Trainer.compile(model, loss, optimizer, onnx=True)
+        x1 = np.random.randn(100, 28 * 28).astype(np.float32)
+        x2 = np.random.randn(100, 28 * 28).astype(np.float32)
+
+        for backend in ["onnx", None]:
+            res = pl_model.inference([x1, x2], batch_size=32, backend=backend)
+            assert res.shape == (100, 2)
+            batches = list(pl_model.inference([x1, x2], batch_size=32, backend=backend,
+                                              streaming=True))
+            assert [batch.shape[0] for batch in batches] == [32, 32, 32, 4]
+            np.testing.assert_almost_equal(np.asarray(res),
+                                           np.concatenate([np.asarray(batch)
+                                                           for batch in batches]),
+                                           decimal=5)
+
+        empty = np.zeros((0, 28 * 28), dtype=np.float32)
+        for backend in ["onnx", None]:
+            with pytest.raises(ValueError):
+                pl_model.inference([empty, empty], batch_size=32, backend=backend)
+
     def test_trainer_compile_with_onnx_quantize(self):
         model = ResNet18(10, pretrained=False, include_top=False, freeze=True)
         loss = nn.CrossEntropyLoss()
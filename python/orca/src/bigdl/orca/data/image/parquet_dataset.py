@@ -22,7 +22,7 @@ from bigdl.orca.data import SparkXShards
 from bigdl.orca.data.file import open_text, write_text
 from bigdl.orca.data.image.utils import chunks, dict_to_row, row_to_dict, encode_schema, \
     decode_schema, SchemaField, FeatureType, DType, ndarray_dtype_to_dtype, \
-    decode_feature_type_ndarray, pa_fs
+    decode_feature_type_ndarray, decode_tensor_column, pa_fs
 from bigdl.orca.data.image.voc_dataset import VOCDatasets
 from bigdl.dllib.utils.common import get_node_and_core_number
 import os
@@ -30,12 +30,15 @@ import numpy as np
 import random
 import pyarrow.parquet as pq
 import io
+import json
 import math
+import zlib
 
 
 class ParquetDataset:
     @staticmethod
-    def write(path, generator, schema, block_size=1000, write_mode="overwrite", **kwargs):
+    def write(path, generator, schema, block_size=1000, write_mode="overwrite",
+              parallel=False, **kwargs):
         """
         Take each record in the generator and write it to a parquet file.
 
@@ -47,7 +50,7 @@ class ParquetDataset:
         schema defines the name, dtype, shape of a column, as well as the feature
         type of a column. The feature type, defines how to encode and decode the column value.
 
-        There are three kinds of feature type:
+        There are four kinds of feature type:
         1. Scalar, such as a int or float number, or a string, which can be directly mapped
            to a parquet type
         2. NDarray, which takes a np.ndarray and save it serialized bytes. The corresponding
@@ -55,16 +58,30 @@ class ParquetDataset:
         3. Image, which takes a string representing a image file in local file system and save
            the raw file content bytes.
            The corresponding parquet type is BYTE_ARRAY.
+        4. Tensor, which takes a np.ndarray of the fixed dtype and shape in the schema and
+           save its raw uncompressed bytes, so that it could be decoded with np.frombuffer
+           without decompression. The corresponding parquet type is BYTE_ARRAY.
 
         :param path: the output path, e.g. file:///output/path, hdfs:///output/path
         :param generator: generate a dict, whose key is a string and value is one of
                           (a scalar value, ndarray, image file path)
         :param schema: a dict, whose key is a string, value is one of
                       (schema_field.Scalar, schema_field.NDarray, schema_field.Image)
+        :param block_size: the number of records in a chunk.
+        :param write_mode: the Spark save mode, e.g. "overwrite".
+        :param parallel: if True, the generator could also be an RDD of records, and the chunks
+               are encoded and written concurrently, instead of one chunk after another from
+               the driver. The records of an RDD are evenly distributed to
+               ceil(num_records / block_size) chunks in a single Spark job, and a generator is
+               written one group of (number of cores) chunks at a time. A manifest of the row
+               count of each chunk is written to _orca_manifest.
         :param kwargs: other args
         """
 
         sc = init_nncontext()
+        if parallel:
+            ParquetDataset._write_parallel(sc, path, generator, schema, block_size, write_mode)
+            return
         spark = SparkSession(sc)
         node_num, core_num = get_node_and_core_number()
         for i, chunk in enumerate(chunks(generator, block_size)):
@@ -77,6 +94,62 @@ class ParquetDataset:
 
         write_text(metadata_path, encode_schema(schema))
 
+    @staticmethod
+    def _write_parallel(sc, path, records, schema, block_size, write_mode):
+        from pyspark import RDD, StorageLevel
+        from pyspark.sql import Row
+        from itertools import islice
+        spark = SparkSession(sc)
+        node_num, core_num = get_node_and_core_number()
+
+        def to_row(record, chunk):
+            row = dict_to_row(schema, record).asDict()
+            row["chunk"] = chunk
+            return chunk, Row(**row)
+
+        def write_chunks(rows_rdd, num_chunks, mode):
+            # chunk i goes to partition i, so that each task writes exactly one chunk
+            rows_rdd = rows_rdd.partitionBy(num_chunks, lambda chunk: chunk).values()
+            spark.createDataFrame(rows_rdd).write \
+                .partitionBy("chunk").mode(mode).parquet(path)
+
+        if isinstance(records, RDD):
+            # not to compute the records again for the count, the index and the write
+            persisted = not records.is_cached
+            if persisted:
+                records.persist(StorageLevel.MEMORY_AND_DISK)
+            num_records = records.count()
+            num_chunks = max(int(math.ceil(num_records / block_size)), 1)
+            rows_rdd = records.zipWithIndex().map(lambda x: to_row(x[0], x[1] % num_chunks))
+            write_chunks(rows_rdd, num_chunks, write_mode)
+            if persisted:
+                records.unpersist()
+            # records are assigned to the chunks in round robin
+            manifest = {f"chunk={i}": num_records // num_chunks + int(i < num_records % num_chunks)
+                        for i in range(num_chunks)}
+        else:
+            # the generator is taken a group of blocks at a time, and the blocks of a group
+            # are written concurrently, so that the driver only holds one group of records
+            blocks = chunks(records, block_size)
+            manifest = {}
+            mode = write_mode
+            while True:
+                group = [list(block) for block in islice(blocks, core_num * node_num)]
+                if not group:
+                    break
+                start = len(manifest)
+                indexed = [(record, start + i) for i, block in enumerate(group)
+                           for record in block]
+                for i, block in enumerate(group):
+                    manifest[f"chunk={start + i}"] = len(block)
+                rows_rdd = sc.parallelize(indexed, len(group)).map(lambda x: to_row(*x))
+                write_chunks(rows_rdd, len(group), mode)
+                mode = "append"
+
+        metadata_path = os.path.join(path, "_orca_metadata")
+        write_text(metadata_path, encode_schema(schema))
+        write_text(os.path.join(path, "_orca_manifest"), json.dumps(manifest))
+
     @staticmethod
     def _read_as_dict_rdd(path):
         sc = SparkContext.getOrCreate()
@@ -141,10 +214,14 @@ class ParquetIterable:
     """
     Creates a `Dataset` that includes only 1/`num_shards` of this dataset.
     The Dataset will contain all elements of total dataset whose index % num_shards = rank.
+
+    The data is streamed lazily, row group by row group, with at most `prefetch` decoded
+    row groups read ahead in a background thread. The row groups could be further split
+    among the workers of a DataLoader (see `set_worker`).
     """
 
     def __init__(self, row_group, schema, num_shards=None,
-                 rank=None, transforms=None):
+                 rank=None, transforms=None, prefetch=2):
         self.row_group = row_group
 
         # To get the indices we expect
@@ -153,11 +230,14 @@ class ParquetIterable:
         self.num_shards = num_shards
         self.rank = rank
         self.transforms = transforms
-        self.datapiece = self._load_data(schema)
-        self.cur = 0
-        self.cur_tail = len(self.datapiece)
-
-    def _load_data(self, schema):
+        self.schema = schema
+        self.prefetch = prefetch
+        self.worker_id = 0
+        self.num_workers = 1
+        self.chunk_paths = self._select_chunks()
+        self._iterator = None
+
+    def _select_chunks(self):
         if self.num_shards is None or self.rank is None:
             filter_row_group_indexed = [
                 index for index in list(range(len(self.row_group)))]
@@ -172,34 +252,172 @@ class ParquetIterable:
                     self.rank, self.num_shards)
             filter_row_group_indexed = [index for index in list(range(len(self.row_group)))
                                         if index % self.num_shards == self.rank]
+        return [self.row_group[i] for i in filter_row_group_indexed]
 
-        data_record = []
-        for select_chunk_path in [self.row_group[i] for i in filter_row_group_indexed]:
-            pq_table = pq.read_table(select_chunk_path)
-            df = decode_feature_type_ndarray(pq_table.to_pandas(), schema)
-            data_record.extend(df.to_dict("records"))
-        return data_record
+    def set_worker(self, worker_id, num_workers):
+        """
+        Only read the row groups whose index % num_workers = worker_id of this shard.
+        """
+        self.worker_id = worker_id
+        self.num_workers = num_workers
+
+    def _pieces(self):
+        # (file path, row group index) of this shard in order
+        pieces = []
+        for chunk_path in self.chunk_paths:
+            files = sorted(name for name in os.listdir(chunk_path)
+                           if name.endswith(".parquet") and not name.startswith(("_", ".")))
+            for name in files:
+                file_path = os.path.join(chunk_path, name)
+                num_row_groups = pq.ParquetFile(file_path).num_row_groups
+                pieces.extend((file_path, i) for i in range(num_row_groups))
+        return [piece for i, piece in enumerate(pieces)
+                if i % self.num_workers == self.worker_id]
+
+    def _decode_table(self, table):
+        # decode a table into a dict of columns, ndarray fields are stacked if their rows
+        # have the same shape, otherwise kept as a list of ndarray
+        columns = {}
+        for name, field in self.schema.items():
+            column = table.column(name)
+            if field.feature_type == FeatureType.NDARRAY:
+                values = [decode_ndarray(v) for v in column.to_pylist()]
+                columns[name] = _stack_ndarrays(values)
+            elif field.feature_type == FeatureType.TENSOR:
+                columns[name] = decode_tensor_column(field, column)
+            elif field.feature_type == FeatureType.IMAGE:
+                columns[name] = column.to_pylist()
+            else:
+                columns[name] = column.to_numpy()
+        return columns
+
+    def _read_row_groups(self):
+        for file_path, i in self._pieces():
+            table = pq.ParquetFile(file_path).read_row_group(i, columns=list(self.schema.keys()))
+            if table.num_rows > 0:
+                yield table.num_rows, self._decode_table(table)
+
+    def _prefetched_row_groups(self):
+        if not self.prefetch:
+            yield from self._read_row_groups()
+            return
+        import queue
+        import threading
+        row_groups = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        end = object()
+
+        def produce():
+            try:
+                for item in self._read_row_groups():
+                    while not stop.is_set():
+                        try:
+                            row_groups.put(item, timeout=0.1)
+                            break
+                        except queue.Full:
+                            pass
+                    if stop.is_set():
+                        return
+                item = end
+            except Exception as e:
+                item = e
+            while not stop.is_set():
+                try:
+                    row_groups.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = row_groups.get()
+                if item is end:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+    def iter_batches(self, batch_size):
+        """
+        Yield batches as dicts of stacked columns, the last batch could be smaller.
+        """
+        buffered, buffered_rows = [], 0
+        for num_rows, columns in self._prefetched_row_groups():
+            buffered.append(columns)
+            buffered_rows += num_rows
+            if buffered_rows < batch_size:
+                continue
+            columns = _concat_columns(buffered, self.schema)
+            start = 0
+            while buffered_rows - start >= batch_size:
+                yield _slice_columns(columns, start, start + batch_size)
+                start += batch_size
+            buffered = [_slice_columns(columns, start, buffered_rows)] \
+                if start < buffered_rows else []
+            buffered_rows -= start
+        if buffered_rows > 0:
+            yield _concat_columns(buffered, self.schema)
+
+    def _iter_rows(self):
+        for num_rows, columns in self._prefetched_row_groups():
+            for i in range(num_rows):
+                elem = {name: column[i] for name, column in columns.items()}
+                if self.transforms:
+                    yield self.transforms(elem)
+                else:
+                    yield elem
 
     def __iter__(self):
         return self
 
     def __next__(self):
         # move iter here so we can do transforms
-        if self.cur < self.cur_tail:
-            elem = self.datapiece[self.cur]
-            self.cur += 1
-            if self.transforms:
-                return self.transforms(elem)
-            else:
-                return elem
-        else:
-            raise StopIteration
+        if self._iterator is None:
+            self._iterator = self._iter_rows()
+        return next(self._iterator)
 
     def __call__(self):
-        self.cur = 0
+        self._iterator = None
         return self
 
 
+def _stack_ndarrays(values):
+    if not values:
+        return np.array([])
+    shape = values[0].shape
+    if all(v.shape == shape for v in values):
+        return np.stack(values)
+    # e.g. the labels of voc, whose shape is (-1, 5) in the schema
+    return values
+
+
+def _concat_columns(columns_list, schema):
+    if len(columns_list) == 1:
+        return columns_list[0]
+    columns = {}
+    for name, field in schema.items():
+        if field.feature_type == FeatureType.IMAGE:
+            columns[name] = [v for c in columns_list for v in c[name]]
+        elif field.feature_type == FeatureType.NDARRAY:
+            parts = [c[name] for c in columns_list]
+            if all(isinstance(part, np.ndarray) and part.shape[1:] == parts[0].shape[1:]
+                   for part in parts):
+                columns[name] = np.concatenate(parts)
+            else:
+                columns[name] = [v for part in parts for v in part]
+        else:
+            columns[name] = np.concatenate([c[name] for c in columns_list])
+    return columns
+
+
+def _slice_columns(columns, start, stop):
+    return {name: column[start:stop] for name, column in columns.items()}
+
+
 def _read32(bytestream):
     dt = np.dtype(np.uint32).newbyteorder('>')
     return np.frombuffer(bytestream.read(4), dtype=dt)[0]
@@ -234,36 +452,53 @@ def _extract_mnist_labels(labels_filepath):
         return labels
 
 
+def _list_label_images(directory, label, label_id):
+    label_path = os.path.join(directory, label)
+    for image in os.listdir(label_path):
+        image_path = os.path.join(label_path, image)
+        yield {"image": image_path,
+               "label": label_id,
+               "image_id": image_path,
+               "label_str": label}
+
+
 def write_from_directory(directory, label_map, output_path, shuffle=True, **kwargs):
     labels = os.listdir(directory)
     valid_labels = [label for label in labels if label in label_map]
+    if kwargs.get("parallel", False):
+        # list the label directories on the executors, and shuffle deterministically
+        # by a hash of the image path so that the rdd could be safely recomputed
+        sc = init_nncontext()
+        generator = sc.parallelize(valid_labels, max(len(valid_labels), 1)) \
+            .flatMap(lambda label: _list_label_images(directory, label, label_map[label]))
+        if shuffle:
+            seed = str(random.random())
+            generator = generator.sortBy(
+                lambda record: zlib.crc32((seed + record["image"]).encode("utf-8")))
+        ParquetDataset.write(output_path, generator, _image_folder_schema(), **kwargs)
+        return
     generator = []
     for label in valid_labels:
-        label_path = os.path.join(directory, label)
-        images = os.listdir(label_path)
-        for image in images:
-            image_path = os.path.join(label_path, image)
-            generator.append({"image": image_path,
-                              "label": label_map[label],
-                              "image_id": image_path,
-                              "label_str": label})
+        generator.extend(_list_label_images(directory, label, label_map[label]))
     if shuffle:
         random.shuffle(generator)
 
-    schema = {"image": SchemaField(feature_type=FeatureType.IMAGE,
-                                   dtype=DType.FLOAT32,
-                                   shape=()),
-              "label": SchemaField(feature_type=FeatureType.SCALAR,
-                                   dtype=DType.INT32,
-                                   shape=()),
-              "image_id": SchemaField(feature_type=FeatureType.SCALAR,
-                                      dtype=DType.STRING,
-                                      shape=()),
-              "label_str": SchemaField(feature_type=FeatureType.SCALAR,
-                                       dtype=DType.STRING,
-                                       shape=())}
+    ParquetDataset.write(output_path, generator, _image_folder_schema(), **kwargs)
+
 
-    ParquetDataset.write(output_path, generator, schema, **kwargs)
+def _image_folder_schema():
+    return {"image": SchemaField(feature_type=FeatureType.IMAGE,
+                                 dtype=DType.FLOAT32,
+                                 shape=()),
+            "label": SchemaField(feature_type=FeatureType.SCALAR,
+                                 dtype=DType.INT32,
+                                 shape=()),
+            "image_id": SchemaField(feature_type=FeatureType.SCALAR,
+                                    dtype=DType.STRING,
+                                    shape=()),
+            "label_str": SchemaField(feature_type=FeatureType.SCALAR,
+                                     dtype=DType.STRING,
+                                     shape=())}
 
 
 def _write_ndarrays(images, labels, output_path, **kwargs):
@@ -385,35 +620,31 @@ def read_as_dataloader(path, config=None, transforms=None, batch_size=1, *args,
 
     class ParquetIterableDataset(torch.utils.data.IterableDataset):
         def __init__(self, row_group, schema, num_shards=None,
-                     rank=None, transforms=None):
+                     rank=None, transforms=None, batch_size=None):
             super().__init__()
             self.iterator = ParquetIterable(row_group, schema, num_shards, rank, transforms)
-            self.cur = self.iterator.cur
-            self.cur_tail = self.iterator.cur_tail
+            self.batch_size = batch_size
 
         def __iter__(self):
-            return self.iterator.__iter__()
-
-        def __next__(self):
-            self.iterator.__next__()
+            if self.batch_size is not None:
+                return self.iterator.iter_batches(self.batch_size)
+            return self.iterator()
 
     def worker_init_fn(w_id):
+        # split the row groups among the workers
         worker_info = torch.utils.data.get_worker_info()
-        dataset = worker_info.dataset
-        iter_start = dataset.cur
-        iter_end = dataset.cur_tail
-        per_worker = int(
-            math.ceil(iter_end - iter_start / float(worker_info.num_workers)))
-        w_id = worker_info.id
-        dataset.cur = iter_start + w_id * per_worker
-        dataset.cur_tail = min(dataset.cur + per_worker, iter_end)
+        worker_info.dataset.iterator.set_worker(worker_info.id, worker_info.num_workers)
 
+    # without transforms, the batches are stacked when reading instead of collating rows
+    stream_batches = transforms is None
     dataset = ParquetIterableDataset(
         row_group=row_group, schema=schema, num_shards=config.get("num_shards"),
-        rank=config.get("rank"), transforms=transforms)
+        rank=config.get("rank"), transforms=transforms,
+        batch_size=batch_size if stream_batches else None)
 
     return torch.utils.data.DataLoader(dataset, num_workers=config.get("num_workers", 0),
-                                       batch_size=batch_size, worker_init_fn=worker_init_fn)
+                                       batch_size=None if stream_batches else batch_size,
+                                       worker_init_fn=worker_init_fn)
 
 
 def read_parquet(format, path, transforms=None, config=None, batch_size=1, *args, **kwargs):
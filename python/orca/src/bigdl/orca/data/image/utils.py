@@ -48,10 +48,26 @@ def ndarray_dtype_to_dtype(dtype):
     raise ValueError(f"{dtype} is not supported")
 
 
+def dtype_to_ndarray_dtype(dtype):
+
+    if dtype == DType.INT32:
+        return np.dtype(np.int32)
+
+    if dtype == DType.FLOAT32:
+        return np.dtype(np.float32)
+
+    if dtype == DType.UINT8:
+        return np.dtype(np.uint8)
+
+    raise ValueError(f"{dtype} is not supported")
+
+
 class FeatureType(Enum):
     IMAGE = 1
     NDARRAY = 2
     SCALAR = 3
+    # fixed-shape ndarray stored as raw bytes, with dtype and shape in the schema
+    TENSOR = 4
 
 
 PUBLIC_ENUMS = {
@@ -111,6 +127,41 @@ def decode_ndarray(bs):
     return np.load(BytesIO(bs))['arr']
 
 
+def encode_tensor(field, value):
+    value = np.ascontiguousarray(value, dtype=dtype_to_ndarray_dtype(field.dtype))
+    assert value.shape == tuple(field.shape), \
+        f"the shape of tensor should be {tuple(field.shape)}, but got {value.shape}"
+    return bytearray(value.tobytes())
+
+
+def decode_tensor(field, bs):
+    return np.frombuffer(bs, dtype=dtype_to_ndarray_dtype(field.dtype)).reshape(field.shape)
+
+
+def decode_tensor_column(field, column):
+    """
+    Decode a pyarrow binary column of tensors into one ndarray of shape
+    (num_rows,) + field.shape. The values are read in bulk from the data buffer of the
+    column without copying when possible.
+    """
+    dtype = dtype_to_ndarray_dtype(field.dtype)
+    shape = tuple(field.shape)
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+    num_rows = len(column)
+    if num_rows == 0:
+        return np.empty((0,) + shape, dtype=dtype)
+    if column.null_count == 0 and pa.types.is_binary(column.type):
+        _, offsets, data = column.buffers()
+        offsets = np.frombuffer(offsets, dtype=np.int32,
+                                count=num_rows + 1, offset=column.offset * 4)
+        item_size = int(np.prod(shape)) * dtype.itemsize
+        if np.all(np.diff(offsets) == item_size):
+            return np.frombuffer(data, dtype=dtype, count=num_rows * item_size // dtype.itemsize,
+                                 offset=int(offsets[0])).reshape((num_rows,) + shape)
+    return np.stack([decode_tensor(field, bs) for bs in column.to_pylist()])
+
+
 def row_to_dict(schema, row):
 
     row_dict = {}
@@ -119,6 +170,8 @@ def row_to_dict(schema, row):
             row_dict[k] = row[k]
         elif field.feature_type == FeatureType.NDARRAY:
             row_dict[k] = decode_ndarray(row[k])
+        elif field.feature_type == FeatureType.TENSOR:
+            row_dict[k] = decode_tensor(field, row[k])
         else:
             row_dict[k] = row[k]
 
@@ -143,6 +196,8 @@ def dict_to_row(schema, row_dict):
             memfile = BytesIO()
             np.savez_compressed(memfile, arr=v)
             row[k] = bytearray(memfile.getvalue())
+        elif schema_field.feature_type == FeatureType.TENSOR:
+            row[k] = encode_tensor(schema_field, v)
         else:
             row[k] = v
     return pyspark.Row(**row)
@@ -152,6 +207,8 @@ def decode_feature_type_ndarray(df, schema):
     for n, field in schema.items():
         if field.feature_type == FeatureType.NDARRAY:
             df[n] = df[n].map(lambda k: decode_ndarray(k))
+        elif field.feature_type == FeatureType.TENSOR:
+            df[n] = df[n].map(lambda k, field=field: decode_tensor(field, k))
     return df
 
 
@@ -41,6 +41,10 @@ class LocalStore:
         self.partitions[partition_idx][shard_idx] = shard_ref
         return 0
 
+    def upload_shard_list(self, partition_idx, shard_ref_list):
+        self.partitions[partition_idx] = dict(enumerate(shard_ref_list))
+        return 0
+
     def upload_partition(self, partition_id, partition_ref_list):
         self.partitions[partition_id] = partition_ref_list[0]
         return 0
@@ -91,7 +95,8 @@ def init_ray_if_not(redis_address, redis_password):
         ray.init(**init_params)
 
 
-def write_to_ray(idx, partition, redis_address, redis_password, partition_store_names):
+def write_to_ray(idx, partition, redis_address, redis_password, partition_store_names,
+                 coalesce_shards=False):
     init_ray_if_not(redis_address, redis_password)
     ip = ray._private.services.get_node_ip_address()
     local_store_name = None
@@ -108,9 +113,19 @@ def write_to_ray(idx, partition, redis_address, redis_password, partition_store_
     # when the spark job finished, the driver might exit and make the object
     # eligible for deletion.
     result = []
-    for shard_id, shard in enumerate(partition):
-        shard_ref = ray.put(shard, _owner=local_store)
-        result.append(local_store.upload_shards.remote((idx, shard_id), [shard_ref]))
+    if coalesce_shards:
+        # one object for all the shards of this partition. Ray serializes it with pickle 5,
+        # where the buffers of the ndarrays are stored out-of-band in the object store, so that
+        # the readers get zero-copy ndarray views.
+        shards = list(partition)
+        if shards:
+            partition_ref = ray.put(shards, _owner=local_store)
+            result.append(local_store.upload_partition.remote(idx, [partition_ref]))
+    else:
+        shard_refs = [ray.put(shard, _owner=local_store) for shard in partition]
+        if shard_refs:
+            # register all the shards of this partition with one actor call
+            result.append(local_store.upload_shard_list.remote(idx, shard_refs))
 
     is_empty = len(result) == 0
     if is_empty:
@@ -129,6 +144,143 @@ def get_from_ray(idx, redis_address, redis_password, idx_to_store_name):
     return partition
 
 
+def _assign_partitions_by_count(part_id2ip, actor_ips):
+    num_parts = len(part_id2ip)
+    avg_part_num = num_parts // len(actor_ips)
+    remainder = num_parts % len(actor_ips)
+
+    # the assigning algorithm
+    # 1. calculate the average partition number per actor avg_part_num, and the number
+    #    of remaining partitions remainder. So there are remainder number of actors got
+    #    avg_part_num + 1 partitions and other actors got avg_part_num partitions.
+    # 2. loop partitions and assign each according to ip, if no actor with this ip or
+    #    all actors with this ip have been full, this round of assignment failed.
+    # 3. assign the partitions that failed to be assigned to actors that has full
+    actor2assignments = [[] for i in range(len(actor_ips))]
+
+    ip2actors = {}
+    for idx, ip in enumerate(actor_ips):
+        if ip not in ip2actors:
+            ip2actors[ip] = []
+        ip2actors[ip].append(idx)
+
+    unassigned = []
+    for part_idx, ip in part_id2ip.items():
+        assigned = False
+        if ip in ip2actors:
+            ip_actors = ip2actors[ip]
+
+            for actor_id in ip_actors:
+                current_assignments = actor2assignments[actor_id]
+                if len(current_assignments) < avg_part_num:
+                    current_assignments.append(part_idx)
+                    assigned = True
+                    break
+                elif len(current_assignments) == avg_part_num and remainder > 0:
+                    current_assignments.append(part_idx)
+                    remainder -= 1
+                    assigned = True
+                    break
+        if not assigned:
+            unassigned.append((part_idx, ip))
+
+    for part_idx, ip in unassigned:
+        for current_assignments in actor2assignments:
+            if len(current_assignments) < avg_part_num:
+                current_assignments.append(part_idx)
+                break
+            elif len(current_assignments) == avg_part_num and remainder > 0:
+                current_assignments.append(part_idx)
+                remainder -= 1
+                break
+    return actor2assignments
+
+
+def _assign_partitions_by_size(part_id2ip, actor_ips, part_id2size, tolerance):
+    num_actors = len(actor_ips)
+    target = sum(part_id2size.values()) / num_actors
+    capacity = target * (1 + tolerance)
+    ip2actors = defaultdict(list)
+    for idx, ip in enumerate(actor_ips):
+        ip2actors[ip].append(idx)
+
+    loads = [0] * num_actors
+    actor2assignments = [[] for _ in range(num_actors)]
+    # largest partitions first, each goes to the least loaded actor on its node unless it
+    # would exceed the capacity, and otherwise to the least loaded actor of all
+    for part_idx in sorted(part_id2ip, key=lambda idx: (-part_id2size[idx], idx)):
+        size = part_id2size[part_idx]
+        local_actors = ip2actors.get(part_id2ip[part_idx], [])
+        actor_id = min(local_actors, key=lambda i: (loads[i], i)) if local_actors else None
+        if actor_id is None or (loads[actor_id] + size > capacity and
+                                min(loads) + size < loads[actor_id] + size):
+            actor_id = min(range(num_actors), key=lambda i: (loads[i], i))
+        actor2assignments[actor_id].append(part_idx)
+        loads[actor_id] += size
+
+    # every actor should get at least one partition if possible, move the smallest partition
+    # of the most loaded actor with more than one partition to each idle actor
+    for actor_id in range(num_actors):
+        if actor2assignments[actor_id]:
+            continue
+        donors = [i for i in range(num_actors) if len(actor2assignments[i]) > 1]
+        if not donors:
+            break
+        donor = max(donors, key=lambda i: loads[i])
+        part_idx = min(actor2assignments[donor], key=lambda idx: part_id2size[idx])
+        actor2assignments[donor].remove(part_idx)
+        loads[donor] -= part_id2size[part_idx]
+        actor2assignments[actor_id].append(part_idx)
+        loads[actor_id] += part_id2size[part_idx]
+    return actor2assignments
+
+
+def assign_partitions(part_id2ip, actor_ips, part_id2size=None, skew_threshold=2.0,
+                      tolerance=0.1):
+    """
+    Assign partitions to actors.
+
+    If the partition sizes are unknown or similar, i.e. the largest partition is at most
+    skew_threshold times the smallest one, the partitions are balanced by count and the local
+    actors are preferred. Otherwise the partitions are balanced by bytes: the largest
+    partitions are placed first on the least loaded local actor, and are moved to a remote
+    actor only if the local one would exceed the average bytes per actor by more than
+    tolerance.
+
+    :param part_id2ip: a dict of {partition index: node ip of the partition}.
+    :param actor_ips: a list of node ip of each actor.
+    :param part_id2size: (optional) a dict of {partition index: size in bytes}.
+    :return: a list of the assigned partition indices of each actor, and a dict of statistics,
+             including the bytes per actor, the imbalance (the max bytes of an actor over the
+             average) and the bytes of the partitions assigned to a remote actor.
+    """
+    sizes = list(part_id2size.values()) if part_id2size else []
+    if sizes and min(sizes) * skew_threshold < max(sizes):
+        strategy = "size"
+        actor2assignments = _assign_partitions_by_size(part_id2ip, actor_ips, part_id2size,
+                                                       tolerance)
+    else:
+        strategy = "count"
+        actor2assignments = _assign_partitions_by_count(part_id2ip, actor_ips)
+
+    stats = {"strategy": strategy, "bytes_per_actor": None, "imbalance": None,
+             "remote_bytes": None,
+             "remote_partitions": sum(part_id2ip[idx] != actor_ip
+                                      for actor_ip, assignment in zip(actor_ips,
+                                                                      actor2assignments)
+                                      for idx in assignment)}
+    if part_id2size:
+        bytes_per_actor = [sum(part_id2size[idx] for idx in assignment)
+                           for assignment in actor2assignments]
+        average = sum(bytes_per_actor) / len(bytes_per_actor)
+        stats["bytes_per_actor"] = bytes_per_actor
+        stats["imbalance"] = max(bytes_per_actor) / average if average else 1.0
+        stats["remote_bytes"] = sum(part_id2size[idx]
+                                    for actor_ip, assignment in zip(actor_ips, actor2assignments)
+                                    for idx in assignment if part_id2ip[idx] != actor_ip)
+    return actor2assignments, stats
+
+
 class RayXShards(XShards):
 
     def __init__(self, uuid, id_ip_store_rdd, partition_stores):
@@ -138,6 +290,9 @@ class RayXShards(XShards):
         self.id_ip_store = self.rdd.collect()
         self.partition2store_name = {idx: store_name for idx, _, store_name in self.id_ip_store}
         self.partition2ip = {idx: ip for idx, ip, _ in self.id_ip_store}
+        self._partition_refs = None
+        self._partition_sizes = None
+        self.assignment_stats = None
 
     def transform_shard(self, func, *args):
         raise Exception("Transform is not supported for RayXShards")
@@ -166,10 +321,38 @@ class RayXShards(XShards):
 
     def get_refs(self):
         """
-        Flatten get_partition_refs. Get a list of partition_refs or shard_refs
+        Flatten get_partition_refs. Get a list of partition_refs or shard_refs.
+        Note that a partition created with coalesce_shards is a single partition_ref.
         """
         partition_refs = self.get_partition_refs()
-        return [ref for partition_ref in partition_refs for ref in partition_ref]
+        return [ref for partition_ref in partition_refs
+                for ref in (partition_ref if isinstance(partition_ref, list) else [partition_ref])]
+
+    def get_partition_sizes(self):
+        """
+        Get the size in bytes of each partition in the object store.
+
+        :return: a dict of {partition index: size}, or None if the sizes are not available
+                 in this version of Ray.
+        """
+        if self._partition_sizes is None:
+            try:
+                from ray.experimental import get_object_locations
+            except ImportError:
+                return None
+            if self._partition_refs is None:
+                self._partition_refs = self.get_partition_refs()
+            part_refs = [ref if isinstance(ref, list) else [ref] for ref in self._partition_refs]
+            try:
+                locations = get_object_locations([ref for refs in part_refs for ref in refs])
+            except Exception as e:
+                logger.warning(f"Failed to get the partition sizes: {e}")
+                return None
+            self._partition_sizes = {
+                idx: sum(locations[ref].get("object_size") or 0
+                         for ref in refs if ref in locations)
+                for idx, refs in enumerate(part_refs)}
+        return self._partition_sizes
 
     def collect_partitions(self):
         part_refs = self.get_partition_refs()
@@ -195,10 +378,15 @@ class RayXShards(XShards):
         return spark_xshards
 
     def _get_multiple_partition_refs(self, ids):
+        if self._partition_refs is None:
+            self._partition_refs = self.get_partition_refs()
         refs = []
         for idx in ids:
-            local_store_handle = self.partition_stores[self.partition2store_name[idx]]
-            partition_ref = local_store_handle.get_partition.remote(idx)
+            partition_ref = self._partition_refs[idx]
+            if not isinstance(partition_ref, ray.ObjectRef):
+                # a partition of separate shards, which are gathered by the store
+                local_store_handle = self.partition_stores[self.partition2store_name[idx]]
+                partition_ref = local_store_handle.get_partition.remote(idx)
             refs.append(partition_ref)
         return refs
 
@@ -287,19 +475,6 @@ class RayXShards(XShards):
                            f"unbalancing workload on different actors. We recommend you to "
                            f"repartition the rdd for better performance.")
 
-        avg_part_num = num_parts // len(actors)
-        remainder = num_parts % len(actors)
-
-        part_id2ip = self.partition2ip.copy()
-        # the assigning algorithm
-        # 1. calculate the average partition number per actor avg_part_num, and the number
-        #    of remaining partitions remainder. So there are remainder number of actors got
-        #    avg_part_num + 1 partitions and other actors got avg_part_num partitions.
-        # 2. loop partitions and assign each according to ip, if no actor with this ip or
-        #    all actors with this ip have been full, this round of assignment failed.
-        # 3. assign the partitions that failed to be assigned to actors that has full
-
-        # todo extract this algorithm to other functions for unit tests.
         actor_ips = []
         for actor in actors:
             assert hasattr(actor, "get_node_ip"), "each actor should have a get_node_ip method"
@@ -308,43 +483,14 @@ class RayXShards(XShards):
 
         actor_ips = ray.get(actor_ips)
 
-        actor2assignments = [[] for i in range(len(actors))]
-
-        ip2actors = {}
-        for idx, ip in enumerate(actor_ips):
-            if ip not in ip2actors:
-                ip2actors[ip] = []
-            ip2actors[ip].append(idx)
-
-        unassigned = []
-        for part_idx, ip in part_id2ip.items():
-            assigned = False
-            if ip in ip2actors:
-                ip_actors = ip2actors[ip]
-
-                for actor_id in ip_actors:
-                    current_assignments = actor2assignments[actor_id]
-                    if len(current_assignments) < avg_part_num:
-                        current_assignments.append(part_idx)
-                        assigned = True
-                        break
-                    elif len(current_assignments) == avg_part_num and remainder > 0:
-                        current_assignments.append(part_idx)
-                        remainder -= 1
-                        assigned = True
-                        break
-            if not assigned:
-                unassigned.append((part_idx, ip))
-
-        for part_idx, ip in unassigned:
-            for current_assignments in actor2assignments:
-                if len(current_assignments) < avg_part_num:
-                    current_assignments.append(part_idx)
-                    break
-                elif len(current_assignments) == avg_part_num and remainder > 0:
-                    current_assignments.append(part_idx)
-                    remainder -= 1
-                    break
+        actor2assignments, stats = assign_partitions(self.partition2ip, actor_ips,
+                                                     self.get_partition_sizes())
+        self.assignment_stats = stats
+        if stats["bytes_per_actor"] is not None:
+            logger.info(f"Assigned {num_parts} partitions to {len(actors)} actors by "
+                        f"{stats['strategy']}, bytes per actor: {stats['bytes_per_actor']}, "
+                        f"imbalance: {stats['imbalance']:.3f}, "
+                        f"remote bytes: {stats['remote_bytes']}")
 
         if num_parts < len(actors):
             # filter assigned actors
@@ -383,11 +529,20 @@ class RayXShards(XShards):
         return RayXShards(uuid_str, new_id_ip_store_rdd, partition_stores)
 
     @staticmethod
-    def from_spark_xshards(spark_xshards):
-        return RayXShards._from_spark_xshards_ray_api(spark_xshards)
+    def from_spark_xshards(spark_xshards, coalesce_shards=False):
+        """
+        Put the partitions of a SparkXShards into the Ray object store.
+
+        :param spark_xshards: a SparkXShards.
+        :param coalesce_shards: whether to put all the shards of a Spark partition as one
+               object, which is registered with a single actor call and read with zero-copy
+               ndarray views. Otherwise each shard is a separate object. Default is False.
+        :return: a RayXShards.
+        """
+        return RayXShards._from_spark_xshards_ray_api(spark_xshards, coalesce_shards)
 
     @staticmethod
-    def _from_spark_xshards_ray_api(spark_xshards):
+    def _from_spark_xshards_ray_api(spark_xshards, coalesce_shards=False):
         ray_ctx = RayContext.get()
         address = ray_ctx.redis_address
         password = ray_ctx.redis_password
@@ -419,7 +574,7 @@ class RayXShards(XShards):
         ray.get([v.get_partitions_refs.remote() for v in partition_stores.values()])
         partition_store_names = list(partition_stores.keys())
         result_rdd = spark_xshards.rdd.mapPartitionsWithIndex(lambda idx, part: write_to_ray(
-            idx, part, address, password, partition_store_names)).cache()
+            idx, part, address, password, partition_store_names, coalesce_shards)).cache()
         result = result_rdd.collect()
 
         id2ip = {}
@@ -228,22 +228,24 @@ class SparkXShards(XShards):
             import pandas as pd
 
             if num_partitions > self.rdd.getNumPartitions():
-                rdd = self.rdd\
-                    .flatMap(lambda df: df.apply(lambda row: (row[0], row.values.tolist()), axis=1)
-                             .values.tolist())\
-                    .partitionBy(num_partitions)
+                import numpy as np
+
+                def split_df(index, iter):
+                    # spread the rows of each DataFrame over the partitions in turn, starting
+                    # from a different partition for each input partition
+                    for df in iter:
+                        partition_ids = (np.arange(len(df)) + index) % num_partitions
+                        for item in split_pandas_df(df, partition_ids, num_partitions):
+                            yield item
+                rdd = self.rdd.mapPartitionsWithIndex(split_df)\
+                    .partitionBy(num_partitions, lambda key: key)
 
                 schema = self._get_schema()
 
                 def merge_rows(iter):
-                    data = [value[1] for value in list(iter)]
-                    if data:
-                        df = pd.DataFrame(data=data, columns=schema['columns'])\
-                            .astype(schema['dtypes'])
-                        return [df]
-                    else:
-                        # no data in this partition
-                        return iter
+                    df = merge_pandas_dfs([value[1] for value in iter], schema)
+                    # no data in this partition if df is None
+                    return [df] if df is not None else []
                 repartitioned_shard = SparkXShards(rdd.mapPartitions(merge_rows))
             else:
                 def combine_df(iter):
@@ -304,32 +306,28 @@ class SparkXShards(XShards):
         :return: a new SparkXShards.
         """
         if self._get_class_name() == 'pandas.core.frame.DataFrame':
-            import pandas as pd
             schema = self._get_schema()
             # if partition by a column
             if isinstance(cols, str):
                 if cols not in schema['columns']:
                     raise Exception("The partition column is not in the DataFrame")
-                # change data to key value pairs
-                rdd = self.rdd.flatMap(
-                    lambda df: df.apply(lambda row: (row[cols], row.values.tolist()), axis=1)
-                    .values.tolist())
-
                 partition_num = self.rdd.getNumPartitions() if not num_partitions \
                     else num_partitions
+
+                # split each DataFrame by the hash of the column into columnar sub-DataFrames
+                def split_df(df):
+                    return split_pandas_df(df, hash_partition_ids(df, cols, partition_num),
+                                           partition_num)
                 # partition with key
-                partitioned_rdd = rdd.partitionBy(partition_num)
+                partitioned_rdd = self.rdd.flatMap(split_df)\
+                    .partitionBy(partition_num, lambda key: key)
             else:
                 raise Exception("Only support partition by a column name")
 
             def merge(iterator):
-                data = [value[1] for value in list(iterator)]
-                if data:
-                    df = pd.DataFrame(data=data, columns=schema['columns']).astype(schema['dtypes'])
-                    return [df]
-                else:
-                    # no data in this partition
-                    return []
+                df = merge_pandas_dfs([value[1] for value in iterator], schema)
+                # no data in this partition if df is None
+                return [df] if df is not None else []
             # merge records to df in each partition
             partitioned_shard = SparkXShards(partitioned_rdd.mapPartitions(merge))
             self._uncache()
@@ -297,7 +297,7 @@ def _convert_list_tuple(data, allow_tuple, allow_list):
 def process_spark_xshards(spark_xshards, num_workers):
     from bigdl.orca.data.ray_xshards import RayXShards
     data = spark_xshards
-    ray_xshards = RayXShards.from_spark_xshards(data)
+    ray_xshards = RayXShards.from_spark_xshards(data, coalesce_shards=True)
     return ray_xshards
 
 
@@ -365,3 +365,80 @@ def spark_xshards_to_ray_dataset(spark_xshards):
 
     ray_dataset = ray.data.from_pandas_refs(partition_refs)
     return ray_dataset
+
+
+def split_pandas_df(df, partition_ids, num_partitions):
+    """
+    Split a pandas DataFrame into sub-DataFrames by the target partition id of each row, which
+    are serialized as Arrow IPC streams.
+
+    :return: a list of (partition_id, serialized sub-DataFrame).
+    """
+    partition_ids = np.asarray(partition_ids, dtype=np.int64)
+    # a stable sort keeps the order of the rows in each sub-DataFrame
+    order = np.argsort(partition_ids, kind="stable")
+    sorted_ids = partition_ids[order]
+    boundaries = np.searchsorted(sorted_ids, np.arange(num_partitions + 1))
+    result = []
+    for i in range(num_partitions):
+        start, end = boundaries[i], boundaries[i + 1]
+        if start < end:
+            result.append((i, serialize_pandas_df(df.iloc[order[start:end]])))
+    return result
+
+
+def hash_partition_ids(df, cols, num_partitions):
+    """
+    The target partition id of each row of a pandas DataFrame by the hash of cols, which is the
+    same in all the processes.
+    """
+    import pandas as pd
+    hashes = pd.util.hash_pandas_object(df[cols], index=False).values
+    return (hashes % np.uint64(num_partitions)).astype(np.int64)
+
+
+def _arrow_compatible(df):
+    import pandas as pd
+    # Arrow may change the values of object columns other than strings, e.g. lists become
+    # ndarrays, and the ints in a column of mixed ints and floats become floats
+    return all(df[c].dtype != object or
+               pd.api.types.infer_dtype(df[c], skipna=True) in ("string", "bytes", "empty")
+               for c in df.columns)
+
+
+def serialize_pandas_df(df):
+    import pickle
+    try:
+        import pyarrow as pa
+        if not _arrow_compatible(df):
+            raise ValueError("the DataFrame can not be converted to Arrow without loss")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        writer = pa.RecordBatchStreamWriter(sink, table.schema)
+        writer.write_table(table)
+        writer.close()
+        return "arrow", sink.getvalue().to_pybytes()
+    except Exception:
+        return "pickle", pickle.dumps(df.reset_index(drop=True), protocol=4)
+
+
+def deserialize_pandas_df(data):
+    import pickle
+    kind, payload = data
+    if kind == "arrow":
+        import pyarrow as pa
+        return pa.ipc.open_stream(payload).read_all().to_pandas()
+    return pickle.loads(payload)
+
+
+def merge_pandas_dfs(serialized_dfs, schema):
+    """
+    Concatenate the serialized sub-DataFrames into one DataFrame with the columns and dtypes
+    of schema.
+    """
+    import pandas as pd
+    dfs = [deserialize_pandas_df(data) for data in serialized_dfs]
+    if not dfs:
+        return None
+    df = dfs[0] if len(dfs) == 1 else pd.concat(dfs, ignore_index=True)
+    return df[list(schema['columns'])].astype(schema['dtypes'])
@@ -37,6 +37,7 @@ class Estimator(object):
                    sync_stats=False,
                    log_level=logging.INFO,
                    log_to_driver=True,
+                   persistent_workers=False,
                    ):
         """
         Create an Estimator for torch.
@@ -75,6 +76,12 @@ class Estimator(object):
                horovod, ray and pyspark backend.
         :param log_to_driver: (bool) Whether display executor log on driver in cluster mode.
                Default: True. This option is only for "spark" backend.
+        :param persistent_workers: (bool) Whether to keep the model in the executors between
+               fit, evaluate and predict, cache the repartitioned SparkXShards and send the
+               trained state back to the driver in memory instead of model_dir. At most the 2
+               most recently used SparkXShards are cached. shutdown must be called to release
+               them once the estimator is not used anymore, see its docstring for the workers
+               it could not reach. Default: False. This option is only for "spark" backend.
         :return: an Estimator object.
         """
         if backend in {"horovod", "ray"}:
@@ -119,6 +126,7 @@ class Estimator(object):
                                            log_level=log_level,
                                            model_dir=model_dir,
                                            log_to_driver=log_to_driver,
+                                           persistent_workers=persistent_workers,
                                            )
         else:
             raise ValueError("Only horovod, ray, bigdl and spark backends are "
@@ -17,6 +17,8 @@
 import types
 import logging
 import numbers
+import uuid
+from collections import OrderedDict
 import torch
 import numpy as np
 
@@ -36,6 +38,9 @@ from bigdl.orca.learn.log_monitor import start_log_server
 from bigdl.orca.learn.utils import find_free_port, find_ip_and_free_port
 from bigdl.dllib.utils.utils import get_node_ip
 
+# the max number of the repartitioned SparkXShards cached with persistent workers
+_MAX_CACHED_RDDS = 2
+
 
 def partition_to_creator(partition):
 
@@ -89,7 +94,8 @@ class PyTorchPySparkEstimator(BaseEstimator):
             sync_stats=True,
             log_level=logging.INFO,
             model_dir=None,
-            log_to_driver=True):
+            log_to_driver=True,
+            persistent_workers=False):
         logging.basicConfig(level=log_level,
                             format='[%(asctime)s] %(levelname)-8s %(message)s',
                             datefmt='%Y-%m-%d %H:%M:%S'
@@ -116,6 +122,15 @@ class PyTorchPySparkEstimator(BaseEstimator):
         self.model_creator = model_creator
         self.initialization_hook = initialization_hook
 
+        # with persistent workers, the executors keep the model between fit, evaluate and
+        # predict, the repartitioned SparkXShards are cached, and the trained state is sent
+        # back to the driver in memory
+        self.persistent_workers = persistent_workers
+        self.estimator_id = uuid.uuid4().hex
+        self.state_version = 0
+        self._state_broadcast = None
+        self._cached_rdds = OrderedDict()
+
         num_nodes, cores_per_node = get_node_and_core_number()
         self.num_workers = num_nodes * workers_per_node
         self.total_cores = num_nodes * cores_per_node
@@ -164,6 +179,31 @@ class PyTorchPySparkEstimator(BaseEstimator):
         cluster_info = self.workerRDD.barrier().mapPartitions(find_ip_and_free_port).collect()
         return cluster_info
 
+    def _get_worker_params(self):
+        return dict(worker_id=self.estimator_id if self.persistent_workers else None,
+                    state_version=self.state_version)
+
+    def _repartition(self, data, cache):
+        if not (self.persistent_workers and cache):
+            return data.rdd.repartition(self.num_workers)
+        key = data.rdd.id()
+        if key in self._cached_rdds:
+            self._cached_rdds.move_to_end(key)
+        else:
+            self._cached_rdds[key] = data.rdd.repartition(self.num_workers).cache()
+            # e.g. the train and the validation data, the least recently used is released
+            while len(self._cached_rdds) > _MAX_CACHED_RDDS:
+                _, rdd = self._cached_rdds.popitem(last=False)
+                rdd.unpersist()
+        return self._cached_rdds[key]
+
+    def _update_state_dict(self, state_dict):
+        self.state_dict = state_dict
+        self.state_version += 1
+        if self._state_broadcast is not None:
+            self._state_broadcast.unpersist()
+            self._state_broadcast = None
+
     def fit(self,
             data,
             epochs=1,
@@ -206,6 +246,7 @@ class PyTorchPySparkEstimator(BaseEstimator):
                 You can also provide custom metrics by passing in a custom training_operator_cls
                 when creating the Estimator.
         """
+        cache = isinstance(data, SparkXShards)
         data, _ = maybe_dataframe_to_xshards(data,
                                              validation_data=None,
                                              feature_cols=feature_cols,
@@ -221,6 +262,7 @@ class PyTorchPySparkEstimator(BaseEstimator):
             state_dict=state_dict,
             cluster_info=cluster_info)
         init_params.update(self.worker_init_params)
+        init_params.update(self._get_worker_params())
 
         params = dict(
             epochs=epochs,
@@ -237,12 +279,12 @@ class PyTorchPySparkEstimator(BaseEstimator):
             def transform_func(iter, init_params, param):
                 partition_data = list(iter)
                 param["data_creator"] = partition_to_creator(partition_data)
-                runner = PytorchPysparkWorker(**init_params)
+                runner = PytorchPysparkWorker.get_worker(**init_params)
                 result = runner.train_epochs(**param)
                 runner.shutdown()
                 return result
 
-            res = data.rdd.repartition(self.num_workers).barrier() \
+            res = self._repartition(data, cache).barrier() \
                 .mapPartitions(
                 lambda iter: transform_func(iter, init_params, params)).collect()
 
@@ -254,13 +296,18 @@ class PyTorchPySparkEstimator(BaseEstimator):
             params["data_creator"] = data
 
             def transform_func(iter, init_param, param):
-                return PytorchPysparkWorker(**init_param).train_epochs(**param)
+                return PytorchPysparkWorker.get_worker(**init_param).train_epochs(**param)
 
             res = self.workerRDD.barrier().mapPartitions(
                 lambda iter: transform_func(iter, init_params, params)).collect()
 
-        self.state_dict = PyTorchPySparkEstimator._get_state_dict_from_remote(self.model_dir)
-        worker_stats = res
+        if self.persistent_workers:
+            worker_stats = [stats for stats, _ in res]
+            state_dict = next(state for _, state in res if state is not None)
+        else:
+            worker_stats = res
+            state_dict = PyTorchPySparkEstimator._get_state_dict_from_remote(self.model_dir)
+        self._update_state_dict(state_dict)
 
         epoch_stats = list(map(list, zip(*worker_stats)))
         if reduce_results:
@@ -288,13 +335,12 @@ class PyTorchPySparkEstimator(BaseEstimator):
         return state_dicts
 
     def _get_broadcasted_state_dict(self, sc):
-        if self.state_dict:
-            state_dict_b = sc.broadcast(self.state_dict)
-        else:
-            state_dict_b = None
-        return state_dict_b
-
-    def _get_broadcasted_state_dict(self, sc):
+        if self.persistent_workers:
+            # reused until the state changes, and only fetched by the workers
+            # that don't hold this version of the state
+            if self._state_broadcast is None and self.state_dict:
+                self._state_broadcast = sc.broadcast(self.state_dict)
+            return self._state_broadcast
         if self.state_dict:
             state_dict_b = sc.broadcast(self.state_dict)
         else:
@@ -306,7 +352,7 @@ class PyTorchPySparkEstimator(BaseEstimator):
             partition_data = list(iter)
             # res = combine_in_partition(partition_data)
             param["data_creator"] = make_data_creator(partition_data)
-            return PytorchPysparkWorker(**init_param).predict(**params)
+            return PytorchPysparkWorker.get_worker(**init_param).predict(**params)
 
         pred_shards = SparkXShards(xshards.rdd.mapPartitions(
                                    lambda iter: transform_func(iter, init_params, params)))
@@ -340,6 +386,7 @@ class PyTorchPySparkEstimator(BaseEstimator):
             cluster_info=cluster_info,
         )
         init_params.update(self.worker_init_params)
+        init_params.update(self._get_worker_params())
 
         params = dict(
             batch_size=batch_size,
@@ -408,6 +455,7 @@ class PyTorchPySparkEstimator(BaseEstimator):
             cluster_info=cluster_info)
 
         init_params.update(self.worker_init_params)
+        init_params.update(self._get_worker_params())
 
         params = dict(
             batch_size=batch_size,
@@ -416,6 +464,7 @@ class PyTorchPySparkEstimator(BaseEstimator):
             info=info)
 
         from bigdl.orca.data import SparkXShards
+        cache = isinstance(data, SparkXShards)
         data, _ = maybe_dataframe_to_xshards(data,
                                              validation_data=None,
                                              feature_cols=feature_cols,
@@ -427,15 +476,15 @@ class PyTorchPySparkEstimator(BaseEstimator):
             def transform_func(iter, init_param, param):
                 partition_data = list(iter)
                 param["data_creator"] = partition_to_creator(partition_data)
-                return PytorchPysparkWorker(**init_param).validate(**param)
+                return PytorchPysparkWorker.get_worker(**init_param).validate(**param)
 
-            res = data.rdd.repartition(self.num_workers).barrier() \
+            res = self._repartition(data, cache).barrier() \
                 .mapPartitions(lambda iter: transform_func(iter, init_params, params)).collect()
         else:
             params["data_creator"] = data
 
             def transform_func(iter, init_param, param):
-                return PytorchPysparkWorker(**init_param).validate(**param)
+                return PytorchPysparkWorker.get_worker(**init_param).validate(**param)
 
             res = self.workerRDD.barrier().mapPartitions(
                 lambda iter: transform_func(iter, init_params, params)).collect()
@@ -477,7 +526,7 @@ class PyTorchPySparkEstimator(BaseEstimator):
         :param model_path: (str) Path to the existing model.
         """
         state_dict = torch.load(model_path)
-        self.state_dict = state_dict
+        self._update_state_dict(state_dict)
 
     def save_checkpoint(self, model_path):
         """
@@ -506,7 +555,7 @@ class PyTorchPySparkEstimator(BaseEstimator):
             self.load(model_path)
         else:
             self.driver_runner.load_checkpoint(filepath=model_path)
-            self.state_dict = self.driver_runner.get_state_dict()
+            self._update_state_dict(self.driver_runner.get_state_dict())
 
     def _process_stats(self, worker_stats):
         stats = {
@@ -523,4 +572,22 @@ class PyTorchPySparkEstimator(BaseEstimator):
         return stats
 
     def shutdown(self):
-        pass
+        """
+        Releases the cached data and state of this estimator, and the persistent workers.
+        It should be called once the estimator is not used anymore if persistent_workers is
+        True, otherwise the models stay in the executors until the application exits.
+        Note that the persistent workers are only released in the Python processes that run
+        the release tasks, a worker left in another Python process of an executor (e.g. one
+        that is idle while another runs the release task) stays in memory until that process
+        exits.
+        """
+        for rdd in self._cached_rdds.values():
+            rdd.unpersist()
+        self._cached_rdds = OrderedDict()
+        if self._state_broadcast is not None:
+            self._state_broadcast.unpersist()
+            self._state_broadcast = None
+        if self.persistent_workers:
+            estimator_id = self.estimator_id
+            self.workerRDD.mapPartitions(
+                lambda iter: PytorchPysparkWorker.release_worker(estimator_id)).collect()
@@ -43,6 +43,10 @@ from bigdl.orca.learn.log_monitor import LogMonitor
 
 logger = logging.getLogger(__name__)
 
+# the workers of the estimators with persistent_workers=True, which are kept in the Python
+# worker process of an executor between jobs, keyed by the estimator id
+_persistent_workers = {}
+
 
 class PytorchPysparkWorker(TorchRunner):
     """Manages a PyTorch model for training."""
@@ -74,16 +78,54 @@ class PytorchPysparkWorker(TorchRunner):
                          training_operator_cls, config, use_tqdm, scheduler_step_freq, sync_stats,
                          log_level=log_level)
 
-        self.state_dict = state_dict
         self.size = size
-        self.mode = mode
         self.backend = backend
-        self.cluster_info = cluster_info
         assert model_dir
         self.model_dir = model_dir
         self.log_to_driver = log_to_driver
+        self.persistent = False
+        self.state_version = None
 
         self.setup(cores_per_worker)
+        self.start(state_dict, mode, cluster_info, driver_ip, driver_port)
+
+    @staticmethod
+    def get_worker(worker_id=None, state_version=None, **init_params):
+        """
+        Get a worker for a job.
+
+        :param worker_id: the estimator id if the worker is persistent. A persistent worker is
+               cached in this Python process, and keeps the model, optimizer and scheduler
+               for the next jobs of the same estimator. Otherwise a new worker is created.
+        :param state_version: the version of the broadcast state_dict. A persistent worker only
+               loads the state_dict if it holds a different version.
+        :param init_params: the arguments of PytorchPysparkWorker.
+        """
+        if worker_id is None:
+            return PytorchPysparkWorker(**init_params)
+        worker = _persistent_workers.get(worker_id)
+        if worker is None:
+            worker = PytorchPysparkWorker(**init_params)
+            worker.persistent = True
+            _persistent_workers[worker_id] = worker
+        else:
+            worker.start(init_params["state_dict"], init_params["mode"],
+                         init_params["cluster_info"], init_params.get("driver_ip"),
+                         init_params.get("driver_port"))
+        worker.target_state_version = state_version
+        return worker
+
+    @staticmethod
+    def release_worker(worker_id):
+        """Removes the persistent worker of an estimator from this Python process."""
+        _persistent_workers.pop(worker_id, None)
+        return []
+
+    def start(self, state_dict, mode, cluster_info, driver_ip=None, driver_port=None):
+        self.state_dict = state_dict
+        self.mode = mode
+        self.cluster_info = cluster_info
+        self.target_state_version = None
         if self.log_to_driver:
             self.log_path, self.logger_thread, self.thread_stop = \
                 PytorchPysparkWorker._start_log_monitor(driver_ip, driver_port)
@@ -107,21 +149,48 @@ class PytorchPysparkWorker(TorchRunner):
         return log_path, logger_thread, thread_stop
 
     def setup_distributed(self, mode, cluster_info):
+        # a persistent worker keeps its components, and only sets up the process group
+        # and the training operator of this job
+        reused = self.models is not None
+        operator_state = self.training_operator.state_dict() if reused else None
         if mode == "fit":
             self.rank = get_rank(cluster_info)
             logger.info(f"cluster is: {cluster_info}")
             address = f"tcp://{cluster_info[0]}"
-            self.setup_torch_distribute(url=address,
-                                        world_rank=self.rank,
+            if reused:
+                from torch.nn.parallel import DistributedDataParallel
+                if dist.is_initialized():
+                    # left by a failed job
+                    dist.destroy_process_group()
+                dist.init_process_group(backend="gloo",
+                                        init_method=address,
+                                        rank=self.rank,
                                         world_size=self.size)
+                self.setup_operator([DistributedDataParallel(model) for model in self.models])
+            else:
+                self.setup_torch_distribute(url=address,
+                                            world_rank=self.rank,
+                                            world_size=self.size)
         else:
             self.rank = 0
-            self.setup_components()
+            if not reused:
+                self.setup_components()
             self.setup_operator(self.models)
+        if operator_state is not None:
+            self.training_operator.load_state_dict(operator_state)
+
+    def _load_broadcasted_state_dict(self):
+        if self.persistent and self.state_version is not None \
+                and self.state_version == self.target_state_version:
+            return
+        self.load_state_dict(self.state_dict.value)
+        self.state_version = self.target_state_version
 
     def train_epochs(self, data_creator, epochs=1, batch_size=32, profile=False,
                      info=None, wrap_dataloader=None, callbacks=None):
-        self.load_state_dict(self.state_dict.value)
+        self._load_broadcasted_state_dict()
+        # the state is being changed, and will be the next version if the training succeeds
+        self.state_version = None
         stats_list = super().train_epochs(data_creator, epochs, batch_size, profile, info,
                                           wrap_dataloader, callbacks)
         state_dict = self.get_state_dict()
@@ -129,6 +198,12 @@ class PytorchPysparkWorker(TorchRunner):
         if self.log_to_driver:
             LogMonitor.stop_log_monitor(self.log_path, self.logger_thread, self.thread_stop)
 
+        if self.persistent:
+            # the state is sent back to the driver with the stats instead of the model_dir
+            dist.destroy_process_group()
+            self.state_version = self.target_state_version + 1
+            return [(stats_list, state_dict if self.rank == 0 else None)]
+
         if self.rank == 0:
             save_pkl(state_dict, os.path.join(self.model_dir, "state.pkl"))
 
@@ -137,7 +212,7 @@ class PytorchPysparkWorker(TorchRunner):
     def validate(self, data_creator, batch_size=32, num_steps=None, profile=False,
                  info=None, wrap_dataloader=None):
         """Evaluates the model on the validation data set."""
-        self.load_state_dict(self.state_dict.value)
+        self._load_broadcasted_state_dict()
         validation_stats = super().validate(data_creator, batch_size, num_steps, profile, info,
                                             wrap_dataloader)
         if self.log_to_driver:
@@ -150,7 +225,7 @@ class PytorchPysparkWorker(TorchRunner):
         self._toggle_profiling(profile=profile)
 
         partition = data_creator(config, batch_size)
-        self.load_state_dict(self.state_dict.value)
+        self._load_broadcasted_state_dict()
         result = super().predict(partition=partition, batch_size=batch_size, profile=profile)
         if self.log_to_driver:
             LogMonitor.stop_log_monitor(self.log_path, self.logger_thread, self.thread_stop)
@@ -158,5 +233,8 @@ class PytorchPysparkWorker(TorchRunner):
 
     def shutdown(self):
         """Attempts to shut down the worker."""
+        if self.persistent:
+            # kept for the next jobs, and the process group is destroyed after training
+            return
         dist.destroy_process_group()
         super().shutdown()
@@ -121,6 +121,26 @@ class TestSparkXShards(TestCase):
         partitions = partitioned_shard.rdd.glom().collect()
         assert len(partitions) == 3
 
+    def test_partition_by_preserves_rows(self):
+        file_path = os.path.join(self.resource_path, "orca/data/csv")
+        data_shard = bigdl.orca.data.pandas.read_csv(file_path)
+        import pandas as pd
+        original = pd.concat(data_shard.collect(), ignore_index=True)
+        partitioned_shard = data_shard.partition_by(cols="location", num_partitions=3)
+        partitions = partitioned_shard.collect()
+        locations = [set(df["location"]) for df in partitions]
+        for i in range(len(locations)):
+            for j in range(i + 1, len(locations)):
+                assert not locations[i] & locations[j], \
+                    "a location should be in only one partition"
+        partitioned = pd.concat(partitions, ignore_index=True)
+        assert list(partitioned.dtypes) == list(original.dtypes)
+        assert len(partitioned) == len(original)
+
+        repartitioned = data_shard.repartition(5).collect()
+        assert sum(len(df) for df in repartitioned) == len(original)
+        assert all(list(df.dtypes) == list(original.dtypes) for df in repartitioned)
+
     def test_unique(self):
         file_path = os.path.join(self.resource_path, "orca/data/csv")
         data_shard = bigdl.orca.data.pandas.read_csv(file_path)
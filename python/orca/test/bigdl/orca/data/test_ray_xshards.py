@@ -16,7 +16,7 @@
 import pytest
 import ray
 
-from bigdl.orca.data.ray_xshards import RayXShards
+from bigdl.orca.data.ray_xshards import RayXShards, assign_partitions
 
 
 def get_ray_xshards():
@@ -45,6 +45,21 @@ def test_from_spark_xshards(orca_context_fixture):
     verify_collect_results(data_parts, ndarray_dict)
 
 
+def test_from_spark_xshards_coalesce_shards(orca_context_fixture):
+    from bigdl.orca.data import XShards
+    import numpy as np
+
+    ndarray_dict = {"x": np.random.randn(10, 4), "y": np.random.randn(10, 4)}
+    spark_xshards = XShards.partition(ndarray_dict)
+    ray_xshards = RayXShards.from_spark_xshards(spark_xshards, coalesce_shards=True)
+    verify_collect_results(ray_xshards.collect(), ndarray_dict)
+
+    # each partition is a single object of a list of shards
+    part_refs = ray_xshards._get_multiple_partition_refs(range(ray_xshards.num_partitions()))
+    partitions = ray.get(part_refs)
+    verify_collect_results([shard for part in partitions for shard in part], ndarray_dict)
+
+
 def test_to_spark_xshards(orca_context_fixture):
     ray_xshards, ndarray_dict = get_ray_xshards()
     data_parts = ray_xshards.to_spark_xshards().collect()
@@ -94,6 +109,27 @@ def test_less_partition_than_actors(orca_context_fixture):
         assert len(parts_list[counter]) == 1
 
 
+def test_assign_partitions_by_size():
+    part_id2ip = {0: "ip1", 1: "ip1", 2: "ip1", 3: "ip2", 4: "ip2", 5: "ip2"}
+    actor_ips = ["ip1", "ip1", "ip2"]
+
+    # similar sizes are balanced by count
+    assignments, stats = assign_partitions(part_id2ip, actor_ips, {i: 10 for i in range(6)})
+    assert stats["strategy"] == "count"
+    assert sorted(len(assignment) for assignment in assignments) == [2, 2, 2]
+
+    # a skewed partition gets an actor of its own and the rest are balanced by bytes
+    part_id2size = {0: 100, 1: 10, 2: 10, 3: 30, 4: 30, 5: 20}
+    assignments, stats = assign_partitions(part_id2ip, actor_ips, part_id2size)
+    assert stats["strategy"] == "size"
+    assert sorted(idx for assignment in assignments for idx in assignment) == list(range(6))
+    assert [0] in assignments
+    assert all(assignments)
+    assert stats["bytes_per_actor"] == [100, 40, 60]
+    assert stats["remote_bytes"] == 20
+    assert stats["imbalance"] == pytest.approx(1.5)
+
+
 def test_transform_shards_with_actors(orca_context_fixture):
     import random
     ray_xshards, ndarray_dict = get_ray_xshards()
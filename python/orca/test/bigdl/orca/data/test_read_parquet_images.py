@@ -105,6 +105,29 @@ class TestReadParquet(TestCase):
         finally:
             shutil.rmtree(temp_dir)
 
+    def test_read_parquet_images_streaming_batches(self):
+        temp_dir = tempfile.mkdtemp()
+
+        try:
+            ParquetDataset.write("file://" + temp_dir, images_generator(),
+                                 images_schema, block_size=4)
+            path = "file://" + temp_dir
+            rows = list(read_parquet("dataloader", path=path))
+
+            dataloader = read_parquet("dataloader", path=path, batch_size=3)
+            batches = list(dataloader)
+            assert all(len(batch["label"]) == 3 for batch in batches[:-1])
+            assert sum(len(batch["label"]) for batch in batches) == len(rows)
+            assert [label for batch in batches for label in batch["label"].tolist()] == \
+                [row["label"].item() for row in rows]
+
+            # row groups are split among the workers
+            dataloader = read_parquet("dataloader", path=path, batch_size=3,
+                                      config={"num_workers": 2})
+            assert sum(len(batch["label"]) for batch in dataloader) == len(rows)
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_parquet_images_training(self):
         from bigdl.orca.learn.tf2 import Estimator
         temp_dir = tempfile.mkdtemp()
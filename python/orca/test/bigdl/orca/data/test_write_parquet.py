@@ -14,6 +14,7 @@
 # limitations under the License.
 #
 
+import json
 import tempfile
 import shutil
 
@@ -21,6 +22,7 @@ import numpy as np
 import os
 from bigdl.orca.data.image.parquet_dataset import ParquetDataset
 from bigdl.orca.data.image.parquet_dataset import _write_ndarrays, write_from_directory, write_parquet
+from bigdl.orca.data.image.parquet_dataset import read_parquet
 from bigdl.orca.data.image.utils import DType, FeatureType, SchemaField
 from bigdl.orca.learn.tf.estimator import Estimator
 from bigdl.orca.data.image import write_mnist, write_voc
@@ -55,6 +57,77 @@ def test_write_parquet_simple(orca_context_fixture):
         shutil.rmtree(temp_dir)
 
 
+def test_write_parquet_tensor(orca_context_fixture):
+    sc = orca_context_fixture
+    temp_dir = tempfile.mkdtemp()
+    features = np.random.randn(100, 2, 5).astype(np.float32)
+
+    def generator(num):
+        for i in range(num):
+            yield {"id": i, "feature": features[i]}
+
+    schema = {
+        "id": SchemaField(feature_type=FeatureType.SCALAR, dtype=DType.INT32, shape=()),
+        "feature": SchemaField(feature_type=FeatureType.TENSOR, dtype=DType.FLOAT32,
+                               shape=(2, 5))
+    }
+
+    try:
+        ParquetDataset.write("file://" + temp_dir, generator(100), schema, block_size=30)
+        data, schema = ParquetDataset._read_as_dict_rdd("file://" + temp_dir)
+        data = data.collect()
+        for record in data:
+            assert np.all(record['feature'] == features[record['id']])
+
+        batches = list(read_parquet("dataloader", path="file://" + temp_dir, batch_size=16))
+        ids = np.concatenate([batch["id"].numpy() for batch in batches])
+        feature = np.concatenate([batch["feature"].numpy() for batch in batches])
+        assert feature.shape == (100, 2, 5)
+        assert np.all(feature == features[ids])
+
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def test_write_parquet_parallel(orca_context_fixture):
+    sc = orca_context_fixture
+    temp_dir = tempfile.mkdtemp()
+
+    def generator(num):
+        for i in range(num):
+            yield {"id": i, "feature": np.full((10,), i)}
+
+    schema = {
+        "id": SchemaField(feature_type=FeatureType.SCALAR, dtype=DType.INT32, shape=()),
+        "feature": SchemaField(feature_type=FeatureType.NDARRAY, dtype=DType.FLOAT32, shape=(10,))
+    }
+
+    try:
+        for records in [generator(95), sc.parallelize(list(generator(95)), 3)]:
+            ParquetDataset.write("file://" + temp_dir, records, schema, block_size=10,
+                                 parallel=True)
+            data, _ = ParquetDataset._read_as_dict_rdd("file://" + temp_dir)
+            data = data.collect()
+            assert sorted(record["id"] for record in data) == list(range(95))
+            for record in data:
+                assert np.all(record["feature"] == record["id"])
+
+            with open(os.path.join(temp_dir, "_orca_manifest")) as f:
+                manifest = json.load(f)
+            assert len(manifest) == 10
+            assert sum(manifest.values()) == 95
+            assert sorted(name for name in os.listdir(temp_dir) if name.startswith("chunk=")) \
+                == sorted(manifest.keys())
+            # each chunk is written by one task
+            for chunk in manifest:
+                files = [name for name in os.listdir(os.path.join(temp_dir, chunk))
+                         if name.endswith(".parquet")]
+                assert len(files) == 1
+
+    finally:
+        shutil.rmtree(temp_dir)
+
+
 def test_write_parquet_images(orca_context_fixture):
     sc = orca_context_fixture
     temp_dir = tempfile.mkdtemp()
@@ -161,11 +234,26 @@ def test_write_voc(orca_context_fixture, use_api=False):
                       output_path="file://" + output_path)
 
         data, schema = ParquetDataset._read_as_dict_rdd("file://" + output_path)
-        data = data.collect()[0]
-        image_path = data["image_id"]
+        data = data.collect()
+        image_path = data[0]["image_id"]
         with open(image_path, "rb") as f:
             image_bytes = f.read()
-        assert image_bytes == data['image']
+        assert image_bytes == data[0]['image']
+
+        # the images have different numbers of boxes
+        labels = {d["image_id"]: d["label"] for d in data}
+        assert len(set(label.shape for label in labels.values())) > 1
+        for batch_size in [1, 4]:
+            loader = read_parquet("dataloader", "file://" + output_path,
+                                  batch_size=batch_size)
+            read_labels = {}
+            for batch in loader:
+                assert len(batch["label"]) == len(batch["image_id"])
+                for image_id, label in zip(batch["image_id"], batch["label"]):
+                    read_labels[image_id] = np.asarray(label)
+            assert read_labels.keys() == labels.keys()
+            for image_id, label in labels.items():
+                np.testing.assert_array_equal(read_labels[image_id], label)
 
     finally:
         shutil.rmtree(temp_dir)
@@ -239,6 +327,34 @@ def test_write_from_directory(orca_context_fixture, use_api=False):
         shutil.rmtree(temp_dir)
 
 
+def test_write_from_directory_parallel(orca_context_fixture):
+    sc = orca_context_fixture
+    temp_dir = tempfile.mkdtemp()
+    try:
+        label_map = {"cats": 0, "dogs": 1}
+        write_from_directory(os.path.join(resource_path, "cat_dog"),
+                             label_map, "file://" + temp_dir, block_size=3, parallel=True)
+        data, _ = ParquetDataset._read_as_dict_rdd("file://" + temp_dir)
+        data = data.collect()
+        num_images = sum(len(os.listdir(os.path.join(resource_path, "cat_dog", label)))
+                         for label in label_map)
+        assert len(data) == num_images
+        for record in data[:2]:
+            with open(record["image_id"], "rb") as f:
+                assert f.read() == record["image"]
+            assert record["label"] == label_map[record["label_str"]]
+
+        with open(os.path.join(temp_dir, "_orca_manifest")) as f:
+            manifest = json.load(f)
+        assert sum(manifest.values()) == num_images
+        assert max(manifest.values()) - min(manifest.values()) <= 1
+        assert sorted(name for name in os.listdir(temp_dir) if name.startswith("chunk=")) \
+            == sorted(manifest.keys())
+
+    finally:
+        shutil.rmtree(temp_dir)
+
+
 def test_write_parquet_api(orca_context_fixture):
     test_write_mnist(orca_context_fixture, True)
     test_write_voc(orca_context_fixture, True)
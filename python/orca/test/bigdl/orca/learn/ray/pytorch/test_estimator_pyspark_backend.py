@@ -394,6 +394,44 @@ class TestPyTorchEstimator(TestCase):
         state = estimator.get_state_dict()
         assert state['models'][0]['fc1.weight'].item() == 0.25
 
+    def test_persistent_workers(self):
+        sc = init_nncontext()
+        rdd = sc.range(0, 100).repartition(2)
+        # the same data and model as test_data_parallel_sgd_correctness, trained epoch by epoch
+        rdd = rdd.mapPartitionsWithIndex(lambda idx, iter: [([float(idx)], [0.0])
+                                                            for _ in iter][:2])
+        shards = SparkXShards(rdd.map(lambda x: {"x": np.array([x[0]], dtype=np.float32),
+                                                 "y": np.array([x[1]], dtype=np.float32)}))
+
+        def get_optimizer(model, config):
+            return torch.optim.SGD(model.parameters(), lr=0.5)
+
+        estimator = Estimator.from_torch(model=lambda config: LinearModel(),
+                                         optimizer=get_optimizer,
+                                         loss=torch.nn.MSELoss(),
+                                         metrics=Accuracy(),
+                                         config={},
+                                         workers_per_node=2,
+                                         backend="spark",
+                                         sync_stats=False,
+                                         model_dir=self.model_dir,
+                                         persistent_workers=True)
+        for _ in range(2):
+            estimator.fit(shards, batch_size=4, epochs=1)
+            estimator.evaluate(shards, batch_size=4)
+
+        state = estimator.get_state_dict()
+        assert state['models'][0]['fc1.weight'].item() == 0.25
+        assert not os.path.exists(os.path.join(self.model_dir, "state.pkl"))
+        assert len(estimator._cached_rdds) == 1
+
+        # only the most recently used repartitioned data are cached
+        for _ in range(2):
+            estimator.evaluate(SparkXShards(shards.rdd.map(lambda x: x)), batch_size=4)
+        assert len(estimator._cached_rdds) == 2
+        estimator.shutdown()
+        assert len(estimator._cached_rdds) == 0
+
     def test_checkpoint_callback(self):
         from bigdl.orca.learn.pytorch.callbacks.model_checkpoint import ModelCheckpoint
         sc = OrcaContext.get_spark_context()
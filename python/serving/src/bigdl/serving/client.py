@@ -19,9 +19,21 @@ import time
 from bigdl.serving.schema import *
 import httpx
 import json
+import threading
 import uuid
 
 RESULT_PREFIX = "cluster-serving_"
+# an input entry with a client field asks the server to push its result to the stream
+# RESULT_PREFIX + name + RESULT_STREAM_INFIX + client id instead of a hash map
+RESULT_CLIENT_FIELD = "client"
+RESULT_STREAM_INFIX = ":stream:"
+
+
+def _stream_id_key(entry_id):
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode("utf-8")
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
 
 
 def http_json_to_ndarray(json_str):
@@ -79,10 +91,147 @@ class API:
             print("redis group exist, will not create new one")
 
 
+class AdmissionController:
+    """
+    Client side admission control of the requests enqueued to Redis.
+
+    The memory usage of Redis is sampled with INFO at most every sample_interval seconds
+    or every sample_every admitted requests, instead of before every request. While the
+    memory is above maxmemory * threshold, the requests wait (re-sampling every
+    poll_interval seconds) until there is room or max_wait expires, and are then
+    rejected. An optional token bucket limits the rate of the admitted requests.
+    """
+    def __init__(self, db, threshold=0.6, sample_interval=1.0, sample_every=1000,
+                 max_wait=1.0, poll_interval=0.05, rate=None, burst=None):
+        """
+        :param db: the Redis client.
+        :param threshold: the ratio of maxmemory above which requests are not admitted.
+        :param sample_interval: the maximum age in seconds of the sampled memory usage.
+        :param sample_every: the maximum number of requests admitted between two samples.
+        :param max_wait: the maximum time in seconds a request waits for admission.
+        :param poll_interval: the interval in seconds of the samples while Redis is full.
+        :param rate: (optional) the maximum number of requests admitted per second.
+        :param burst: the capacity of the token bucket, default to rate.
+        """
+        self.db = db
+        self._threshold = threshold
+        self.sample_interval = sample_interval
+        self.sample_every = sample_every
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.rate = rate
+        self.burst = burst if burst else rate
+        self._tokens = self.burst
+        self._last_refill = time.time()
+        self._last_sample = None
+        self._since_sample = 0
+        self._full = False
+        self._lock = threading.Lock()
+        self.admitted_count = 0
+        self.queued_count = 0
+        self.rejected_count = 0
+
+    @property
+    def threshold(self):
+        return self._threshold
+
+    @threshold.setter
+    def threshold(self, threshold):
+        self._threshold = threshold
+        # re-sample with the new threshold on the next acquire
+        self._last_sample = None
+
+    def sample(self):
+        """
+        Sample the memory usage of Redis.
+        :return: True if Redis is full.
+        """
+        inf = self.db.info("memory")
+        self._full = inf['maxmemory'] != 0 and \
+            inf['used_memory'] >= inf['maxmemory'] * self.threshold
+        self._last_sample = time.time()
+        self._since_sample = 0
+        return self._full
+
+    def mark_full(self):
+        """
+        Mark Redis as full until the next sample, e.g. when a write is refused.
+        """
+        with self._lock:
+            self._full = True
+            self._last_sample = time.time()
+
+    def acquire(self, n=1, max_wait=None):
+        """
+        Wait until n requests are admitted.
+        :param n: the number of requests.
+        :param max_wait: the maximum time in seconds to wait, default to self.max_wait.
+        :return: True if the requests are admitted, False if they are rejected.
+        """
+        deadline = time.time() + (self.max_wait if max_wait is None else max_wait)
+        queued = False
+        while True:
+            with self._lock:
+                now = time.time()
+                if self._last_sample is None or self._since_sample >= self.sample_every \
+                        or now - self._last_sample >= \
+                        (self.poll_interval if self._full else self.sample_interval):
+                    self.sample()
+                wait = self._wait_time(n, now)
+                if wait == 0:
+                    if self.rate:
+                        self._tokens -= n
+                    self._since_sample += n
+                    self.admitted_count += n
+                    return True
+                if now + wait > deadline:
+                    self.rejected_count += n
+                    return False
+                if not queued:
+                    queued = True
+                    self.queued_count += n
+            # the other threads are not blocked while this one waits
+            time.sleep(wait)
+
+    def _wait_time(self, n, now):
+        if self._full:
+            return self.poll_interval
+        if not self.rate:
+            return 0
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+        # a request larger than the bucket is admitted once the bucket is full
+        needed = min(n, self.burst)
+        return 0 if self._tokens >= needed else (needed - self._tokens) / self.rate
+
+    def metrics(self):
+        """
+        :return: a dict of the admitted, queued (admitted or rejected after waiting) and
+        rejected request counts.
+        """
+        return {"admitted": self.admitted_count,
+                "queued": self.queued_count,
+                "rejected": self.rejected_count}
+
+
 class InputQueue(API):
-    def __init__(self, frontend_url=None, **kwargs):
+    def __init__(self, frontend_url=None, tensor_version=1, push_results=False,
+                 admission_config=None, **kwargs):
+        """
+        :param tensor_version: the format of ndarray inputs, 1 (default) is supported by all
+        the servers, 2 sends the raw buffer with its dtype and shape, which is much cheaper
+        to encode but requires a server which supports it. It only applies to the requests,
+        the results are returned in the same format for both versions.
+        :param push_results: if True, the server pushes the results of predict and
+        predict_batch to a Redis stream of this client, which are consumed with blocking
+        XREAD in batches instead of polling the result of each request.
+        :param admission_config: (optional) a dict of the arguments of AdmissionController,
+        e.g. {"threshold": 0.6, "max_wait": 1.0, "rate": 10000}.
+        """
         super().__init__(**kwargs)
         self.frontend_url = frontend_url
+        self.tensor_version = tensor_version
+        self.client_id = uuid.uuid4().hex if push_results else None
         if self.frontend_url:
             # frontend_url is provided, using frontend
             try:
@@ -99,15 +248,24 @@ class InputQueue(API):
             self.output_queue = OutputQueue(**kwargs)
 
         # TODO: these params can be read from config in future
-        self.input_threshold = 0.6
         self.interval_if_error = 1
+        admission_config = dict(admission_config) if admission_config else {}
+        admission_config.setdefault("threshold", 0.6)
+        self.admission = AdmissionController(self.db, **admission_config)
 
-    def predict(self, request_data, timeout=5):
+    @property
+    def input_threshold(self):
         """
-        :param request_data:
-        :param time_sleep:
-        :return:
+        The ratio of the maxmemory of Redis above which the requests are not admitted.
         """
+        return self.admission.threshold
+
+    @input_threshold.setter
+    def input_threshold(self, input_threshold):
+        self.admission.threshold = input_threshold
+
+    @staticmethod
+    def to_input_dict(request_data):
         def json_to_ndarray_dict(json_str):
             ndarray_dict = {}
             data_dict = json.loads(json_str)['instances'][0]
@@ -115,21 +273,33 @@ class InputQueue(API):
                 ndarray_dict[key] = np.array(data_dict[key])
             return ndarray_dict
 
+        try:
+            json.loads(request_data)
+            return json_to_ndarray_dict(request_data)
+        except Exception as e:
+            if isinstance(request_data, dict):
+                return request_data
+            else:
+                return {'t': request_data}
+
+    def predict(self, request_data, timeout=5):
+        """
+        :param request_data:
+        :param time_sleep:
+        :return:
+        """
         if self.frontend_url:
             response = self.cli.post(self.frontend_url + "/predict", data=request_data)
             predictions = json.loads(response.text)['predictions']
             processed = predictions[0].lstrip("{value=").rstrip("}")
         else:
-            try:
-                json.loads(request_data)
-                input_dict = json_to_ndarray_dict(request_data)
-            except Exception as e:
-                if isinstance(request_data, dict):
-                    input_dict = request_data
-                else:
-                    input_dict = {'t': request_data}
-
-            uri = str(uuid.uuid4())
+            input_dict = self.to_input_dict(request_data)
+            uri = self._new_uri()
+            if self.client_id:
+                if not self.enqueue_batch([(uri, input_dict)], push_results=True):
+                    return "[]"
+                return self.output_queue.wait_pushed_results(
+                    [uri], self.client_id, timeout).get(uri, "[]")
             self.enqueue(uri, **input_dict)
             processed = "[]"
             time_sleep = 0.001
@@ -141,6 +311,85 @@ class InputQueue(API):
                 time_sleep += 0.001
         return processed
 
+    def predict_batch(self, request_data_list, timeout=5):
+        """
+        Predict a batch of requests. All the requests are enqueued in one Redis pipeline,
+        and the results are collected with one pipelined query per round instead of
+        polling each request. If keyspace notifications of hash commands are enabled on
+        the Redis server (e.g. notify-keyspace-events "Kh"), the client blocks on them
+        instead of sleeping between the rounds.
+        :param request_data_list: a list of requests, each of which could be any input
+        supported by predict.
+        :param timeout: the timeout in seconds of the whole batch.
+        :return: a list of results in the order of the requests, "[]" for a request
+        which is not finished in time.
+        """
+        if self.frontend_url:
+            return [self.predict(request_data, timeout) for request_data in request_data_list]
+        uris = [self._new_uri() for _ in request_data_list]
+        if self.client_id:
+            if not self.enqueue_batch(
+                    [(uri, self.to_input_dict(request_data))
+                     for uri, request_data in zip(uris, request_data_list)],
+                    push_results=True):
+                return ["[]"] * len(uris)
+            results = self.output_queue.wait_pushed_results(uris, self.client_id, timeout)
+            return [results.get(uri, "[]") for uri in uris]
+        # subscribed before the requests are enqueued not to miss their notifications
+        pubsub = self.output_queue.subscribe_results()
+        if not self.enqueue_batch(
+                [(uri, self.to_input_dict(request_data))
+                 for uri, request_data in zip(uris, request_data_list)]):
+            return ["[]"] * len(uris)
+        results = self.output_queue.wait_and_delete_batch(uris, timeout, pubsub)
+        return [results.get(uri, "[]") for uri in uris]
+
+    def _new_uri(self):
+        return str(uuid.uuid4())
+
+    def close(self):
+        """
+        Delete the result stream of this client if push_results is enabled, and close the
+        subscription of the keyspace notifications of the calling thread.
+        """
+        if self.frontend_url:
+            return
+        if self.client_id:
+            self.db.delete(self.output_queue.result_stream_name(self.client_id))
+        self.output_queue.unsubscribe_results()
+
+    def predict_iter(self, request_data_iter, batch_size=128, timeout=5):
+        """
+        Predict the requests of an iterator in batches with predict_batch.
+        :param request_data_iter: an iterable of requests.
+        :param batch_size: the number of requests sent in one batch.
+        :param timeout: the timeout in seconds of each batch.
+        :return: a generator of results in the order of the requests.
+        """
+        batch = []
+        for request_data in request_data_iter:
+            batch.append(request_data)
+            if len(batch) == batch_size:
+                yield from self.predict_batch(batch, timeout)
+                batch = []
+        if batch:
+            yield from self.predict_batch(batch, timeout)
+
+    def enqueue_batch(self, requests, push_results=False):
+        """
+        Enqueue a batch of requests in one Redis pipeline.
+        :param requests: a list of (uri, input dict) tuples.
+        :param push_results: whether to ask the server to push the results to the result
+        stream of this client instead of the hash maps, only effective if the client is
+        created with push_results=True.
+        :return: True if the requests are enqueued.
+        """
+        data_list = [{"uri": uri, "data": self.data_to_b64(**data)} for uri, data in requests]
+        if push_results and self.client_id:
+            for data in data_list:
+                data[RESULT_CLIENT_FIELD] = self.client_id
+        return self.__enqueue_data_list(data_list)
+
     def enqueue(self, uri, **data):
         b64str = self.data_to_b64(**data)
         d = {"uri": uri, "data": b64str}
@@ -151,7 +400,7 @@ class InputQueue(API):
         field_list = []
         data_list = []
         for key, value in data.items():
-            field, data = get_field_and_data(key, value)
+            field, data = get_field_and_data(key, value, self.tensor_version)
             field_list.append(field)
             data_list.append(data)
 
@@ -208,22 +457,35 @@ class InputQueue(API):
         self.__enqueue_data(d)
 
     def __enqueue_data(self, data):
-        inf = self.db.info()
-        try:
-            if inf['used_memory'] >= inf['maxmemory'] * self.input_threshold\
-                    and inf['maxmemory'] != 0:
-                raise redis.exceptions.ConnectionError
-            self.db.xadd(self.name, data)
+        if self.__enqueue_data_list([data]):
             print("Write to Redis successful")
-        except redis.exceptions.ConnectionError:
-            print("Redis queue is full, please wait for inference "
-                  "or delete the unprocessed records.")
+
+    def __enqueue_data_list(self, data_list):
+        try:
+            if not self.admission.acquire(len(data_list)):
+                print("Redis queue is full, please wait for inference "
+                      "or delete the unprocessed records.")
+                return False
+            pipe = self.db.pipeline(transaction=False)
+            for data in data_list:
+                pipe.xadd(self.name, data)
+            pipe.execute()
+            return True
+        except redis.exceptions.ConnectionError as e:
+            print(e, "Please check the connection to Redis.")
             time.sleep(self.interval_if_error)
 
         except redis.exceptions.ResponseError as e:
             print(e, "Please check if Redis version > 5, "
                      "if yes, memory may be full, try dequeue or delete.")
-            time.sleep(self.interval_if_error)
+            self.admission.mark_full()
+        return False
+
+    def admission_metrics(self):
+        """
+        :return: a dict of the admitted, queued and rejected request counts.
+        """
+        return self.admission.metrics()
 
     @staticmethod
     def base64_encode_image(img):
@@ -232,26 +494,219 @@ class InputQueue(API):
 
 
 class OutputQueue(API):
-    def __init__(self, **kwargs):
+    def __init__(self, pushed_result_ttl=60, max_pushed_results=10000, **kwargs):
+        """
+        :param pushed_result_ttl: the time in seconds to keep a pushed result read for
+        another caller, which is dropped afterwards, e.g. if the caller has timed out.
+        :param max_pushed_results: the maximum number of pushed results kept for the other
+        callers, the oldest ones are dropped beyond it.
+        """
         super().__init__(**kwargs)
+        self.pushed_result_ttl = pushed_result_ttl
+        self.max_pushed_results = max_pushed_results
+        self._pushed_results = {}  # uri -> (read time, result), in the order of reading
+        self._stream_last_ids = {}
+        self._stream_lock = threading.Lock()
+        self._notification_flags = None
+        self._local = threading.local()
+
+    def dequeue(self, count=1000):
+        """
+        Dequeue all the results in hash maps. The keys are iterated with SCAN instead of
+        KEYS so that Redis is not blocked, and each batch of count keys is read and deleted
+        with one pipeline.
+        """
+        decoded = {}
+        prefix = RESULT_PREFIX + self.name + ':'
+        keys = []
+        for key in self.db.scan_iter(match=prefix + '*', count=count):
+            key = key.decode('utf-8')
+            # skip the result streams
+            if not key.startswith(prefix + RESULT_STREAM_INFIX[1:]):
+                keys.append(key)
+            if len(keys) >= count:
+                decoded.update(self.query_and_delete_batch([k[len(prefix):] for k in keys]))
+                keys = []
+        if keys:
+            decoded.update(self.query_and_delete_batch([k[len(prefix):] for k in keys]))
+        return decoded
 
-    def dequeue(self):
-        res_list = self.db.keys(RESULT_PREFIX + self.name + ':*')
+    def result_stream_name(self, client_id):
+        return RESULT_PREFIX + self.name + RESULT_STREAM_INFIX + client_id
+
+    def read_result_stream(self, client_id, block_ms=100, count=1000):
+        """
+        Read the results pushed to the stream of client_id with a blocking XREAD, the
+        entries are deleted once read.
+        :return: a dict of {uri: result}.
+        """
+        stream = self.result_stream_name(client_id)
+        with self._stream_lock:
+            last_id = self._stream_last_ids.get(stream, "0")
+        # several threads may read the same entries, which are merged by uri
+        res = self.db.xread({stream: last_id}, count=count, block=max(int(block_ms), 1))
         decoded = {}
-        for res in res_list:
-            res_dict = self.db.hgetall(res.decode('utf-8'))
-            res_id = res.decode('utf-8').split(":")[1]
-            res_value = res_dict[b'value'].decode('utf-8')
-            if res_value == "NaN":
-                decoded[res_id] = "NaN"
-            else:
-                decoded[res_id] = self.get_ndarray_from_b64(res_value)
-            self.db.delete(res)
+        entry_ids = []
+        for _, entries in res or []:
+            for entry_id, fields in entries:
+                entry_ids.append(entry_id)
+                s = fields[b'value'].decode('utf-8')
+                decoded[fields[b'uri'].decode('utf-8')] = \
+                    s if s == "NaN" else self.get_ndarray_from_b64(s)
+        if entry_ids:
+            with self._stream_lock:
+                if _stream_id_key(entry_ids[-1]) > \
+                        _stream_id_key(self._stream_last_ids.get(stream, "0")):
+                    self._stream_last_ids[stream] = entry_ids[-1]
+            self.db.xdel(stream, *entry_ids)
         return decoded
 
+    def wait_pushed_results(self, uris, client_id, timeout=5):
+        """
+        Wait for the results of uris pushed to the stream of client_id. The results of
+        other uris read meanwhile are kept for their callers. Hash map results (e.g. from
+        a server without result streams) are queried when the stream is idle.
+        :return: a dict of {uri: result} of the finished uris.
+        """
+        deadline = time.time() + timeout
+        pending = set(uris)
+        results = {}
+        while True:
+            with self._stream_lock:
+                for uri in list(pending):
+                    if uri in self._pushed_results:
+                        results[uri] = self._pushed_results.pop(uri)[1]
+                        pending.discard(uri)
+            remaining = deadline - time.time()
+            if not pending or remaining <= 0:
+                break
+            # the blocking read is not locked, so the waiting threads read concurrently
+            pushed = self.read_result_stream(client_id, block_ms=min(remaining, 0.1) * 1000)
+            if pushed:
+                now = time.time()
+                with self._stream_lock:
+                    for uri, result in pushed.items():
+                        if uri in pending:
+                            results[uri] = result
+                            pending.discard(uri)
+                        else:
+                            self._pushed_results.pop(uri, None)
+                            self._pushed_results[uri] = (now, result)
+                    self._prune_pushed_results(now)
+            else:
+                finished = self.query_and_delete_batch(list(pending))
+                results.update(finished)
+                pending.difference_update(finished)
+        return results
+
+    def _prune_pushed_results(self, now):
+        # drop the results no caller is waiting for anymore, the oldest are the first
+        expired = now - self.pushed_result_ttl
+        while self._pushed_results:
+            uri = next(iter(self._pushed_results))
+            if len(self._pushed_results) <= self.max_pushed_results and \
+                    self._pushed_results[uri][0] >= expired:
+                break
+            del self._pushed_results[uri]
+
     def query_and_delete(self, uri):
         return self.query(uri, True)
 
+    def query_and_delete_batch(self, uris):
+        """
+        Query and delete the results of uris with one Redis pipeline.
+        :param uris: a list of uri.
+        :return: a dict of {uri: result} of the finished uris.
+        """
+        pipe = self.db.pipeline(transaction=False)
+        for uri in uris:
+            pipe.hgetall(RESULT_PREFIX + self.name + ':' + uri)
+        res_dicts = pipe.execute()
+        decoded = {}
+        for uri, res_dict in zip(uris, res_dicts):
+            if not res_dict:
+                continue
+            pipe.delete(RESULT_PREFIX + self.name + ':' + uri)
+            s = res_dict[b'value'].decode('utf-8')
+            decoded[uri] = s if s == "NaN" else self.get_ndarray_from_b64(s)
+        if decoded:
+            pipe.execute()
+        return decoded
+
+    def subscribe_results(self):
+        """
+        Subscribe to the keyspace notifications of the result keys if they are enabled
+        on the Redis server. The server setting is read once, and the PubSub of the calling
+        thread is kept for its next calls until unsubscribe_results.
+        :return: a redis PubSub, or None if the notifications are not available.
+        """
+        if self._notification_flags is None:
+            try:
+                flags = self.db.config_get("notify-keyspace-events")
+                flags = list(flags.values())[0] if flags else ""
+                flags = flags.decode("utf-8") if isinstance(flags, bytes) else flags
+            except Exception:
+                flags = ""
+            self._notification_flags = flags
+        flags = self._notification_flags
+        if "K" not in flags or ("h" not in flags and "A" not in flags):
+            return None
+        pubsub = getattr(self._local, "pubsub", None)
+        if pubsub is None:
+            pubsub = self.db.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe("__keyspace@*__:" + RESULT_PREFIX + self.name + ":*")
+            self._local.pubsub = pubsub
+        return pubsub
+
+    def unsubscribe_results(self):
+        """
+        Close the PubSub of the calling thread created by subscribe_results.
+        """
+        pubsub = getattr(self._local, "pubsub", None)
+        self._local.pubsub = None
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+    def wait_and_delete_batch(self, uris, timeout=5, pubsub=None):
+        """
+        Wait for the results of uris, and delete them once they are read.
+        :param uris: a list of uri.
+        :param timeout: the timeout in seconds.
+        :param pubsub: (optional) a PubSub returned by subscribe_results before the
+        requests are enqueued, to block on the notifications instead of sleeping.
+        :return: a dict of {uri: result} of the finished uris.
+        """
+        deadline = time.time() + timeout
+        pending = list(uris)
+        results = self.query_and_delete_batch(pending)
+        pending = [uri for uri in pending if uri not in results]
+        time_sleep = 0.001
+        while pending and time.time() < deadline:
+            if pubsub is not None:
+                # query again on a notification, or every 0.1s in case it is missed
+                try:
+                    message = pubsub.get_message(
+                        timeout=min(max(deadline - time.time(), 0), 0.1))
+                    # drain the notifications already arrived, including the ones of
+                    # the other requests since the last call
+                    while message is not None:
+                        message = pubsub.get_message()
+                except redis.exceptions.ConnectionError:
+                    # e.g. disconnected by the server, fall back to sleeping
+                    if getattr(self._local, "pubsub", None) is pubsub:
+                        self.unsubscribe_results()
+                    pubsub = None
+            else:
+                time.sleep(min(time_sleep, max(deadline - time.time(), 0)))
+                time_sleep = min(time_sleep * 2, 0.1)
+            finished = self.query_and_delete_batch(pending)
+            results.update(finished)
+            pending = [uri for uri in pending if uri not in finished]
+        return results
+
     def query(self, uri, delete=False):
         res_dict = self.db.hgetall(RESULT_PREFIX + self.name + ':' + uri)
 
@@ -280,8 +735,4 @@ class OutputQueue(API):
             return l
 
     def get_ndarray_from_record_batch(self, record_batch):
-        data = record_batch[0].to_numpy()
-        shape_list = record_batch[1].to_pylist()
-        shape = [i for i in shape_list if i]
-        ndarray = data.reshape(shape)
-        return ndarray
+        return get_ndarray_from_record_batch(record_batch)
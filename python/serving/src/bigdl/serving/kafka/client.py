@@ -16,37 +16,87 @@
 from kafka import KafkaProducer, KafkaConsumer
 from kafka.errors import kafka_errors
 import json
+import threading
 from bigdl.serving.schema import *
 
 
 RESULT_PREFIX = "cluster-serving_"
 
 class InputQueue:
-    def __init__(self, frontend_url=None, **kwargs):
+    def __init__(self, frontend_url=None, async_enqueue=False, raw_value=False,
+                 tensor_version=1, **kwargs):
+        """
+        :param async_enqueue: if True, enqueue returns without waiting for the broker, so
+        that the producer could linger and batch the messages (linger_ms defaults to 5).
+        The delivery is reported by the counters, or the callbacks of enqueue_async, call
+        flush to wait for all the pending messages.
+        :param raw_value: if True, send the raw Arrow IPC stream bytes as the message value
+        instead of a json of the base64 encoded stream.
+        :param tensor_version: the format of ndarray inputs, see bigdl.serving.schema.
+        :param kwargs: passed to KafkaProducer, except value_serializer since the values are
+        serialized by enqueue.
+        """
+        if "value_serializer" in kwargs:
+            raise ValueError("value_serializer is not supported, the values are serialized "
+                             "by enqueue, see raw_value")
         host = kwargs.get("host") if kwargs.get("host") else "localhost"
         port = kwargs.get("port") if kwargs.get("port") else "9092"
         self.topic_name = kwargs.get("topic_name") if kwargs.get("topic_name") else "serving_stream"
         self.interval_if_error = 1
+        self.async_enqueue = async_enqueue
+        self.raw_value = raw_value
+        self.tensor_version = tensor_version
+        self.delivered_count = 0
+        self.failed_count = 0
+        # the counters are updated from the I/O thread of the producer
+        self._count_lock = threading.Lock()
         for key in ["host", "port", "topic_name"]:
             if key in kwargs:
                 kwargs.pop(key)
-        # create a kafka producer  
+        if async_enqueue:
+            kwargs.setdefault("linger_ms", 5)
+        # create a kafka producer, values are serialized in enqueue
         self.db = KafkaProducer(bootstrap_servers=host+":"+port,
                                 key_serializer=lambda k: json.dumps(k).encode('utf-8'),
-                                value_serializer=lambda v: json.dumps(v).encode('utf-8'),
                                 **kwargs)
-        
+
     def enqueue(self, uri, **data):
-        b64str = self.data_to_b64(**data)
-        d = {"key":uri, "value":{"uri":uri, "data":b64str}}        
-        self.__enqueue_data(d)
-    
+        """
+        :param uri: the key of the request.
+        :param data: the inputs.
+        :return: the future of the send if async_enqueue is True.
+        """
+        if self.async_enqueue:
+            return self.enqueue_async(uri, data)
+        self.__enqueue_data(self.__to_message(uri, data))
+
+    def enqueue_async(self, uri, data, callback=None, errback=None):
+        """
+        Enqueue without waiting for the broker, whatever async_enqueue is.
+        :param uri: the key of the request.
+        :param data: a dict of the inputs.
+        :param callback: (optional) called with the RecordMetadata once delivered.
+        :param errback: (optional) called with the exception if the delivery fails.
+        :return: the future of the send.
+        """
+        return self.__enqueue_data_async(self.__to_message(uri, data), callback, errback)
+
+    def __to_message(self, uri, data):
+        if self.raw_value:
+            value = self.data_to_bytes(**data)
+        else:
+            value = json.dumps({"uri": uri, "data": self.data_to_b64(**data)}).encode('utf-8')
+        return {"key": uri, "value": value}
+
     def data_to_b64(self, **data):
+        return self.base64_encode_image(self.data_to_bytes(**data))
+
+    def data_to_bytes(self, **data):
         sink = pa.BufferOutputStream()
         field_list = []
         data_list = []
         for key, value in data.items():
-            field, data = get_field_and_data(key, value)
+            field, data = get_field_and_data(key, value, self.tensor_version)
             field_list.append(field)
             data_list.append(data)
 
@@ -58,10 +108,34 @@ class InputQueue:
         writer.write_batch(batch)
         writer.close()
         buf = sink.getvalue()
-        b = buf.to_pybytes()
-        b64str = self.base64_encode_image(b)
-        return b64str
-    
+        return buf.to_pybytes()
+
+    def __enqueue_data_async(self, data, callback=None, errback=None):
+        def on_success(metadata):
+            with self._count_lock:
+                self.delivered_count += 1
+            if callback:
+                callback(metadata)
+
+        def on_error(e):
+            with self._count_lock:
+                self.failed_count += 1
+            if errback:
+                errback(e)
+            else:
+                print("Write to Kafka failed:", e)
+
+        future = self.db.send(self.topic_name, **data)
+        future.add_callback(on_success)
+        future.add_errback(on_error)
+        return future
+
+    def flush(self, timeout=None):
+        """
+        Block until all the pending messages are delivered or failed.
+        """
+        self.db.flush(timeout=timeout)
+
     def __enqueue_data(self, data):
         # send a message {key:value}
         future = self.db.send(self.topic_name, **data)
@@ -122,11 +196,7 @@ class OutputQueue:
             return l
 
     def get_ndarray_from_record_batch(self, record_batch):
-        data = record_batch[0].to_numpy()
-        shape_list = record_batch[1].to_pylist()
-        shape = [i for i in shape_list if i]
-        ndarray = data.reshape(shape)
-        return ndarray
+        return get_ndarray_from_record_batch(record_batch)
     
     def close(self):
         self.db.close()
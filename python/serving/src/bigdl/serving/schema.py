@@ -18,9 +18,93 @@ import pyarrow as pa
 import numpy as np
 import cv2
 import base64
+import json
 
+# version 1: a tensor is a struct of indiceData, indiceShape, data and shape lists,
+#            and the data is cast to float32, which is supported by all the servers.
+# version 2: a tensor is a binary value of its raw buffer, with its dtype and shape
+#            in the field metadata. It is only used for the requests, the servers always
+#            write the results as a data column and a shape column.
+TENSOR_VERSIONS = (1, 2)
+# the dtypes of the version 2 tensors supported by the servers, which are little-endian
+TENSOR_V2_DTYPES = ("<f4", "<f8", "<i4", "<i8", "|u1")
 
-def get_field_and_data(key, value):
+
+def _one_row_list(values, row, value_type):
+    # a list array of 4 rows, only the row-th row is valid and holds values
+    offsets = np.zeros(5, dtype=np.int32)
+    offsets[row + 1:] = len(values)
+    mask = pa.array([i != row for i in range(4)])
+    return pa.ListArray.from_arrays(pa.array(offsets), pa.array(values, type=value_type),
+                                    mask=mask)
+
+
+def get_tensor_field_and_data(key, value, version=1):
+    """
+    :param key: the field name.
+    :param value: ndarray.
+    :param version: the tensor format version, one of TENSOR_VERSIONS. The dtype of a version
+    2 tensor should be one of TENSOR_V2_DTYPES in any byte order, it is sent little-endian.
+    """
+    assert version in TENSOR_VERSIONS, \
+        f"tensor version should be one of {TENSOR_VERSIONS}, but got {version}"
+    if version == 2:
+        dtype = value.dtype.newbyteorder("<")
+        if dtype.str not in TENSOR_V2_DTYPES:
+            raise ValueError(f"the dtype of {key} should be one of float32, float64, int32, "
+                             f"int64 and uint8 for tensor version 2, but got {value.dtype}")
+        value = np.ascontiguousarray(value, dtype=dtype)
+        field = pa.field(key, pa.binary(),
+                         metadata={"dtype": value.dtype.str,
+                                   "shape": json.dumps(list(value.shape))})
+        offsets = pa.py_buffer(np.array([0, value.nbytes], dtype=np.int32))
+        buffer = pa.py_buffer(value.reshape(-1).view(np.uint8))
+        data = pa.Array.from_buffers(pa.binary(), 1, [None, offsets, buffer])
+        return field, data
+
+    indices_field = pa.field("indiceData", pa.list_(pa.int32()))
+    indices_shape_field = pa.field("indiceShape", pa.list_(pa.int32()))
+    data_field = pa.field("data", pa.list_(pa.float32()))
+    shape_field = pa.field("shape", pa.list_(pa.int32()))
+    tensor_type = pa.struct(
+        [indices_field, indices_shape_field, data_field, shape_field])
+    field = pa.field(key, tensor_type)
+
+    shape = np.array(value.shape, dtype=np.int32)
+    d = value.astype("float32").reshape(-1)
+    # the same as pa.array([{'indiceData': []}, {'indiceShape': []}, {'data': d},
+    # {'shape': shape}], type=tensor_type), without converting d to python objects
+    empty = np.array([], dtype=np.int32)
+    data = pa.StructArray.from_arrays([_one_row_list(empty, 0, pa.int32()),
+                                       _one_row_list(empty, 1, pa.int32()),
+                                       _one_row_list(d, 2, pa.float32()),
+                                       _one_row_list(shape, 3, pa.int32())],
+                                      fields=list(tensor_type))
+    return field, data
+
+
+def get_ndarray_from_record_batch(record_batch):
+    """
+    Decode a tensor from a record batch, which is either a version 2 tensor field, e.g. of a
+    request, or a data column and a shape column, e.g. of a result written by the server.
+    """
+    field = record_batch.schema.field(0)
+    metadata = field.metadata or {}
+    if b"shape" in metadata:
+        shape = json.loads(metadata[b"shape"])
+        dtype = np.dtype(metadata[b"dtype"].decode("utf-8"))
+        column = record_batch.column(0)
+        _, offsets, data = column.buffers()
+        start = np.frombuffer(offsets, dtype=np.int32, count=1, offset=column.offset * 4)[0]
+        return np.frombuffer(data, dtype=dtype, count=int(np.prod(shape)),
+                             offset=int(start)).reshape(shape)
+    data = record_batch[0].to_numpy()
+    shape = record_batch[1].drop_null().to_numpy()
+    shape = [i for i in shape if i]
+    return data.reshape(shape)
+
+
+def get_field_and_data(key, value, tensor_version=1):
     if isinstance(value, list):
         assert len(value) > 0, "empty list is not supported"
         sample = value[0]
@@ -80,23 +164,7 @@ def get_field_and_data(key, value):
 
     elif isinstance(value, np.ndarray):
         # ndarray value will be considered as tensor
-        indices_field = pa.field("indiceData", pa.list_(pa.int32()))
-        indices_shape_field = pa.field("indiceShape", pa.list_(pa.int32()))
-        data_field = pa.field("data", pa.list_(pa.float32()))
-        shape_field = pa.field("shape", pa.list_(pa.int32()))
-        tensor_type = pa.struct(
-            [indices_field, indices_shape_field, data_field, shape_field])
-        field = pa.field(key, tensor_type)
-
-        shape = np.array(value.shape)
-        d = value.astype("float32").flatten()
-        # data = pa.array([{'data': d}, {'shape': shape}, {}],
-        #                 type=tensor_type)
-        data = pa.array([{'indiceData': []},
-                         {'indiceShape': []},
-                         {'data': d},
-                         {'shape': shape}], type=tensor_type)
-        return field, data
+        return get_tensor_field_and_data(key, value, tensor_version)
 
     else:
         raise TypeError("Your request does not match any schema, "
@@ -14,7 +14,12 @@
 # limitations under the License.
 #
 
-from bigdl.serving.client import InputQueue, OutputQueue
+import threading
+import time
+
+import numpy as np
+import pytest
+from bigdl.serving.client import InputQueue, OutputQueue, AdmissionController
 
 
 class TestClient:
@@ -50,3 +55,168 @@ class TestClient:
         assert output_api.name == "my-test"
         assert output_api.host == "1.1.1.1"
         assert output_api.port == "1111"
+
+    def test_input_queue_predict_iter(self):
+        class MockInputQueue(InputQueue):
+            batches = []
+
+            def predict_batch(self, request_data_list, timeout=5):
+                self.batches.append(len(request_data_list))
+                return [request_data * 2 for request_data in request_data_list]
+
+        input_api = MockInputQueue(host="1.1.1.1", port="1111", name="my-test")
+        results = list(input_api.predict_iter(range(10), batch_size=4))
+        assert results == [i * 2 for i in range(10)]
+        assert input_api.batches == [4, 4, 2]
+
+    def test_input_dict(self):
+        assert list(InputQueue.to_input_dict('{"instances": [{"a": [1, 2]}]}').keys()) == ["a"]
+        assert InputQueue.to_input_dict({"b": 1}) == {"b": 1}
+        assert list(InputQueue.to_input_dict(np.ones(2)).keys()) == ["t"]
+
+    def test_input_queue_push_results(self):
+        input_api = InputQueue(host="1.1.1.1", port="1111", name="my-test", push_results=True)
+        client_id = input_api.client_id
+        assert input_api.output_queue.result_stream_name(client_id) == \
+            "cluster-serving_my-test:stream:" + client_id
+
+        # the client id is sent in its own field, and the uris are kept as they are
+        fakeredis = pytest.importorskip("fakeredis")
+        input_api.db = input_api.admission.db = fakeredis.FakeStrictRedis()
+        input_api.db.info = lambda section=None: {"used_memory": 0, "maxmemory": 0}
+        assert input_api.enqueue_batch([("a|b", {"t": np.ones(2)})], push_results=True)
+        assert input_api.enqueue_batch([("c|d", {"t": np.ones(2)})])
+        (_, pushed), (_, stored) = input_api.db.xrange("my-test")
+        assert pushed[b"uri"] == b"a|b"
+        assert pushed[b"client"] == client_id.encode("utf-8")
+        assert stored[b"uri"] == b"c|d"
+        assert b"client" not in stored
+
+    def test_admission_controller(self):
+        class MockRedis:
+            used_memory = 0
+            info_calls = 0
+
+            def info(self, section=None):
+                self.info_calls += 1
+                return {"used_memory": self.used_memory, "maxmemory": 100}
+
+        db = MockRedis()
+        admission = AdmissionController(db, threshold=0.6, sample_every=10, max_wait=0.1,
+                                        poll_interval=0.02)
+        assert all(admission.acquire() for _ in range(25))
+        assert db.info_calls == 3
+
+        db.used_memory = 80
+        admission.mark_full()
+        assert not admission.acquire()
+        assert admission.metrics() == {"admitted": 25, "queued": 1, "rejected": 1}
+
+        db.used_memory = 10
+        assert admission.acquire(max_wait=1)
+        assert admission.metrics()["admitted"] == 26
+
+    def test_admission_controller_rate(self):
+        class MockRedis:
+            def info(self, section=None):
+                return {"used_memory": 0, "maxmemory": 0}
+
+        admission = AdmissionController(MockRedis(), max_wait=2, rate=10, burst=10)
+        assert admission.acquire(5)
+
+        # the small request is not blocked by the large one waiting for tokens
+        waiting = threading.Thread(target=admission.acquire, args=(10,))
+        waiting.start()
+        time.sleep(0.05)
+        start = time.time()
+        assert admission.acquire(1)
+        assert time.time() - start < 0.2
+        waiting.join()
+        assert admission.metrics() == {"admitted": 16, "queued": 10, "rejected": 0}
+
+    def test_input_threshold(self):
+        input_api = InputQueue(host="1.1.1.1", port="1111")
+        assert input_api.input_threshold == 0.6
+        input_api.input_threshold = 0.3
+        assert input_api.admission.threshold == 0.3
+
+    def test_enqueue_batch(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        input_api = InputQueue(host="1.1.1.1", port="1111", name="my-test")
+        input_api.db = input_api.admission.db = fakeredis.FakeStrictRedis()
+        input_api.db.info = lambda section=None: {"used_memory": 0, "maxmemory": 0}
+        requests = [(str(i), {"t": np.ones(2)}) for i in range(5)]
+        assert input_api.enqueue_batch(requests)
+        assert input_api.db.xlen("my-test") == 5
+        assert input_api.admission.metrics()["admitted"] == 5
+
+    def test_wait_and_delete_batch(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        output_api = OutputQueue(host="1.1.1.1", port="1111", name="my-test")
+        output_api.db = fakeredis.FakeStrictRedis()
+        config_calls = []
+
+        def config_get(pattern):
+            config_calls.append(pattern)
+            return {pattern: "Kh"}
+
+        output_api.db.config_get = config_get
+        pubsub = output_api.subscribe_results()
+        assert pubsub is not None
+        assert output_api.subscribe_results() is pubsub
+        assert len(config_calls) == 1
+        output_api.unsubscribe_results()
+
+        class MockPubSub:
+            # the result is written when the notification is waited for
+            def __init__(self, db, key):
+                self.db = db
+                self.key = key
+                self.calls = 0
+
+            def get_message(self, timeout=0):
+                self.calls += 1
+                if self.calls == 1:
+                    self.db.hset(self.key, "value", "NaN")
+                    return {"type": "pmessage"}
+                return None
+
+        mock_pubsub = MockPubSub(output_api.db, "cluster-serving_my-test:a")
+        assert output_api.wait_and_delete_batch(["a"], 1, mock_pubsub) == {"a": "NaN"}
+        assert not output_api.db.exists("cluster-serving_my-test:a")
+
+        # timeout
+        start = time.time()
+        assert output_api.wait_and_delete_batch(["b"], 0.3, MockPubSub(output_api.db, "x")) == {}
+        assert time.time() - start < 1
+        assert output_api.wait_and_delete_batch(["b"], 0.3) == {}
+
+    def test_wait_pushed_results(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        output_api = OutputQueue(host="1.1.1.1", port="1111", name="my-test",
+                                 pushed_result_ttl=60, max_pushed_results=2)
+        output_api.db = fakeredis.FakeStrictRedis()
+        stream = output_api.result_stream_name("cid")
+        for uri in ["a|cid", "b|cid"]:
+            output_api.db.xadd(stream, {"uri": uri, "value": "NaN"})
+
+        # the result of b is read with a and kept for its caller
+        assert output_api.wait_pushed_results(["a|cid"], "cid", timeout=1) == {"a|cid": "NaN"}
+        assert output_api.db.xlen(stream) == 0
+        assert output_api.wait_pushed_results(["b|cid"], "cid", timeout=1) == {"b|cid": "NaN"}
+
+        # timeout
+        start = time.time()
+        assert output_api.wait_pushed_results(["c|cid"], "cid", timeout=0.3) == {}
+        assert time.time() - start < 1
+
+        # the results nobody waits for are bounded
+        for uri in ["d|cid", "e|cid", "f|cid"]:
+            output_api.db.xadd(stream, {"uri": uri, "value": "NaN"})
+        output_api.wait_pushed_results(["g|cid"], "cid", timeout=0.3)
+        assert list(output_api._pushed_results) == ["e|cid", "f|cid"]
+        output_api.pushed_result_ttl = 0.1
+        time.sleep(0.2)
+        output_api.db.xadd(stream, {"uri": "h|cid", "value": "NaN"})
+        output_api.wait_pushed_results(["g|cid"], "cid", timeout=0.3)
+        assert list(output_api._pushed_results) == ["h|cid"]
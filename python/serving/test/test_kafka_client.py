@@ -0,0 +1,127 @@
+#
+# Copyright 2016 The BigDL Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import threading
+
+import numpy as np
+import pyarrow as pa
+import pytest
+from bigdl.serving.schema import get_ndarray_from_record_batch
+
+client = pytest.importorskip("bigdl.serving.kafka.client")
+
+
+class MockFuture:
+    def __init__(self, key):
+        self.key = key
+        self.callbacks = []
+        self.errbacks = []
+
+    def add_callback(self, f):
+        self.callbacks.append(f)
+
+    def add_errback(self, f):
+        self.errbacks.append(f)
+
+    def get(self, timeout=None):
+        return self.key
+
+
+class MockKafkaProducer:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.sent = []
+        self.pending = []
+
+    def send(self, topic, key=None, value=None):
+        self.sent.append((topic, key, value))
+        future = MockFuture(key)
+        self.pending.append(future)
+        return future
+
+    def flush(self, timeout=None):
+        # the messages with a key starting with "bad" fail
+        for future in self.pending:
+            if future.key.startswith("bad"):
+                for f in future.errbacks:
+                    f(RuntimeError(future.key))
+            else:
+                for f in future.callbacks:
+                    f(future.key)
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+class TestKafkaClient:
+    @pytest.fixture(autouse=True)
+    def mock_producer(self, monkeypatch):
+        monkeypatch.setattr(client, "KafkaProducer", MockKafkaProducer)
+
+    def test_async_enqueue(self):
+        input_api = client.InputQueue(async_enqueue=True)
+        assert input_api.db.kwargs["linger_ms"] == 5
+        delivered, failed = [], []
+        input_api.enqueue("a", t=np.ones(2))
+        input_api.enqueue_async("b", {"t": np.ones(2)}, delivered.append, failed.append)
+        input_api.enqueue_async("bad", {"t": np.ones(2)}, delivered.append, failed.append)
+        # the inputs are not mistaken for the callbacks
+        input_api.enqueue("c", callback=np.ones(2))
+        assert len(input_api.db.sent) == 4
+        assert input_api.delivered_count == 0
+
+        input_api.flush()
+        assert input_api.delivered_count == 3
+        assert input_api.failed_count == 1
+        assert delivered == ["b"]
+        assert [str(e) for e in failed] == ["bad"]
+        value = json.loads(input_api.db.sent[3][2].decode("utf-8"))
+        assert value["uri"] == "c"
+
+    def test_async_counters(self):
+        input_api = client.InputQueue(async_enqueue=True)
+        for i in range(400):
+            input_api.enqueue_async(str(i), {"t": np.ones(2)})
+        pending = input_api.db.pending
+
+        # the callbacks run concurrently, e.g. from the I/O threads of several producers
+        def deliver(futures):
+            for future in futures:
+                for f in future.callbacks:
+                    f(future.key)
+
+        threads = [threading.Thread(target=deliver, args=(pending[i::4],)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert input_api.delivered_count == 400
+
+    def test_raw_value(self):
+        input_api = client.InputQueue(raw_value=True, tensor_version=2)
+        input_api.enqueue("a", t=np.arange(4, dtype=np.float32))
+        topic, key, value = input_api.db.sent[0]
+        assert topic == "serving_stream"
+        assert key == "a"
+        batch = next(iter(pa.ipc.open_stream(value)))
+        np.testing.assert_array_equal(get_ndarray_from_record_batch(batch),
+                                      np.arange(4, dtype=np.float32))
+
+    def test_value_serializer(self):
+        with pytest.raises(ValueError):
+            client.InputQueue(value_serializer=lambda v: v)
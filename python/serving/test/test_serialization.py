@@ -16,8 +16,11 @@
 
 
 import numpy as np
+import pyarrow as pa
 import base64
+import pytest
 from bigdl.serving.client import InputQueue, OutputQueue, http_json_to_ndarray
+from bigdl.serving.schema import get_field_and_data, get_ndarray_from_record_batch
 import os
 
 
@@ -31,6 +34,44 @@ class TestSerialization:
         b64 = input_api.data_to_b64(t1=np.array([1, 2]), t2=np.array([3, 4]))
         byte = base64.b64decode(b64)
 
+    def test_encode_tensor(self):
+        value = np.random.randn(3, 4, 5)
+        field, data = get_field_and_data("t", value)
+        legacy = pa.array([{'indiceData': []},
+                           {'indiceShape': []},
+                           {'data': value.astype("float32").flatten()},
+                           {'shape': np.array(value.shape)}], type=field.type)
+        assert data.equals(legacy)
+
+        for dtype in [np.float32, np.float64, np.int32, np.uint8]:
+            value = (np.random.rand(3, 224, 224) * 100).astype(dtype)
+            field, data = get_field_and_data("t", value, tensor_version=2)
+            batch = pa.RecordBatch.from_arrays([data], schema=pa.schema([field]))
+            sink = pa.BufferOutputStream()
+            with pa.RecordBatchStreamWriter(sink, batch.schema) as writer:
+                writer.write_batch(batch)
+            batch = next(iter(pa.ipc.open_stream(sink.getvalue())))
+            decoded = get_ndarray_from_record_batch(batch)
+            assert decoded.dtype == dtype
+            np.testing.assert_array_equal(decoded, value)
+
+        # big-endian values are converted, and the unsupported dtypes are rejected
+        value = np.arange(6, dtype=">i4")
+        field, data = get_field_and_data("t", value, tensor_version=2)
+        assert field.metadata[b"dtype"] == b"<i4"
+        assert np.frombuffer(data.buffers()[2], dtype="<i4").tolist() == list(range(6))
+        with pytest.raises(ValueError):
+            get_field_and_data("t", np.ones(2, dtype=np.float16), tensor_version=2)
+
+    def test_decode_result(self):
+        # the result written by the server, a data column and a shape column
+        data = pa.array(np.arange(6, dtype=np.float32))
+        shape = pa.array([2, 3, None, None, None, None], type=pa.int32())
+        batch = pa.RecordBatch.from_arrays([data, shape], names=["data", "shape"])
+        output_api = OutputQueue()
+        np.testing.assert_array_equal(output_api.get_ndarray_from_record_batch(batch),
+                                      np.arange(6, dtype=np.float32).reshape(2, 3))
+
     def test_http_response_to_ndarray(self):
         with open(os.path.join(resource_path, "http_response")) as f:
             data = f.read()
@@ -16,8 +16,9 @@
 
 package com.intel.analytics.bigdl.serving.flink
 
+import java.nio.charset.StandardCharsets
 import java.time.Duration
-import java.util.{Collections, Properties}
+import java.util.{Base64, Collections, Properties}
 
 import com.intel.analytics.bigdl.serving.{ClusterServing, ClusterServingHelper}
 import org.apache.flink.configuration.Configuration
@@ -35,7 +36,7 @@ class FlinkKafkaSource()
   extends RichParallelSourceFunction[List[(String, String, String)]] {
   @volatile var isRunning = true
   var logger: Logger = null
-  var consumer: KafkaConsumer[String, String] = null
+  var consumer: KafkaConsumer[String, Array[Byte]] = null
   var helper: ClusterServingHelper = null
   override def open(parameters: Configuration): Unit = {
     logger = LogManager.getLogger(getClass)
@@ -46,28 +47,39 @@ class FlinkKafkaSource()
     props.put(ConsumerConfig.KEY_DESERIALIZER_CLASS_CONFIG,
       "org.apache.kafka.common.serialization.StringDeserializer")
     props.put(ConsumerConfig.VALUE_DESERIALIZER_CLASS_CONFIG,
-      "org.apache.kafka.common.serialization.StringDeserializer")
+      "org.apache.kafka.common.serialization.ByteArrayDeserializer")
 
-    consumer = new KafkaConsumer[String, String](props)
+    consumer = new KafkaConsumer[String, Array[Byte]](props)
     consumer.subscribe(Collections.singletonList(helper.jobName))
   }
 
   override def run(sourceContext: SourceFunction
   .SourceContext[List[(String, String, String)]]): Unit = while (isRunning) {
     implicit val formats = DefaultFormats
-    val records: ConsumerRecords[String, String] = consumer.poll(Duration.ofMillis(1))
+    val records: ConsumerRecords[String, Array[Byte]] = consumer.poll(Duration.ofMillis(1))
     if (records != null) {
       val messages = records.records(new TopicPartition(helper.jobName, 0))
       if (messages != null) {
         messages.asScala.foreach(message => {
-          val parsedValue = parse(message.value()).extract[Map[String, String]]
-          sourceContext.collect(
-            List(
-              (parsedValue.getOrElse("uri", null),
-                parsedValue.getOrElse("data", null),
-                parsedValue.getOrElse("serde", null))
+          val value = message.value()
+          if (value.nonEmpty && value(0) == '{'.toByte) {
+            // json of uri, base64 encoded arrow data and serde
+            val parsedValue = parse(new String(value, StandardCharsets.UTF_8))
+              .extract[Map[String, String]]
+            sourceContext.collect(
+              List(
+                (parsedValue.getOrElse("uri", null),
+                  parsedValue.getOrElse("data", null),
+                  parsedValue.getOrElse("serde", null))
+              )
+            )
+          } else {
+            // raw arrow ipc stream, the uri is the json encoded key
+            val uri = parse(message.key()).extract[String]
+            sourceContext.collect(
+              List((uri, Base64.getEncoder.encodeToString(value), null))
             )
-          )
+          }
         })
       }
     }
@@ -55,7 +55,7 @@ class FlinkRedisSink(helperSer: ClusterServingHelper)
     val ppl = jedis.pipelined()
     var cnt = 0
     value.foreach(v => {
-      RedisUtils.writeHashMap(ppl, v._1, v._2, helper.jobName)
+      RedisUtils.writeResult(ppl, v._1, v._2, helper.jobName)
       if (v._2 != "NaN") {
         cnt += 1
       }
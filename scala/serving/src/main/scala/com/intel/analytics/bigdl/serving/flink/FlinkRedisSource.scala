@@ -60,7 +60,10 @@ class FlinkRedisSource()
         val key = streamMessages.getKey
         val entries = streamMessages.getValue.asScala
         val it = entries.map(e => {
-          (e.getFields.get("uri"), e.getFields.get("data"), e.getFields.get("serde"))
+          val fields = e.getFields
+          val key = RedisUtils.recordKey(fields.get("uri"),
+            fields.get(Conventions.RESULT_CLIENT_FIELD))
+          (key, fields.get("data"), fields.get("serde"))
         }).toList
         sourceContext.collect(it)
       }
@@ -645,6 +645,11 @@ object Instances {
           } else if (fieldVector.isInstanceOf[VarCharVector]) {
             val vector = fieldVector.asInstanceOf[VarCharVector]
             (vector.getName, new String(vector.getObject(0).getBytes))
+          } else if (fieldVector.isInstanceOf[VarBinaryVector] &&
+            fieldVector.getField.getMetadata.containsKey("shape")) {
+            // version 2 tensor, raw buffer with dtype and shape in the field metadata
+            val vector = fieldVector.asInstanceOf[VarBinaryVector]
+            (vector.getName, decodeRawTensor(vector))
           } else if (fieldVector.isInstanceOf[VarBinaryVector]) {
             val vector = fieldVector.asInstanceOf[VarBinaryVector]
             (vector.getName, new String(vector.getObject(0).asInstanceOf[Array[Byte]]))
@@ -720,6 +725,33 @@ object Instances {
     new Instances(instances.toList)
   }
 
+  /**
+   * Decode a version 2 tensor, whose value is the raw little-endian buffer of the tensor,
+   * and whose field metadata has its numpy dtype string and json shape. Version 2 is only
+   * used for the requests, the results are encoded by PostProcessing as for version 1.
+   * @return the same tuple as the struct tensor, (shape, data, indicesShape, indicesData)
+   */
+  def decodeRawTensor(vector: VarBinaryVector):
+    (ArrayBuffer[Int], ArrayBuffer[Float], ArrayBuffer[Int], ArrayBuffer[Int]) = {
+    val metadata = vector.getField.getMetadata
+    val shape = new ArrayBuffer[Int]()
+    metadata.get("shape").stripPrefix("[").stripSuffix("]").split(",")
+      .map(_.trim).filter(_.nonEmpty).foreach(dim => shape.append(dim.toInt))
+    val buffer = java.nio.ByteBuffer.wrap(vector.getObject(0))
+      .order(java.nio.ByteOrder.LITTLE_ENDIAN)
+    val dtype = metadata.get("dtype").stripPrefix("<").stripPrefix("|")
+    val data = new ArrayBuffer[Float]()
+    dtype match {
+      case "f4" => while (buffer.remaining() >= 4) data.append(buffer.getFloat())
+      case "f8" => while (buffer.remaining() >= 8) data.append(buffer.getDouble().toFloat)
+      case "i4" => while (buffer.remaining() >= 4) data.append(buffer.getInt().toFloat)
+      case "i8" => while (buffer.remaining() >= 8) data.append(buffer.getLong().toFloat)
+      case "u1" => while (buffer.remaining() >= 1) data.append((buffer.get() & 0xff).toFloat)
+      case _ => throw new Error(s"Unsupported tensor dtype ${metadata.get("dtype")}")
+    }
+    (shape, data, new ArrayBuffer[Int](), new ArrayBuffer[Int]())
+  }
+
   def transferListToTensor(value: Any): (mutable.ArrayBuffer[Int], mutable.ArrayBuffer[Any]) = {
     val shape = mutable.ArrayBuffer[Int]()
     val data = mutable.ArrayBuffer[Any]()
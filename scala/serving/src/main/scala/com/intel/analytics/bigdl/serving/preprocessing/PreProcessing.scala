@@ -89,9 +89,9 @@ class PreProcessing()
 
         if (ClusterServing.helper.queueUsed == "redis") {
           val tmpJedis = RedisUtils.getRedisClient(ClusterServing.jedisPool)
-          val hKey = Conventions.RESULT_PREFIX + ClusterServing.helper.jobName + ":" + key
-          val hValue = Map[String, String]("value" -> "NaN").asJava
-          tmpJedis.hset(hKey, hValue)
+          val ppl = tmpJedis.pipelined()
+          RedisUtils.writeResult(ppl, key, "NaN", ClusterServing.helper.jobName)
+          ppl.sync()
           tmpJedis.close()
         }
 
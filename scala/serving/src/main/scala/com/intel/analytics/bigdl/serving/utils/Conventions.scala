@@ -25,6 +25,18 @@ object Conventions {
   val SECURE_TMP_DIR = "secure"
   val SERVING_CONF_TMP_PATH = "cluster-serving-conf.yaml"
   val RESULT_PREFIX = "cluster-serving_"
+  // an input entry with a client field asks to push its result to the stream of the client,
+  // RESULT_PREFIX + jobName + RESULT_STREAM_INFIX + client id
+  val RESULT_CLIENT_FIELD = "client"
+  val RESULT_STREAM_INFIX = ":stream:"
+  // the key of a record in the pipeline is "<mark><client id>|<uri>" if it has a client id,
+  // or if its uri starts with the mark (with an empty client id), otherwise the uri itself
+  val RESULT_CLIENT_KEY_MARK = "\u0000"
+  val RESULT_CLIENT_KEY_SEPARATOR = "|"
+  // the result stream of a client is trimmed to about this length, and expires if the
+  // client stops reading it, e.g. when the client dies without deleting it
+  val RESULT_STREAM_MAX_LEN = 100000L
+  val RESULT_STREAM_TTL_SECONDS = 600
   val TMP_MANAGER_YAML = "/tmp/cluster-serving-jobs.yaml"
   val ARROW_INT = new ArrowType.Int(32, true)
   val ARROW_FLOAT = new ArrowType.FloatingPoint(FloatingPointPrecision.SINGLE)
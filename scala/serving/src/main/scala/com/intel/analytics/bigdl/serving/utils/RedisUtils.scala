@@ -111,6 +111,45 @@ object RedisUtils {
     val hValue = Map[String, String]("value" -> value).asJava
     ppl.hmset(hKey, hValue)
   }
+  /**
+   * The key of a record in the pipeline, which carries the client id of the record
+   * if its result is pushed to the stream of the client. The uri is kept as it is.
+   */
+  def recordKey(uri: String, client: String): String = {
+    val mark = Conventions.RESULT_CLIENT_KEY_MARK
+    val separator = Conventions.RESULT_CLIENT_KEY_SEPARATOR
+    if (client != null && client.nonEmpty && !client.contains(separator)) {
+      mark + client + separator + uri
+    } else if (uri != null && uri.startsWith(mark)) {
+      mark + separator + uri
+    } else {
+      uri
+    }
+  }
+  /**
+   * Write the result of a record key, to the result stream of its client if the key has
+   * a client id, otherwise to the hash map of its uri.
+   */
+  def writeResult(ppl: Pipeline, key: String, value: String, name: String): Unit = {
+    val mark = Conventions.RESULT_CLIENT_KEY_MARK
+    if (key.startsWith(mark)) {
+      val idx = key.indexOf(Conventions.RESULT_CLIENT_KEY_SEPARATOR, mark.length)
+      val client = key.substring(mark.length, idx)
+      val uri = key.substring(idx + 1)
+      if (client.nonEmpty) {
+        val streamKey = Conventions.RESULT_PREFIX + name +
+          Conventions.RESULT_STREAM_INFIX + client
+        val streamValue = Map[String, String]("uri" -> uri, "value" -> value).asJava
+        ppl.xadd(streamKey, StreamEntryID.NEW_ENTRY, streamValue,
+          Conventions.RESULT_STREAM_MAX_LEN, true)
+        ppl.expire(streamKey, Conventions.RESULT_STREAM_TTL_SECONDS)
+      } else {
+        writeHashMap(ppl, uri, value, name)
+      }
+    } else {
+      writeHashMap(ppl, key, value, name)
+    }
+  }
   def writeXstream(ppl: Pipeline, key: String, value: String, name: String): Unit = {
     val streamKey = Conventions.RESULT_PREFIX + name + ":" + key
     val streamValue = Map[String, String]("value" -> value).asJava